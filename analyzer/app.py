@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import os
-import sqlite3
+import sys
 import requests
 from datetime import datetime, timedelta
 from flask import Flask, render_template_string, request, jsonify
@@ -12,8 +12,21 @@ from bs4 import BeautifulSoup
 import time
 import random
 
+# 讓 analyzer/ 內的腳本也能匯入專案根目錄的共用模組
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.web import init_analysis
+from storage.content_store import load_contents
+from storage.models import connection, get_writer, init_app, init_database
+from storage.pagination import recent_articles
+from storage.rollups import get_count, get_counts, get_distinct_count
+
 app = Flask(__name__)
 
+# 與其他版本共用的模型與連線池（WAL 模式，讀取不會被爬取寫入阻塞）
+init_app(app)
+init_analysis(app, 'timeline', 'trending', 'clusters')
+
 # 簡化的爬蟲功能
 def crawl_news(keyword, start_date=None, end_date=None):
     """簡化的新聞爬蟲功能"""
@@ -21,14 +34,6 @@ def crawl_news(keyword, start_date=None, end_date=None):
     if start_date and end_date:
         print(f"[日期] 範圍: {start_date} 到 {end_date}")
     
-    # 清除舊資料
-    conn = sqlite3.connect('news.db')
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM news_article')
-    conn.commit()
-    conn.close()
-    print("[清除] 舊的新聞資料...")
-    
     # 根據關鍵詞生成不同的模擬新聞
     news_templates = {
         '習近平': [
@@ -121,65 +126,17 @@ def crawl_news(keyword, start_date=None, end_date=None):
         }
     ])
     
-    # 儲存到資料庫
-    conn = sqlite3.connect('news.db')
-    cursor = conn.cursor()
-    
-    for news in mock_news:
-        try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO news_article 
-                (title, content, source, url, publish_date, topic)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                news['title'],
-                news['content'],
-                news['source'],
-                news['url'],
-                news['publish_date'],
-                news['topic']
-            ))
-        except Exception as e:
-            print(f"[錯誤] 儲存新聞失敗: {e}")
+    # 依標準化網址增量寫入，保留既有資料與歷史版本
+    stats = get_writer(app).ingest(mock_news, keyword=keyword, start_date=start_date or None, end_date=end_date or None)
     
-    conn.commit()
-    conn.close()
-    
-    print(f"[成功] 儲存 {len(mock_news)} 篇新聞到資料庫")
-    return len(mock_news)
+    print(f"[成功] 新增 {stats['new']} 篇、更新 {stats['updated']} 篇、未變動 {stats['unchanged']} 篇新聞")
+    return stats
 
 # 資料庫初始化
 def init_db():
-    conn = sqlite3.connect('news.db')
-    cursor = conn.cursor()
-    
-    # 創建新聞文章表
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS news_article (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            content TEXT,
-            source TEXT,
-            url TEXT UNIQUE,
-            publish_date TEXT,
-            topic TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # 創建主題表
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS topic (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE,
-            count INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
     print("[資料庫] 創建資料庫表...")
+    # 資料表與索引由共用模型建立，再套用尚未執行的遷移
+    init_database(app)
     print("[資料庫] 資料庫表創建完成")
 
 # 初始化資料庫
@@ -760,53 +717,37 @@ def api_crawl():
         return jsonify({'success': False, 'message': '請提供關鍵詞'})
     
     try:
-        count = crawl_news(keyword, start_date, end_date)
-        return jsonify({'success': True, 'count': count})
+        stats = crawl_news(keyword, start_date, end_date)
+        return jsonify({'success': True, 'count': stats['fetched'], 'new': stats['new'], 'updated': stats['updated']})
     except Exception as e:
         print(f"[錯誤] 爬取失敗: {e}")
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/api/news')
 def api_news():
-    conn = sqlite3.connect('news.db')
-    cursor = conn.cursor()
+    with connection() as conn:
+        rows = recent_articles(conn, 20)
+        contents = load_contents(conn, [row[0] for row in rows])
+        
+        news = []
+        for row in rows:
+            news.append({
+                'title': row[1],
+                'content': contents.get(row[0], row[2]),
+                'source': row[3],
+                'url': row[4],
+                'publish_date': row[5],
+                'topic': row[6]
+            })
     
-    cursor.execute('''
-        SELECT title, content, source, url, publish_date, topic
-        FROM news_article
-        ORDER BY created_at DESC
-        LIMIT 20
-    ''')
-    
-    news = []
-    for row in cursor.fetchall():
-        news.append({
-            'title': row[0],
-            'content': row[1],
-            'source': row[2],
-            'url': row[3],
-            'publish_date': row[4],
-            'topic': row[5]
-        })
-    
-    conn.close()
     return jsonify({'news': news})
 
 @app.route('/api/stats')
 def api_stats():
-    conn = sqlite3.connect('news.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT COUNT(*) FROM news_article')
-    total_news = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(DISTINCT topic) FROM news_article')
-    total_topics = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(DISTINCT source) FROM news_article')
-    total_sources = cursor.fetchone()[0]
-    
-    conn.close()
+    with connection() as conn:
+        total_news = get_count(conn, 'total')
+        total_topics = get_distinct_count(conn, 'topic')
+        total_sources = get_distinct_count(conn, 'source')
     
     return jsonify({
         'total_news': total_news,
@@ -817,13 +758,9 @@ def api_stats():
 @app.route('/api/topics')
 def api_topics():
     try:
-        conn = sqlite3.connect('news.db')
-        cursor = conn.cursor()
+        with connection() as conn:
+            topics = get_counts(conn, 'topic')
         
-        cursor.execute('SELECT topic, COUNT(*) FROM news_article GROUP BY topic')
-        topics = dict(cursor.fetchall())
-        
-        conn.close()
         return jsonify({'topics': topics, 'keywords': []})
     except Exception as e:
         print(f"[錯誤] 主題分析失敗: {e}")
@@ -832,13 +769,11 @@ def api_topics():
 @app.route('/api/wordcloud')
 def api_wordcloud():
     try:
-        conn = sqlite3.connect('news.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT title, content FROM news_article')
-        articles = cursor.fetchall()
+        # 目前只需確認是否有資料，不必載入全部內容
+        with connection() as conn:
+            has_articles = conn.execute('SELECT 1 FROM news_article LIMIT 1').fetchone() is not None
         
-        if not articles:
+        if not has_articles:
             return jsonify({'wordcloud': None})
         
         # 簡化的詞雲生成
@@ -0,0 +1,136 @@
+"""以稀疏矩陣批次分類文章主題
+
+結果與 TopicAnalyzer.classify 逐篇分類完全相同：主題分數為該主題關鍵詞中出現在
+（轉成小寫的）標題與內文裡的個數乘上權重，分數最高者勝出，同分時取 topic_keywords 中較前面的主題。
+
+做法：
+    1. 把整批文章轉成字碼陣列，以 bigram 向量化比對找出每篇文章出現的詞庫詞，得到 文章 × 詞 的 0/1 稀疏矩陣 X
+    2. 詞 × 主題 的權重矩陣 W（關鍵詞在主題中重複列出時權重累加）
+    3. 分數 = X @ W，每列取 argmax
+
+安裝 scipy 時使用 scipy.sparse，否則以 numpy 累加座標陣列計算。
+"""
+import numpy as np
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+DEFAULT_TOPIC = '其他'
+
+# 串接文章用的分隔字元；關鍵詞不含此字元，因此不會跨文章比對到
+SEPARATOR = '\x00'
+
+
+class BatchTopicClassifier:
+    """由 topic_keywords（{主題: {'keywords': [...], 'weight': 權重}}）建立的批次分類器"""
+
+    def __init__(self, topic_keywords, default_topic=DEFAULT_TOPIC):
+        self.topics = list(topic_keywords)
+        self.default_topic = default_topic
+
+        terms = []
+        for config in topic_keywords.values():
+            for keyword in config['keywords']:
+                if keyword and keyword not in terms:
+                    terms.append(keyword)
+        self.terms = [term for term in terms if SEPARATOR not in term]
+        index = {term: i for i, term in enumerate(self.terms)}
+
+        self.weights = np.zeros((len(self.terms), len(self.topics)))
+        for column, config in enumerate(topic_keywords.values()):
+            for keyword in config['keywords']:
+                if keyword in index:
+                    self.weights[index[keyword], column] += config['weight']
+
+        # 依詞的前兩個字元（bigram）分組；單字的詞直接比對字碼
+        self._single = []
+        by_prefix = {}
+        for column, term in enumerate(self.terms):
+            codes = [ord(char) for char in term]
+            if len(codes) == 1:
+                self._single.append((codes[0], column))
+            else:
+                by_prefix.setdefault((codes[0] << 21) | codes[1], []).append((column, codes[2:]))
+        self._prefixes = np.array(sorted(by_prefix), dtype=np.int64)
+        self._by_prefix = [by_prefix[key] for key in sorted(by_prefix)]
+        self._max_length = max((len(term) for term in self.terms), default=0)
+
+    def term_matrix(self, texts):
+        """文章 × 詞庫詞的 0/1 矩陣，回傳 (列索引, 欄索引) 座標陣列
+
+        整批文章以 SEPARATOR 串接後轉成字碼陣列，相鄰兩字組成 bigram 鍵，一次 searchsorted 找出
+        所有詞開頭可能的位置，再依詞的其餘字元逐欄比對；比對全在 numpy 中完成，Python 迴圈只跑詞數次。
+        """
+        texts = list(texts)
+        corpus = SEPARATOR.join(texts)
+        starts = np.cumsum([0] + [len(text) + 1 for text in texts])
+        # 尾端補上分隔字元，詞的其餘字元比對不會超出陣列
+        codes = np.frombuffer(
+            (corpus + SEPARATOR * self._max_length).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32
+        ).astype(np.int64)
+
+        rows = []
+        columns = []
+
+        def add(positions, column):
+            rows.append(np.searchsorted(starts, positions, side='right') - 1)
+            columns.append(np.full(len(positions), column, dtype=np.int64))
+
+        for code, column in self._single:
+            add(np.flatnonzero(codes == code), column)
+
+        if len(self._prefixes):
+            keys = (codes[:-1] << 21) | codes[1:]
+            slots = np.searchsorted(self._prefixes, keys).clip(max=len(self._prefixes) - 1)
+            positions = np.flatnonzero(self._prefixes[slots] == keys)
+            slots = slots[positions]
+            order = np.argsort(slots, kind='stable')
+            positions, slots = positions[order], slots[order]
+            bounds = np.searchsorted(slots, np.arange(len(self._prefixes) + 1))
+            for slot, terms in enumerate(self._by_prefix):
+                candidates = positions[bounds[slot]:bounds[slot + 1]]
+                if not len(candidates):
+                    continue
+                for column, tail in terms:
+                    matched = candidates
+                    for offset, code in enumerate(tail, 2):
+                        matched = matched[codes[matched + offset] == code]
+                    add(matched, column)
+
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        # 同一個詞在一篇文章出現多次只算一次
+        cells = np.unique(np.concatenate(rows) * len(self.terms) + np.concatenate(columns))
+        return cells // len(self.terms), cells % len(self.terms)
+
+    def scores(self, texts):
+        """每篇文章對每個主題的分數矩陣（文章數 × 主題數）"""
+        rows, columns = self.term_matrix(texts)
+        if sparse is not None:
+            matrix = sparse.csr_matrix(
+                (np.ones(len(rows)), (rows, columns)), shape=(len(texts), len(self.terms))
+            )
+            return np.asarray(matrix @ self.weights)
+        scores = np.zeros((len(texts), len(self.topics)))
+        np.add.at(scores, rows, self.weights[columns])
+        return scores
+
+    def classify_texts(self, texts):
+        """批次分類已組好（標題 + 內文並轉成小寫）的文字"""
+        texts = list(texts)
+        if not texts:
+            return []
+        if not self.topics:
+            return [self.default_topic] * len(texts)
+        scores = self.scores(texts)
+        best = scores.argmax(axis=1)
+        return [
+            self.topics[column] if scores[row, column] > 0 else self.default_topic
+            for row, column in enumerate(best)
+        ]
+
+    def classify(self, articles):
+        """批次分類 (標題, 內文) 序列"""
+        return self.classify_texts((title + ' ' + (content or '')).lower() for title, content in articles)
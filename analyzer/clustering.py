@@ -0,0 +1,413 @@
+"""線上主題分群：在固定詞庫之外發現新出現的主題
+
+文章以雜湊後的 TF-IDF 向量表示（詞雜湊到 n_features 維，IDF 取自 analyzer/tfidf.py 的文件頻率表），
+以線上球面 mini-batch k-means 分群：每批新文章寫入時指派到最相近（餘弦相似度）的群並移動群中心。
+與最相近的群也明顯不像（低於該群平均相似度的一定比例）的文章取代最近最少使用的群，新話題因此能在寫入時就形成自己的群，而不是全部落入「其他」。
+
+模型狀態定期存入資料庫，程式重新啟動後載入並補上保存後才寫入的文章；其他行程定期檢查並載入較新的保存版本。
+每個群以中心權重最高的詞與最近的文章標題呈現。
+
+用法：
+    from analyzer.clustering import register_clustering, topic_clusters
+    register_clustering()          # 應用程式啟動時註冊寫入擴充（需在 register_tfidf 之後）
+    topic_clusters(conn)           # [{'cluster', 'size', 'recent', 'top_terms', 'titles'}, ...]
+
+    python -m analyzer.clustering instance/news.db --rebuild
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from analyzer.tfidf import count_terms, create_tfidf_tables, load_idf, load_term_counts
+from storage.dates import format_datetime
+from storage.ingestion import register_ingest_hook
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = 'default'
+
+
+def _feature(term, n_features):
+    digest = hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % n_features
+
+
+class OnlineTopicClusters:
+    """線上球面 k-means（執行緒安全）
+
+    n_clusters: 群數
+    n_features: 詞雜湊後的向量維度
+    max_count: 學習率下限為 1 / max_count，舊的群仍會隨新文章緩慢移動
+    outlier_ratio: 文章與最相近群的相似度低於該群平均相似度（凝聚度）的這個比例時視為新話題
+    reseed_similarity: 相似度低於此值時一律視為新話題；新話題取代最近最少使用的群
+    decay: 每批文章後各群「最近文章數」的衰減係數
+    """
+
+    def __init__(self, n_clusters=24, n_features=2 ** 14, max_count=1000, outlier_ratio=0.5,
+                 reseed_similarity=0.05, decay=0.98, recent_titles=5):
+        self.n_clusters = n_clusters
+        self.n_features = n_features
+        self.max_count = max_count
+        self.outlier_ratio = outlier_ratio
+        self.reseed_similarity = reseed_similarity
+        self.decay = decay
+        self.recent_titles = recent_titles
+        self.centroids = np.zeros((n_clusters, n_features), dtype=np.float32)
+        self.counts = np.zeros(n_clusters, dtype=np.int64)
+        self.sizes = np.zeros(n_clusters, dtype=np.int64)
+        self.recent = np.zeros(n_clusters, dtype=np.float64)
+        # 各群成員與群中心的平均相似度，新建立的群尚無資料（NaN）
+        self.cohesion = np.full(n_clusters, np.nan)
+        self.seeded = 0
+        # 雜湊維度 -> 第一個落在該維度的詞，用來顯示群的代表詞（最多 n_features 個）
+        self.terms = {}
+        self.titles = [[] for _ in range(n_clusters)]
+        # 已加入模型的最大文章 id，重新載入後從這之後補上尚未保存的文章
+        self.last_article_id = 0
+        self._lock = threading.Lock()
+
+    def vectorize(self, term_counts, idf):
+        """詞頻轉成 L2 正規化的雜湊 TF-IDF 稀疏向量 (維度索引, 權重)；沒有詞時回傳 None"""
+        weights = {}
+        total = sum(term_counts.values()) or 1
+        for term, count in term_counts.items():
+            feature = _feature(term, self.n_features)
+            self.terms.setdefault(feature, term)
+            weights[feature] = weights.get(feature, 0.0) + count / total * idf.get(term, 1.0)
+        if not weights:
+            return None
+        indices = np.fromiter(weights.keys(), dtype=np.int64, count=len(weights))
+        values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+        return indices, values / np.linalg.norm(values)
+
+    def _assign(self, indices, values):
+        similarities = self.centroids[:, indices] @ values
+        cluster = int(similarities.argmax())
+        return cluster, float(similarities[cluster])
+
+    def _is_outlier(self, cluster, similarity):
+        if similarity < self.reseed_similarity:
+            return True
+        cohesion = self.cohesion[cluster]
+        return not np.isnan(cohesion) and similarity < self.outlier_ratio * cohesion
+
+    def _seed(self, cluster, indices, values):
+        self.centroids[cluster] = 0
+        self.centroids[cluster, indices] = values
+        self.counts[cluster] = 1
+        self.recent[cluster] = 0
+        self.cohesion[cluster] = np.nan
+        self.titles[cluster] = []
+
+    def partial_fit(self, term_counts, idf, titles=None):
+        """以一批文章更新群中心，回傳各文章所屬的群（沒有詞的文章為 None）"""
+        titles = titles or [None] * len(term_counts)
+        assignments = []
+        with self._lock:
+            for counts, title in zip(term_counts, titles):
+                vector = self.vectorize(counts, idf)
+                if vector is None:
+                    assignments.append(None)
+                    continue
+                indices, values = vector
+                if self.seeded < self.n_clusters:
+                    cluster = self.seeded
+                    self.seeded += 1
+                    self._seed(cluster, indices, values)
+                else:
+                    cluster, similarity = self._assign(indices, values)
+                    if self._is_outlier(cluster, similarity):
+                        # 新話題：取代最近最少使用的群
+                        cluster = int(self.recent.argmin())
+                        self._seed(cluster, indices, values)
+                        self.sizes[cluster] = 0
+                    else:
+                        self.counts[cluster] = min(self.counts[cluster] + 1, self.max_count)
+                        rate = 1.0 / self.counts[cluster]
+                        self.cohesion[cluster] = similarity if np.isnan(self.cohesion[cluster]) else \
+                            (1 - rate) * self.cohesion[cluster] + rate * similarity
+                        centroid = self.centroids[cluster]
+                        centroid *= 1 - rate
+                        centroid[indices] += rate * values
+                        centroid /= np.linalg.norm(centroid)
+                self.sizes[cluster] += 1
+                self.recent[cluster] += 1
+                if title:
+                    self.titles[cluster] = ([title] + self.titles[cluster])[:self.recent_titles]
+                assignments.append(cluster)
+            self.recent *= self.decay
+        return assignments
+
+    def predict(self, term_counts, idf):
+        """不更新模型，回傳各文章最相近的群"""
+        with self._lock:
+            assignments = []
+            for counts in term_counts:
+                vector = self.vectorize(counts, idf)
+                assignments.append(None if vector is None or not self.seeded else self._assign(*vector)[0])
+            return assignments
+
+    def clusters(self, top_terms=10):
+        """各群的大小、最近文章數、代表詞與最近的文章標題，依最近文章數排序（top_terms 限制在 1 到 n_features）"""
+        with self._lock:
+            results = []
+            top_terms = max(1, min(top_terms, self.n_features))
+            for cluster in range(self.seeded):
+                weights = self.centroids[cluster]
+                top = np.argpartition(weights, -top_terms)[-top_terms:]
+                top = top[np.argsort(-weights[top])]
+                results.append({
+                    'cluster': cluster,
+                    'size': int(self.sizes[cluster]),
+                    'recent': round(float(self.recent[cluster]), 2),
+                    'top_terms': [self.terms[feature] for feature in top
+                                  if weights[feature] > 0 and feature in self.terms],
+                    'titles': list(self.titles[cluster]),
+                })
+        results.sort(key=lambda item: (-item['recent'], item['cluster']))
+        return results
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        with self._lock:
+            state = {
+                'params': [self.n_clusters, self.n_features, self.max_count, self.outlier_ratio,
+                           self.reseed_similarity, self.decay, self.recent_titles],
+                'seeded': self.seeded,
+                'last_article_id': self.last_article_id,
+                'terms': self.terms,
+                'titles': self.titles,
+            }
+            np.savez(buffer, centroids=self.centroids, counts=self.counts, sizes=self.sizes, recent=self.recent,
+                     cohesion=self.cohesion,
+                     state=np.frombuffer(json.dumps(state, ensure_ascii=False).encode('utf-8'), dtype=np.uint8))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        arrays = np.load(io.BytesIO(data))
+        state = json.loads(arrays['state'].tobytes().decode('utf-8'))
+        model = cls(*state['params'])
+        model.centroids = arrays['centroids'].copy()
+        model.counts = arrays['counts'].copy()
+        model.sizes = arrays['sizes'].copy()
+        model.recent = arrays['recent'].copy()
+        model.cohesion = arrays['cohesion'].copy()
+        model.seeded = state['seeded']
+        model.last_article_id = state.get('last_article_id', 0)
+        model.terms = {int(feature): term for feature, term in state['terms'].items()}
+        model.titles = state['titles']
+        return model
+
+
+def create_cluster_table(conn):
+    """建立分群模型的保存表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS topic_cluster_model (
+            name VARCHAR(100) PRIMARY KEY,
+            data BLOB NOT NULL,
+            updated_at DATETIME NOT NULL
+        )
+    ''')
+
+
+def save_model(conn, model, name=MODEL_NAME):
+    """保存模型並回傳保存時間（不提交交易）；資料表由資料庫遷移 14 建立"""
+    updated_at = format_datetime(datetime.utcnow())
+    conn.execute('''
+        INSERT INTO topic_cluster_model (name, data, updated_at) VALUES (?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+    ''', (name, model.to_bytes(), updated_at))
+    return updated_at
+
+
+def load_model(conn, name=MODEL_NAME):
+    """讀取已保存的模型，不存在時回傳 None"""
+    row = conn.execute('SELECT data FROM topic_cluster_model WHERE name = ?', (name,)).fetchone()
+    return OnlineTopicClusters.from_bytes(row[0]) if row else None
+
+
+def stored_version(conn, name=MODEL_NAME):
+    """已保存模型的保存時間，不存在時回傳 None"""
+    row = conn.execute('SELECT updated_at FROM topic_cluster_model WHERE name = ?', (name,)).fetchone()
+    return row[0] if row else None
+
+
+def article_term_counts(conn, articles):
+    """文章的詞頻：優先使用 TF-IDF 寫入擴充在同一交易中保存的結果，沒有時才分詞"""
+    stored = load_term_counts(conn, [article['id'] for article in articles])
+    missing = [article for article in articles if article['id'] not in stored]
+    stored.update(zip((article['id'] for article in missing), count_terms(missing)))
+    return [stored[article['id']] for article in articles]
+
+
+def fit_articles(conn, model, articles):
+    """以一批文章（含 id、title、content 的字典）更新模型，回傳各文章所屬的群"""
+    term_counts = article_term_counts(conn, articles)
+    idf = load_idf(conn, {term for counts in term_counts for term in counts})
+    return model.partial_fit(term_counts, idf, [article['title'] for article in articles])
+
+
+def fit_stored(conn, model, after_id=0, chunk_size=1000):
+    """以寫入時保存的詞頻，依 id 順序把 after_id 之後的文章加入模型，回傳加入的文章數"""
+    last_id = after_id
+    total = 0
+    while True:
+        rows = conn.execute('''
+            SELECT t.article_id, t.terms, a.title FROM tfidf_article t
+            JOIN news_article a ON a.id = t.article_id
+            WHERE t.article_id > ? ORDER BY t.article_id LIMIT ?
+        ''', (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        term_counts = [json.loads(row[1]) for row in rows]
+        idf = load_idf(conn, {term for counts in term_counts for term in counts})
+        model.partial_fit(term_counts, idf, [row[2] for row in rows])
+        last_id = rows[-1][0]
+        total += len(rows)
+    model.last_article_id = max(model.last_article_id, last_id)
+    return total
+
+
+_model = None
+_model_lock = threading.Lock()
+# 本行程最後載入或保存的模型版本（保存時間）、最後檢查版本與保存的時間
+_version = None
+_checked_at = 0.0
+_saved_at = 0.0
+_batches = 0
+
+# 每寫入幾批文章或經過幾秒保存一次模型；重新啟動時從保存點之後的文章補上
+SAVE_EVERY = 10
+SAVE_INTERVAL = 60
+
+# 每隔幾秒檢查其他行程是否保存了較新的模型
+RELOAD_INTERVAL = 30
+
+
+def _refresh(conn):
+    """第一次使用或其他行程保存了較新的模型時重新載入，並補上保存點之後寫入的文章（需持有 _model_lock）
+
+    回傳補上文章前的 last_article_id，沒有重新載入時回傳 None。
+    """
+    global _model, _version, _checked_at
+    now = time.monotonic()
+    if _model is not None and now - _checked_at < RELOAD_INTERVAL:
+        return None
+    _checked_at = now
+    version = stored_version(conn)
+    if _model is not None and version == _version:
+        return None
+
+    model = load_model(conn)
+    if model is None:
+        # 尚未保存過模型：從目前的文章之後開始學習，既有文章需執行 --rebuild 訓練
+        model = OnlineTopicClusters()
+        model.last_article_id = conn.execute('SELECT COALESCE(MAX(article_id), 0) FROM tfidf_article').fetchone()[0]
+        after_id = model.last_article_id
+    else:
+        after_id = model.last_article_id
+        fitted = fit_stored(conn, model, after_id)
+        if fitted:
+            logger.info(f"主題分群已載入並補上 {fitted} 篇保存後寫入的文章")
+    _model = model
+    _version = version
+    return after_id
+
+
+def get_model(conn):
+    """取得目前行程使用的模型，第一次呼叫時從資料庫載入，之後定期檢查是否有較新的保存版本"""
+    with _model_lock:
+        _refresh(conn)
+        return _model
+
+
+def _save_if_due(conn):
+    global _version, _saved_at, _batches
+    _batches += 1
+    if _batches < SAVE_EVERY and time.monotonic() - _saved_at < SAVE_INTERVAL:
+        return
+    _version = save_model(conn, _model)
+    conn.commit()
+    _batches = 0
+    _saved_at = time.monotonic()
+
+
+def _ingest_hook(conn, articles, crawl_run_id=None):
+    # 詞頻與 IDF 在交易中讀取（包含這批剛寫入的 TF-IDF 資料），模型在提交後才更新，
+    # 交易回滾時模型不會留下不存在的文章，重試也不會重複計入
+    term_counts = article_term_counts(conn, articles)
+    idf = load_idf(conn, {term for counts in term_counts for term in counts})
+    ids = [article['id'] for article in articles]
+    titles = [article['title'] for article in articles]
+
+    def apply():
+        with _model_lock:
+            # 剛重新載入時已由資料庫補上 id 大於保存點的文章
+            caught_up = _refresh(conn)
+            keep = [index for index, article_id in enumerate(ids) if caught_up is None or article_id <= caught_up]
+            _model.partial_fit([term_counts[index] for index in keep], idf, [titles[index] for index in keep])
+            _model.last_article_id = max([_model.last_article_id] + ids)
+            _save_if_due(conn)
+
+    return apply
+
+
+def register_clustering():
+    """註冊寫入擴充，每批寫入的文章提交後即時更新分群"""
+    register_ingest_hook('clustering', _ingest_hook)
+
+
+def topic_clusters(conn, top_terms=10):
+    """目前的主題群，依最近文章數排序"""
+    return get_model(conn).clusters(top_terms)
+
+
+def rebuild_model(conn, model=None, chunk_size=1000):
+    """依文章 id 順序從頭訓練模型並保存（會提交交易），需先建立 TF-IDF 文件頻率表
+
+    執行中的應用程式會在 RELOAD_INTERVAL 秒內載入新的模型。
+    """
+    model = model or OnlineTopicClusters()
+    create_tfidf_tables(conn)
+    total = fit_stored(conn, model, chunk_size=chunk_size)
+    save_model(conn, model)
+    conn.commit()
+    logger.info(f"主題分群已由 {total} 篇文章重新訓練")
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='線上主題分群')
+    parser.add_argument('database', nargs='?', default='news.db')
+    parser.add_argument('--rebuild', action='store_true', help='從所有文章重新訓練（需先建立 TF-IDF 文件頻率表）')
+    parser.add_argument('--clusters', type=int, default=24, help='重新訓練時的群數')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    try:
+        if args.rebuild:
+            model = rebuild_model(conn, OnlineTopicClusters(n_clusters=args.clusters))
+            print("✅ 主題分群已重新訓練")
+        else:
+            model = load_model(conn)
+            if model is None:
+                print("尚未建立主題分群模型，請加上 --rebuild")
+                return
+        for cluster in model.clusters():
+            print(f"#{cluster['cluster']:<3} {cluster['size']:>6} 篇  最近 {cluster['recent']:>7}  "
+                  f"{', '.join(cluster['top_terms'])}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""主題分類詞庫
+
+分類詞庫為 TopicAnalyzer.topic_keywords 加上 Topic 資料表中啟用的自訂主題。
+寫入擴充（analyzer/topic_state.py）與批次重新分類（analyzer/reclassify.py）都由這裡載入詞庫，
+兩者對同一篇文章分出的主題一致。
+"""
+import hashlib
+import json
+import sqlite3
+
+from analyzer.batch_classifier import BatchTopicClassifier
+
+# 最近一次使用的 (詞庫雜湊, 分類器)，詞庫未變更時不必重新建立
+_classifier = (None, None)
+
+
+def load_lexicon(conn, analyzer=None):
+    """合併 TopicAnalyzer 的主題關鍵詞與 Topic 資料表中啟用的自訂主題
+
+    自訂主題的關鍵詞加入同名主題；新的主題以 priority 作為權重。
+    """
+    if analyzer is None:
+        from analyzer.topic_analyzer import TopicAnalyzer
+        analyzer = TopicAnalyzer()
+    lexicon = {topic: {'keywords': list(config['keywords']), 'weight': config['weight']}
+               for topic, config in analyzer.topic_keywords.items()}
+    try:
+        rows = conn.execute(
+            'SELECT name, keyword, priority FROM topic WHERE is_active ORDER BY priority DESC, id'
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # 尚未建立 topic 資料表
+        rows = []
+    for name, keyword, priority in rows:
+        config = lexicon.setdefault(name, {'keywords': [], 'weight': float(priority or 1)})
+        if keyword.lower() not in config['keywords']:
+            # 分類時文字會轉成小寫，自訂關鍵詞同樣以小寫比對
+            config['keywords'].append(keyword.lower())
+    return lexicon
+
+
+def lexicon_hash(lexicon):
+    """詞庫內容的雜湊，用來判斷既有工作是否仍適用"""
+    encoded = json.dumps(lexicon, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def lexicon_classifier(lexicon):
+    """詞庫的批次分類器，詞庫與上一次相同時沿用已建立的分類器"""
+    global _classifier
+    digest = lexicon_hash(lexicon)
+    if _classifier[0] != digest:
+        _classifier = (digest, BatchTopicClassifier(lexicon))
+    return _classifier[1]
@@ -1,7 +1,7 @@
 from flask import Flask, jsonify, request
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
 import os
+import sys
 import json
 import threading
 import time
@@ -9,42 +9,36 @@ import requests
 from bs4 import BeautifulSoup
 import re
 from urllib.parse import urljoin, urlparse
+from concurrent.futures import ThreadPoolExecutor
 import random
 
+# 讓 analyzer/ 內的腳本也能匯入專案根目錄的共用模組
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzer.web import init_analysis
+from crawler.search_sources import register_search_source, get_search_sources, build_search_url
+from storage.content_store import load_contents
+from storage.models import connection, db, get_writer, init_app, init_database
+from storage.pagination import fetch_news_page
+from storage.rollups import get_count, get_distinct_count, get_top
+
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///news.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
-
-# 資料庫模型
-class NewsArticle(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(500), nullable=False)
-    content = db.Column(db.Text)
-    source = db.Column(db.String(100), nullable=False)
-    url = db.Column(db.String(500), nullable=False)
-    publish_date = db.Column(db.DateTime, nullable=False)
-    topic = db.Column(db.String(100))
-    keywords = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class Topic(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(200), nullable=False)
-    keyword = db.Column(db.String(100), nullable=False)
-    priority = db.Column(db.Integer, default=1)
-    is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+init_app(app)
+init_analysis(app, 'search', 'topics', 'timeline', 'trending', 'clusters')
 
 # 真實新聞爬蟲類
 class RealNewsCrawler:
-    def __init__(self):
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self.session = self._new_session()
+    
+    def _new_session(self):
+        session = requests.Session()
+        session.headers.update(self.headers)
+        return session
     
     def crawl_news(self, keyword, max_articles=20, start_date=None, end_date=None):
         """爬取真實新聞 - 純動態搜尋"""
@@ -78,52 +72,15 @@ class RealNewsCrawler:
             remaining = max_articles - len(articles)
             print(f"🔄 補充其他新聞來源，還需要 {remaining} 篇...")
             
-            # 新聞來源列表
-            news_sources = [
-                {
-                    'name': 'Yahoo新聞',
-                    'search_url': f'https://tw.news.yahoo.com/search?p={keyword}',
-                    'base_url': 'https://tw.news.yahoo.com'
-                },
-                {
-                    'name': 'ETtoday新聞雲',
-                    'search_url': f'https://www.ettoday.net/news_search/doSearch.php?keywords={keyword}',
-                    'base_url': 'https://www.ettoday.net'
-                }
-            ]
+            # 同時查詢所有已註冊的搜尋來源
+            source_articles = self._crawl_search_sources(keyword)
             
-            for source in news_sources:
+            # 避免重複文章
+            for article in source_articles:
                 if len(articles) >= max_articles:
                     break
-                    
-                try:
-                    print(f"🔍 正在爬取 {source['name']} 關於 '{keyword}' 的新聞...")
-                    
-                    # 發送請求
-                    response = self.session.get(source['search_url'], timeout=10)
-                    response.encoding = 'utf-8'
-                    
-                    if response.status_code == 200:
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        
-                        # 根據不同網站解析新聞
-                        if 'yahoo' in source['name'].lower():
-                            source_articles = self._parse_yahoo_news(soup, source, keyword)
-                        elif 'ettoday' in source['name'].lower():
-                            source_articles = self._parse_ettoday_news(soup, source, keyword)
-                        else:
-                            continue
-                        
-                        # 避免重複文章
-                        for article in source_articles:
-                            if not any(existing['title'] == article['title'] for existing in articles):
-                                articles.append(article)
-                                if len(articles) >= max_articles:
-                                    break
-                    
-                except Exception as e:
-                    print(f"❌ 爬取 {source['name']} 時發生錯誤: {e}")
-                    continue
+                if not any(existing['title'] == article['title'] for existing in articles):
+                    articles.append(article)
         
         # 如果仍然沒有足夠的新聞，嘗試更多搜尋策略
         if len(articles) < 3:
@@ -155,6 +112,42 @@ class RealNewsCrawler:
         print(f"🎉 動態搜尋完成！總共獲得 {len(articles)} 篇真實新聞")
         return articles[:max_articles]
     
+    def _crawl_search_sources(self, keyword, sources=None):
+        """並行爬取所有已註冊的搜尋來源，結果依註冊順序合併"""
+        sources = sources if sources is not None else get_search_sources()
+        if not sources:
+            return []
+        
+        max_workers = max(1, min(self.max_workers, len(sources)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(lambda source: self._crawl_search_source(source, keyword), sources))
+        
+        articles = []
+        for source_articles in results:
+            articles.extend(source_articles)
+        return articles
+    
+    def _crawl_search_source(self, source, keyword):
+        """爬取單一搜尋來源，請求頻率由來源的限流設定控制"""
+        try:
+            print(f"🔍 正在爬取 {source['name']} 關於 '{keyword}' 的新聞...")
+            
+            # requests.Session 不保證執行緒安全，並行的每個來源使用自己的 Session，不共用 self.session
+            with source['rate_limiter'], self._new_session() as session:
+                response = session.get(build_search_url(source, keyword), timeout=source['timeout'])
+            response.encoding = 'utf-8'
+            
+            if response.status_code != 200:
+                print(f"❌ {source['name']} 回應狀態碼 {response.status_code}")
+                return []
+            
+            soup = BeautifulSoup(response.text, 'html.parser')
+            return source['parser'](self, soup, source, keyword)
+        
+        except Exception as e:
+            print(f"❌ 爬取 {source['name']} 時發生錯誤: {e}")
+            return []
+    
     def _extract_date_from_article(self, url, title, content):
         """從URL、標題或內容中提取發布日期"""
         import re
@@ -369,6 +362,9 @@ class RealNewsCrawler:
             traceback.print_exc()
             return []
     
+    @register_search_source('yahoo', 'Yahoo新聞',
+                            'https://tw.news.yahoo.com/search?p={keyword}',
+                            'https://tw.news.yahoo.com')
     def _parse_yahoo_news(self, soup, source, keyword):
         """解析Yahoo新聞"""
         articles = []
@@ -394,6 +390,9 @@ class RealNewsCrawler:
             print(f"解析Yahoo新聞時發生錯誤: {e}")
         return articles
     
+    @register_search_source('ettoday', 'ETtoday新聞雲',
+                            'https://www.ettoday.net/news_search/doSearch.php?keywords={keyword}',
+                            'https://www.ettoday.net')
     def _parse_ettoday_news(self, soup, source, keyword):
         """解析ETtoday新聞"""
         articles = []
@@ -420,6 +419,9 @@ class RealNewsCrawler:
             print(f"解析ETtoday新聞時發生錯誤: {e}")
         return articles
     
+    @register_search_source('chinatimes', '中時新聞網',
+                            'https://www.chinatimes.com/search/{keyword}?chdtv',
+                            'https://www.chinatimes.com')
     def _parse_chinatimes_news(self, soup, source, keyword):
         """解析中時新聞網"""
         articles = []
@@ -850,57 +852,50 @@ def index():
 @app.route('/api/stats')
 def get_stats():
     """獲取統計數據"""
-    total_news = NewsArticle.query.count()
-    total_topics = db.session.query(NewsArticle.topic).filter(NewsArticle.topic.isnot(None)).distinct().count()
-    today = datetime.now().date()
-    today_news = NewsArticle.query.filter(db.func.date(NewsArticle.publish_date) == today).count()
-    
-    # 最熱門主題
-    hot_topic = db.session.query(
-        NewsArticle.topic,
-        db.func.count(NewsArticle.id).label('count')
-    ).filter(NewsArticle.topic.isnot(None)).group_by(NewsArticle.topic).order_by(db.desc('count')).first()
+    with connection() as conn:
+        total_news = get_count(conn, 'total')
+        total_topics = get_distinct_count(conn, 'topic')
+        today_news = get_count(conn, 'day', datetime.now().strftime('%Y-%m-%d'))
+        hot_topic = get_top(conn, 'topic')
     
     return jsonify({
         'total_news': total_news,
         'total_topics': total_topics,
         'today_news': today_news,
-        'hot_topic': hot_topic[0] if hot_topic else None
+        'hot_topic': hot_topic
     })
 
 @app.route('/api/news')
 def get_news():
     """獲取新聞列表"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, request.args.get('per_page', 20, type=int))
     topic = request.args.get('topic')
     
-    query = NewsArticle.query
-    if topic:
-        query = query.filter(NewsArticle.topic == topic)
-    
-    articles = query.order_by(NewsArticle.publish_date.desc()).limit(per_page).all()
+    # 以 (publish_date, id) 鍵集分頁；回應仍是文章陣列，下一頁的游標放在回應標頭
+    cursor = request.args.get('cursor')
+    try:
+        with connection() as conn:
+            result = fetch_news_page(
+                conn, topic,
+                cursor=cursor,
+                per_page=per_page,
+                offset=0 if cursor else (page - 1) * per_page
+            )
+            # 只載入這一頁文章的內文
+            contents = load_contents(conn, [article['id'] for article in result['articles']])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify([{
-        'id': article.id,
-        'title': article.title,
-        'content': article.content,
-        'source': article.source,
-        'url': article.url,
-        'publish_date': article.publish_date.isoformat(),
-        'topic': article.topic,
-        'keywords': article.keywords
-    } for article in articles])
-
-@app.route('/api/topics')
-def get_topics():
-    """獲取主題列表"""
-    topics = db.session.query(
-        NewsArticle.topic,
-        db.func.count(NewsArticle.id).label('count')
-    ).filter(NewsArticle.topic.isnot(None)).group_by(NewsArticle.topic).all()
+    for article in result['articles']:
+        article['content'] = contents.get(article['id'])
     
-    return jsonify([{'name': topic[0], 'count': topic[1]} for topic in topics])
+    response = jsonify(result['articles'])
+    if result['next_cursor']:
+        response.headers['X-Next-Cursor'] = result['next_cursor']
+    if result['total'] is not None:
+        response.headers['X-Total-Count'] = str(result['total'])
+    return response
 
 @app.route('/api/crawl', methods=['POST'])
 def start_crawl():
@@ -923,12 +918,6 @@ def run_crawling(keyword, start_date, end_date):
         try:
             print(f"🚀 開始爬取關鍵詞: {keyword}")
             
-            # 先清除舊的新聞資料
-            print("🗑️ 清除舊的新聞資料...")
-            NewsArticle.query.delete()
-            db.session.commit()
-            print("✅ 舊資料已清除")
-            
             # 創建爬蟲實例
             crawler = RealNewsCrawler()
             
@@ -937,21 +926,9 @@ def run_crawling(keyword, start_date, end_date):
             
             print(f"📰 成功爬取到 {len(articles)} 篇新聞")
             
-            # 儲存到資料庫
-            for article in articles:
-                news_article = NewsArticle(
-                    title=article['title'],
-                    content=article['content'],
-                    source=article['source'],
-                    url=article['url'],
-                    publish_date=article['publish_date'],
-                    topic=article['topic'],
-                    keywords=article['keywords']
-                )
-                db.session.add(news_article)
-            
-            db.session.commit()
-            print(f"✅ 成功儲存 {len(articles)} 篇新聞到資料庫")
+            # 依標準化網址增量寫入，保留既有資料與歷史版本
+            stats = get_writer(app).ingest(articles, keyword=keyword, start_date=start_date, end_date=end_date)
+            print(f"✅ 新增 {stats['new']} 篇、更新 {stats['updated']} 篇、未變動 {stats['unchanged']} 篇新聞")
             
         except Exception as e:
             print(f"❌ 爬取過程中發生錯誤: {e}")
@@ -968,7 +945,7 @@ if __name__ == '__main__':
     print("📊 創建資料庫表...")
     with app.app_context():
         try:
-            db.create_all()
+            init_database(app)
             print("✅ 資料庫表創建完成")
             
             # 驗證表格是否創建成功
@@ -0,0 +1,238 @@
+"""詞庫變更後批次重新分類文章主題（NewsArticle.topic）
+
+文章依 id 切成多個範圍，由多個行程平行分類，主行程依範圍分批寫回並調整統計彙總表。
+每個範圍的結果與進度在同一交易中提交，中斷後重新執行會從未完成的範圍繼續；
+每次提交只鎖定一個範圍，重新分類期間網站與爬取照常運作。
+
+分類詞庫與寫入擴充相同，由 analyzer/lexicon.py 載入（TopicAnalyzer.topic_keywords 加上啟用的自訂主題），
+詞庫內容的雜湊用來辨識工作，詞庫再次變更時舊工作作廢並從頭開始。
+
+用法：
+    python -m analyzer.reclassify instance/news.db --workers 4
+    python -m analyzer.reclassify instance/news.db --status
+"""
+import argparse
+import logging
+import sqlite3
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from analyzer.lexicon import lexicon_classifier, lexicon_hash, load_lexicon
+from analyzer.topic_state import reassign_topics
+from storage.content_store import load_contents
+from storage.dates import format_datetime
+from storage.rollups import update_rollups
+from storage.sql import chunked_in_query
+from storage.sqlite_config import BUSY_TIMEOUT, configure_connection
+
+logger = logging.getLogger(__name__)
+
+# 每個範圍涵蓋的文章 id 數
+DEFAULT_RANGE_SIZE = 5000
+
+
+def create_reclassify_tables(conn):
+    """建立重新分類工作與範圍進度表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reclassify_job (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lexicon_hash VARCHAR(40) NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'running',
+            range_count INTEGER NOT NULL DEFAULT 0,
+            started_at DATETIME NOT NULL,
+            finished_at DATETIME
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reclassify_range (
+            job_id INTEGER NOT NULL,
+            start_id INTEGER NOT NULL,
+            end_id INTEGER NOT NULL,
+            processed INTEGER,
+            changed INTEGER,
+            finished_at DATETIME,
+            PRIMARY KEY (job_id, start_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+def start_job(conn, lexicon, range_size=DEFAULT_RANGE_SIZE):
+    """取得同一詞庫未完成的工作，沒有時建立新工作並切分 id 範圍（會提交交易）"""
+    digest = lexicon_hash(lexicon)
+    row = conn.execute(
+        "SELECT id FROM reclassify_job WHERE status = 'running' AND lexicon_hash = ?", (digest,)
+    ).fetchone()
+    if row:
+        logger.info(f"繼續重新分類工作 {row[0]}")
+        return row[0]
+
+    now = format_datetime(datetime.utcnow())
+    conn.execute("UPDATE reclassify_job SET status = 'superseded', finished_at = ? WHERE status = 'running'", (now,))
+    job_id = conn.execute(
+        'INSERT INTO reclassify_job (lexicon_hash, started_at) VALUES (?, ?)', (digest, now)
+    ).lastrowid
+
+    first_id, last_id = conn.execute('SELECT MIN(id), MAX(id) FROM news_article').fetchone()
+    ranges = []
+    if first_id is not None:
+        ranges = [(job_id, start, min(start + range_size - 1, last_id))
+                  for start in range(first_id, last_id + 1, range_size)]
+    conn.executemany('INSERT INTO reclassify_range (job_id, start_id, end_id) VALUES (?, ?, ?)', ranges)
+    conn.execute('UPDATE reclassify_job SET range_count = ? WHERE id = ?', (len(ranges), job_id))
+    conn.commit()
+    logger.info(f"建立重新分類工作 {job_id}，共 {len(ranges)} 個範圍")
+    return job_id
+
+
+def classify_range(database, start_id, end_id, lexicon):
+    """在工作行程中分類一個 id 範圍，回傳 (文章數, [(id, 新主題, 舊主題, 來源, 發布日期)])"""
+    conn = configure_connection(sqlite3.connect(database, timeout=BUSY_TIMEOUT))
+    try:
+        rows = conn.execute('''
+            SELECT id, title, content, topic, source, publish_date FROM news_article
+            WHERE id BETWEEN ? AND ? ORDER BY id
+        ''', (start_id, end_id)).fetchall()
+        contents = load_contents(conn, [row[0] for row in rows])
+    finally:
+        conn.close()
+
+    topics = lexicon_classifier(lexicon).classify((row[1], contents.get(row[0], row[2])) for row in rows)
+    changes = [(row[0], topic, row[3], row[4], row[5]) for row, topic in zip(rows, topics) if topic != row[3]]
+    return len(rows), changes
+
+
+def apply_range(conn, job_id, start_id, processed, changes):
+    """寫回一個範圍的新主題、調整統計彙總表與主題統計並記錄進度（會提交交易）
+
+    只更新主題仍與分類時相同的文章，分類期間被爬取更新的文章維持新寫入的主題。
+    """
+    try:
+        # 先取得寫入鎖，檢查目前主題到批次更新之間不會有其他寫入
+        conn.execute('BEGIN IMMEDIATE')
+        current = {row[0]: row[1] for row in chunked_in_query(
+            conn, 'SELECT id, topic FROM news_article WHERE id IN ({placeholders})', [change[0] for change in changes]
+        )}
+        changed = [change for change in changes if change[0] in current and current[change[0]] == change[2]]
+        conn.executemany('UPDATE news_article SET topic = ? WHERE id = ?',
+                         [(topic, article_id) for article_id, topic, _, _, _ in changed])
+        update_rollups(conn,
+                       added=[(topic, source, publish_date) for _, topic, _, source, publish_date in changed],
+                       removed=[(old_topic, source, publish_date) for _, _, old_topic, source, publish_date in changed])
+        reassign_topics(conn, {article_id: topic for article_id, topic, _, _, _ in changed})
+        conn.execute('''
+            UPDATE reclassify_range SET processed = ?, changed = ?, finished_at = ?
+            WHERE job_id = ? AND start_id = ?
+        ''', (processed, len(changed), format_datetime(datetime.utcnow()), job_id, start_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(changed)
+
+
+def job_progress(conn, job_id=None):
+    """工作進度：已完成範圍數、總範圍數、已處理與已變更的文章數；沒有工作時回傳 None"""
+    query = 'SELECT id, status, range_count, started_at, finished_at FROM reclassify_job'
+    row = conn.execute(f'{query} WHERE id = ?', (job_id,)).fetchone() if job_id else \
+        conn.execute(f'{query} ORDER BY id DESC LIMIT 1').fetchone()
+    if row is None:
+        return None
+    done, processed, changed = conn.execute('''
+        SELECT COUNT(*), COALESCE(SUM(processed), 0), COALESCE(SUM(changed), 0)
+        FROM reclassify_range WHERE job_id = ? AND finished_at IS NOT NULL
+    ''', (row[0],)).fetchone()
+    return {
+        'job_id': row[0],
+        'status': row[1],
+        'ranges_done': done,
+        'ranges_total': row[2],
+        'processed': processed,
+        'changed': changed,
+        'started_at': row[3],
+        'finished_at': row[4],
+    }
+
+
+def reclassify(database, workers=4, range_size=DEFAULT_RANGE_SIZE, analyzer=None, progress=None):
+    """重新分類所有文章並回傳工作進度
+
+    workers 個行程分類尚未完成的範圍，主行程依完成順序寫回；progress(job_progress) 在每個範圍寫回後呼叫。
+    workers=1 時在目前行程中依序處理。
+    """
+    conn = configure_connection(sqlite3.connect(database, timeout=BUSY_TIMEOUT))
+    try:
+        create_reclassify_tables(conn)
+        lexicon = load_lexicon(conn, analyzer)
+        job_id = start_job(conn, lexicon, range_size)
+        pending = conn.execute('''
+            SELECT start_id, end_id FROM reclassify_range
+            WHERE job_id = ? AND finished_at IS NULL ORDER BY start_id
+        ''', (job_id,)).fetchall()
+
+        def finished(start_id, result):
+            processed, changes = result
+            apply_range(conn, job_id, start_id, processed, changes)
+            if progress:
+                progress(job_progress(conn, job_id))
+
+        if workers <= 1:
+            for start_id, end_id in pending:
+                finished(start_id, classify_range(database, start_id, end_id, lexicon))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # 同時送出的範圍數有上限，未寫回的分類結果不會佔用過多記憶體
+                ranges = iter(pending)
+                running = {}
+                while True:
+                    for start_id, end_id in ranges:
+                        running[executor.submit(classify_range, database, start_id, end_id, lexicon)] = start_id
+                        if len(running) >= workers * 2:
+                            break
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finished(running.pop(future), future.result())
+
+        conn.execute("UPDATE reclassify_job SET status = 'finished', finished_at = ? WHERE id = ?",
+                     (format_datetime(datetime.utcnow()), job_id))
+        conn.commit()
+        return job_progress(conn, job_id)
+    finally:
+        conn.close()
+
+
+def _print_progress(stats):
+    print(f"⏳ {stats['ranges_done']}/{stats['ranges_total']} 個範圍  "
+          f"已處理 {stats['processed']} 篇  變更 {stats['changed']} 篇")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批次重新分類文章主題')
+    parser.add_argument('database', nargs='?', default='news.db')
+    parser.add_argument('--workers', type=int, default=4, help='平行分類的行程數')
+    parser.add_argument('--range-size', type=int, default=DEFAULT_RANGE_SIZE, help='每個範圍涵蓋的文章 id 數')
+    parser.add_argument('--status', action='store_true', help='只顯示最近一次工作的進度')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.status:
+        conn = sqlite3.connect(args.database)
+        try:
+            create_reclassify_tables(conn)
+            stats = job_progress(conn)
+        finally:
+            conn.close()
+        if stats is None:
+            print("尚未執行過重新分類")
+        else:
+            print(f"工作 {stats['job_id']}（{stats['status']}）")
+            _print_progress(stats)
+        return
+
+    stats = reclassify(args.database, args.workers, args.range_size, progress=_print_progress)
+    print(f"✅ 重新分類完成，共處理 {stats['processed']} 篇，變更 {stats['changed']} 篇")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+"""固定記憶體的近似關鍵詞計數：Count-Min Sketch、Space-Saving 與 HyperLogLog
+
+精確的 Counter 會隨不同關鍵詞數量無限成長；這裡的結構大小只由誤差設定決定：
+    CountMinSketch  任意關鍵詞的次數估計，高估不超過 epsilon × 總次數的機率至少 1 - delta
+    SpaceSaving     只保留 capacity 個候選詞的熱門關鍵詞（top-k），次數高估不超過 總次數 / capacity
+    DistinctCounter 不同關鍵詞數的估計（HyperLogLog），相對誤差約 1.04 / √(2 ** precision)
+    KeywordSketch   三者合併，熱門詞的次數取前兩者估計的較小值，len() 為不同關鍵詞數的估計
+
+各結構都可以合併（例如多個工作行程各自計數後彙總）並以 to_bytes / from_bytes 在行程間傳遞。
+
+用法：
+    sketch = KeywordSketch(epsilon=0.001, delta=0.01, capacity=200)
+    sketch.update(['颱風', '停班', '颱風'])
+    sketch.most_common(10)
+"""
+import hashlib
+import heapq
+import json
+import math
+import struct
+from collections import Counter
+
+import numpy as np
+
+_CMS_HEADER = struct.Struct('<4sIIQ')
+_CMS_MAGIC = b'CMS1'
+
+
+def _hashes(key):
+    """兩個 64 位元雜湊值，以 h1 + i × h2 組出各列的位置（Kirsch–Mitzenmacher）"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+
+class CountMinSketch:
+    """Count-Min Sketch：depth 列 × width 欄的計數表，估計值取各列對應格的最小值"""
+
+    def __init__(self, width=2719, depth=5):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    @classmethod
+    def from_error(cls, epsilon=0.001, delta=0.01):
+        """依誤差上限建立：width = ⌈e / epsilon⌉、depth = ⌈ln(1 / delta)⌉"""
+        return cls(math.ceil(math.e / epsilon), math.ceil(math.log(1 / delta)))
+
+    def _columns(self, key):
+        h1, h2 = _hashes(key)
+        return [(h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def update(self, keys):
+        """累加一批關鍵詞（可重複；也可傳入 {關鍵詞: 次數}）"""
+        counts = keys if isinstance(keys, dict) else Counter(keys)
+        if not counts:
+            return
+        columns = np.array([self._columns(key) for key in counts], dtype=np.int64)
+        values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        rows = np.broadcast_to(np.arange(self.depth), columns.shape)
+        np.add.at(self.table, (rows, columns), values[:, None])
+        self.total += int(values.sum())
+
+    def add(self, key, count=1):
+        self.update({key: count})
+
+    def estimate(self, key):
+        return int(self.table[np.arange(self.depth), self._columns(key)].min())
+
+    def merge(self, other):
+        """併入另一個相同大小的 sketch（計數表逐格相加）"""
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("只能合併相同 width 與 depth 的 Count-Min Sketch")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+    def to_bytes(self):
+        return _CMS_HEADER.pack(_CMS_MAGIC, self.width, self.depth, self.total) + \
+            self.table.astype('<i8').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, width, depth, total = _CMS_HEADER.unpack_from(data)
+        if magic != _CMS_MAGIC:
+            raise ValueError("不是 Count-Min Sketch 資料")
+        sketch = cls(width, depth)
+        sketch.total = total
+        sketch.table = np.frombuffer(data, dtype='<i8', offset=_CMS_HEADER.size).reshape(depth, width).astype(np.int64)
+        return sketch
+
+
+class SpaceSaving:
+    """Space-Saving 熱門項目摘要：最多保留 capacity 個候選詞
+
+    候選已滿時新詞取代目前次數最少的詞，並繼承其次數作為誤差上限。
+    介面與 Counter 相同的部分（update、most_common、len）可直接取代 Counter 使用；
+    len() 為目前保留的候選詞數，最多 capacity。
+    """
+
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # (次數, 關鍵詞) 最小堆積；次數增加時放入新項目，過期的舊項目在取出時略過
+        self._heap = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, key):
+        return key in self.counts
+
+    def _minimum(self):
+        while True:
+            count, key = self._heap[0]
+            if self.counts.get(key) == count:
+                return count, key
+            heapq.heappop(self._heap)
+
+    def add(self, key, count=1):
+        self.total += count
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+        else:
+            floor, evicted = self._minimum()
+            heapq.heappop(self._heap)
+            del self.counts[evicted], self.errors[evicted]
+            self.counts[key] = floor + count
+            self.errors[key] = floor
+        heapq.heappush(self._heap, (self.counts[key], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def update(self, keys):
+        """累加一批關鍵詞（可重複；也可傳入 {關鍵詞: 次數}）"""
+        counts = keys if isinstance(keys, dict) else Counter(keys)
+        for key, count in counts.items():
+            self.add(key, count)
+
+    def _rebuild_heap(self):
+        self._heap = [(count, key) for key, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def estimate(self, key):
+        """次數估計（高估不超過 total / capacity）；未保留的詞回傳可能的最大次數"""
+        if key in self.counts:
+            return self.counts[key]
+        return self._minimum()[0] if len(self.counts) >= self.capacity else 0
+
+    def most_common(self, n=None):
+        items = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        return items if n is None else items[:n]
+
+    def merge(self, other):
+        """併入另一個摘要：未保留某詞的一方以其最小次數作為該詞次數的上限，合併後保留次數最多的 capacity 個"""
+        floor = self._minimum()[0] if len(self.counts) >= self.capacity else 0
+        other_floor = other._minimum()[0] if len(other.counts) >= other.capacity else 0
+        counts = {}
+        errors = {}
+        for key in self.counts.keys() | other.counts.keys():
+            counts[key] = self.counts.get(key, floor) + other.counts.get(key, other_floor)
+            errors[key] = self.errors.get(key, floor) + other.errors.get(key, other_floor)
+        keep = sorted(counts, key=lambda key: (-counts[key], key))[:self.capacity]
+        self.counts = {key: counts[key] for key in keep}
+        self.errors = {key: errors[key] for key in keep}
+        self.total += other.total
+        self._rebuild_heap()
+        return self
+
+    def to_bytes(self):
+        return json.dumps({
+            'capacity': self.capacity,
+            'total': self.total,
+            'items': [[key, count, self.errors[key]] for key, count in self.counts.items()],
+        }, ensure_ascii=False).encode('utf-8')
+
+    @classmethod
+    def from_bytes(cls, data):
+        state = json.loads(data.decode('utf-8') if isinstance(data, (bytes, bytearray, memoryview)) else data)
+        summary = cls(state['capacity'])
+        summary.total = state['total']
+        for key, count, error in state['items']:
+            summary.counts[key] = count
+            summary.errors[key] = error
+        summary._rebuild_heap()
+        return summary
+
+
+class DistinctCounter:
+    """HyperLogLog：以 2 ** precision 個暫存器估計不同關鍵詞數"""
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, keys):
+        """加入一批關鍵詞（可重複；也可傳入 {關鍵詞: 次數}）"""
+        indexes = []
+        ranks = []
+        for key in keys:
+            h = _hashes(key)[0]
+            rest = (h << self.precision) & 0xFFFFFFFFFFFFFFFF
+            indexes.append(h >> (64 - self.precision))
+            ranks.append(65 - rest.bit_length() if rest else 65 - self.precision)
+        if indexes:
+            np.maximum.at(self.registers, np.array(indexes), np.array(ranks, dtype=np.uint8))
+
+    def add(self, key):
+        self.update((key,))
+
+    def estimate(self):
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / np.power(2.0, -self.registers.astype(np.float64)).sum()
+        zeros = int((self.registers == 0).sum())
+        # 數量少時改用線性計數，估計值較準確
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+    def merge(self, other):
+        """併入另一個相同精度的計數器（暫存器逐一取最大值）"""
+        if self.precision != other.precision:
+            raise ValueError("只能合併相同 precision 的 HyperLogLog")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def to_bytes(self):
+        return struct.pack('<B', self.precision) + self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        counter = cls(data[0])
+        counter.registers = np.frombuffer(data, dtype=np.uint8, offset=1).copy()
+        return counter
+
+
+class KeywordSketch:
+    """Count-Min Sketch、Space-Saving 與 HyperLogLog：次數估計、熱門關鍵詞與不同關鍵詞數，記憶體固定
+
+    可直接取代 Counter：len() 與 Counter 一樣是不同關鍵詞的數量（估計值），不受 capacity 限制。
+    """
+
+    def __init__(self, epsilon=0.001, delta=0.01, capacity=200, precision=12):
+        self.frequencies = CountMinSketch.from_error(epsilon, delta)
+        self.heavy_hitters = SpaceSaving(capacity)
+        self.distinct = DistinctCounter(precision)
+
+    def __len__(self):
+        return self.distinct.estimate()
+
+    @property
+    def total(self):
+        return self.frequencies.total
+
+    def update(self, keys):
+        counts = keys if isinstance(keys, dict) else Counter(keys)
+        self.frequencies.update(counts)
+        self.heavy_hitters.update(counts)
+        self.distinct.update(counts)
+
+    def add(self, key, count=1):
+        self.update({key: count})
+
+    def estimate(self, key):
+        """兩者都是次數上限，取較小值"""
+        estimate = self.frequencies.estimate(key)
+        if key in self.heavy_hitters:
+            estimate = min(estimate, self.heavy_hitters.estimate(key))
+        return estimate
+
+    def most_common(self, n=None):
+        items = [(key, self.estimate(key)) for key in self.heavy_hitters.counts]
+        items.sort(key=lambda item: (-item[1], item[0]))
+        return items if n is None else items[:n]
+
+    def merge(self, other):
+        self.frequencies.merge(other.frequencies)
+        self.heavy_hitters.merge(other.heavy_hitters)
+        self.distinct.merge(other.distinct)
+        return self
+
+    def to_bytes(self):
+        frequencies = self.frequencies.to_bytes()
+        distinct = self.distinct.to_bytes()
+        return struct.pack('<II', len(frequencies), len(distinct)) + frequencies + distinct + \
+            self.heavy_hitters.to_bytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        size, distinct_size = struct.unpack_from('<II', data)
+        offset = 8 + size
+        sketch = cls.__new__(cls)
+        sketch.frequencies = CountMinSketch.from_bytes(data[8:offset])
+        sketch.distinct = DistinctCounter.from_bytes(data[offset:offset + distinct_size])
+        sketch.heavy_hitters = SpaceSaving.from_bytes(data[offset + distinct_size:])
+        return sketch
+
@@ -0,0 +1,263 @@
+"""以全庫文件頻率（DF）計算 TF-IDF 的關鍵詞擷取
+
+每篇文章寫入時分詞並更新各詞出現在幾篇文章中（tfidf_df），文件頻率保存在資料庫中，
+擷取關鍵詞時只需查詢這批文章用到的詞，不必重新掃描全部文章計算 IDF。
+常見的泛用詞 IDF 低，不再需要手寫的停用詞表就不會排在前面。
+
+用法：
+    from analyzer.tfidf import register_tfidf, extract_keywords
+    register_tfidf()                                  # 應用程式啟動時註冊寫入擴充
+    extract_keywords(conn, [text1, text2], top_n=10)  # 一次擷取多篇文字的關鍵詞
+
+    python -m analyzer.tfidf instance/news.db --rebuild
+
+資料表由資料庫遷移 13 建立，既有文章的文件頻率需執行 --rebuild 計算。
+"""
+import argparse
+import json
+import logging
+import math
+import re
+import sqlite3
+from collections import Counter
+
+from storage.token_cache import cut_many
+from storage.content_store import load_contents
+from storage.ingestion import register_ingest_hook
+from storage.sql import chunked_in_query
+
+logger = logging.getLogger(__name__)
+
+# 關鍵詞至少兩個字，且需包含中文或英文字母（排除純數字與標點）
+_KEYWORD_PATTERN = re.compile(r'[\u4e00-\u9fffA-Za-z]')
+
+
+def _keywords(tokens):
+    return [token.lower() for token in tokens if len(token) > 1 and _KEYWORD_PATTERN.search(token)]
+
+
+def tokenize(text):
+    """分詞並回傳可作為關鍵詞的詞（轉成小寫）
+
+    與爬蟲原本的關鍵詞擷取相同啟用 HMM 新詞發現，詞典中沒有的繁體詞（例如「台積電」）不會被拆成單字。
+    分詞結果經由 storage.token_cache 快取，同一段文字不會重複分詞。
+    """
+    if not text:
+        return []
+    return tokenize_many([text])[0]
+
+
+def tokenize_many(texts):
+    """批次分詞，一次查詢分詞快取"""
+    return [_keywords(tokens) for tokens in cut_many(text or '' for text in texts)]
+
+
+def create_tfidf_tables(conn):
+    """建立文件頻率表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tfidf_df (
+            term VARCHAR(100) PRIMARY KEY,
+            df INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    # 每篇文章的詞頻，文章更新時據此扣除舊的文件頻率，也供已入庫文章直接擷取關鍵詞
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tfidf_article (
+            article_id INTEGER PRIMARY KEY,
+            terms TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tfidf_meta (
+            key VARCHAR(50) PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+
+
+def count_terms(articles):
+    """多篇文章（含 title、content 的字典）標題加內文的詞頻"""
+    tokens = tokenize_many(text for article in articles for text in (article['title'], article.get('content')))
+    return [Counter(tokens[index] + tokens[index + 1]) for index in range(0, len(tokens), 2)]
+
+
+def load_term_counts(conn, article_ids):
+    """寫入時保存的各篇文章詞頻，回傳 {文章 id: {詞: 次數}}；沒有保存的文章不會出現在結果中"""
+    return {article_id: json.loads(terms) for article_id, terms in chunked_in_query(
+        conn, 'SELECT article_id, terms FROM tfidf_article WHERE article_id IN ({placeholders})', article_ids
+    )}
+
+
+def apply_articles(conn, articles):
+    """分詞新寫入或更新的文章並調整文件頻率（不提交交易）
+
+    articles 為含 id、title、content 的字典；同一篇文章重複套用時會先扣除舊的詞。
+    """
+    articles = list(articles)
+    if not articles:
+        return
+
+    previous = load_term_counts(conn, [article['id'] for article in articles])
+
+    deltas = Counter()
+    rows = []
+    added = 0
+    for article, counts in zip(articles, count_terms(articles)):
+        old = previous.pop(article['id'], None)
+        if old is None:
+            added += 1
+        else:
+            deltas.subtract(old.keys())
+        deltas.update(counts.keys())
+        rows.append((article['id'], json.dumps(counts, ensure_ascii=False)))
+
+    conn.executemany('INSERT OR REPLACE INTO tfidf_article (article_id, terms) VALUES (?, ?)', rows)
+    deltas = [(term, delta) for term, delta in deltas.items() if delta]
+    conn.executemany('''
+        INSERT INTO tfidf_df (term, df) VALUES (?, ?)
+        ON CONFLICT (term) DO UPDATE SET df = df + excluded.df
+    ''', deltas)
+    conn.executemany('DELETE FROM tfidf_df WHERE term = ? AND df <= 0',
+                     [(term,) for term, delta in deltas if delta < 0])
+    if added:
+        conn.execute('''
+            INSERT INTO tfidf_meta (key, value) VALUES ('documents', ?)
+            ON CONFLICT (key) DO UPDATE SET value = value + excluded.value
+        ''', (added,))
+
+
+def _ingest_hook(conn, articles, crawl_run_id=None):
+    # 資料表由資料庫遷移 13 建立
+    apply_articles(conn, articles)
+
+
+def register_tfidf():
+    """註冊寫入擴充，之後每批寫入的文章都在同一交易中更新文件頻率"""
+    register_ingest_hook('tfidf', _ingest_hook)
+
+
+def document_count(conn):
+    row = conn.execute("SELECT value FROM tfidf_meta WHERE key = 'documents'").fetchone()
+    return row[0] if row else 0
+
+
+def load_idf(conn, terms):
+    """以一次（超過參數上限時分段）查詢取得多個詞的 IDF，未出現過的詞視為文件頻率 0
+
+    IDF = ln((1 + N) / (1 + df)) + 1，N 為文章數。
+    """
+    terms = list(terms)
+    frequencies = dict(chunked_in_query(conn, 'SELECT term, df FROM tfidf_df WHERE term IN ({placeholders})', terms))
+    documents = document_count(conn)
+    return {term: math.log((1 + documents) / (1 + frequencies.get(term, 0))) + 1 for term in terms}
+
+
+def rank_terms(conn, term_counts, top_n=10):
+    """依 TF-IDF 排序多篇文章的詞頻，回傳每篇的 [(詞, 分數), ...]"""
+    term_counts = list(term_counts)
+    idf = load_idf(conn, {term for counts in term_counts for term in counts})
+    ranked = []
+    for counts in term_counts:
+        total = sum(counts.values()) or 1
+        scores = {term: count / total * idf[term] for term, count in counts.items()}
+        ranked.append(sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_n])
+    return ranked
+
+
+def extract_keywords(conn, texts, top_n=10):
+    """批次擷取多篇文字的關鍵詞，回傳與 texts 對應的關鍵詞列表"""
+    ranked = rank_terms(conn, (Counter(tokens) for tokens in tokenize_many(texts)), top_n)
+    return [[term for term, _ in terms] for terms in ranked]
+
+
+def article_keywords(conn, article_ids, top_n=10):
+    """以寫入時保存的詞頻擷取已入庫文章的關鍵詞，不重新分詞，回傳 {文章 id: [關鍵詞, ...]}"""
+    article_ids = list(article_ids)
+    stored = load_term_counts(conn, article_ids)
+    ids = [article_id for article_id in article_ids if article_id in stored]
+    ranked = rank_terms(conn, (stored[article_id] for article_id in ids), top_n)
+    return {article_id: [term for term, _ in terms] for article_id, terms in zip(ids, ranked)}
+
+
+class TfidfKeywordExtractor:
+    """供沒有資料庫連線的爬蟲使用的關鍵詞擷取器，每次擷取時開啟連線查詢文件頻率
+
+    用法：NewsCrawler(keyword_extractor=TfidfKeywordExtractor('instance/news.db').extract)
+    資料庫需已套用遷移（由應用程式啟動時的 init_database 完成）。
+    """
+
+    def __init__(self, database, top_n=10):
+        self.database = database
+        self.top_n = top_n
+
+    def extract(self, texts):
+        conn = sqlite3.connect(self.database, timeout=30)
+        try:
+            return extract_keywords(conn, texts, self.top_n)
+        finally:
+            conn.close()
+
+
+def _iter_table(conn, table, chunk_size):
+    """依 id 分批讀取標題與內文"""
+    last_id = 0
+    while True:
+        rows = conn.execute(f'''
+            SELECT id, title, content FROM {table}
+            WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        # 主資料表的內文在壓縮內容表，封存分區的內文則直接存在資料表中
+        contents = load_contents(conn, [row[0] for row in rows])
+        yield [{'id': row[0], 'title': row[1], 'content': contents.get(row[0], row[2])} for row in rows]
+        last_id = rows[-1][0]
+
+
+def rebuild_document_frequency(conn, chunk_size=1000):
+    """清除並從主資料表與所有封存分區重新計算文件頻率（會提交交易）"""
+    from storage.partitions import attach_partition, partitions_for_range
+
+    create_tfidf_tables(conn)
+    for table in ('tfidf_df', 'tfidf_article', 'tfidf_meta'):
+        conn.execute(f'DELETE FROM {table}')
+    total = 0
+    for articles in _iter_table(conn, 'news_article', chunk_size):
+        apply_articles(conn, articles)
+        total += len(articles)
+    conn.commit()
+
+    # 封存分區需附加資料庫，無法與主資料表在同一交易中處理
+    for _, filename in partitions_for_range(conn):
+        with attach_partition(conn, filename) as alias:
+            for articles in _iter_table(conn, f'{alias}.news_article', chunk_size):
+                apply_articles(conn, articles)
+                total += len(articles)
+            conn.commit()
+
+    logger.info(f"文件頻率已重建，共 {total} 篇文章")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TF-IDF 文件頻率表')
+    parser.add_argument('database', nargs='?', default='news.db')
+    parser.add_argument('--rebuild', action='store_true', help='從所有文章重新計算文件頻率')
+    parser.add_argument('--top', type=int, default=20, help='列出文件頻率最高的詞數')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    try:
+        create_tfidf_tables(conn)
+        if args.rebuild:
+            print(f"✅ 已重新計算 {rebuild_document_frequency(conn)} 篇文章的文件頻率")
+        documents = document_count(conn)
+        print(f"文章數: {documents}")
+        for term, df in conn.execute('SELECT term, df FROM tfidf_df ORDER BY df DESC, term LIMIT ?', (args.top,)):
+            print(f"{term:<10} {df:>8}  idf {math.log((1 + documents) / (1 + df)) + 1:.2f}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import jieba
 import re
+from array import array
 from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 import logging
@@ -54,34 +55,47 @@ class TopicAnalyzer:
             }
         }
 
-    def analyze_topics(self, articles=None):
-        """分析主題"""
-        if not articles:
-            # 如果沒有提供文章，從資料庫獲取
-            from app import NewsArticle, db
-            articles = NewsArticle.query.all()
+    def analyze_topics(self, articles=None, full_scan=False, chunk_size=1000, approximate=False, sketch_capacity=200):
+        """分析主題
+
+        沒有提供文章時讀取寫入時增量維護的主題統計（analyzer/topic_state.py），不必掃描全部文章；
+        此時 topic_stats 的 keywords 只包含各主題最常見的關鍵詞。
+        full_scan=True 時以串流方式逐批讀取資料庫重新分類，只保留統計與文章 id，記憶體用量不隨文章數成長。
+        approximate=True 時各主題的關鍵詞改用固定大小的 KeywordSketch（analyzer/sketches.py）近似計數，
+        只保留 sketch_capacity 個候選詞；熱度使用的關鍵詞數另以 HyperLogLog 估計，不受候選詞數限制。
+        """
+        if articles:
+            articles = ((article, None) for article in articles)
+        elif full_scan:
+            articles = self._iter_articles(chunk_size)
+        else:
+            return self._analyze_topic_state()
+        
+        if approximate:
+            from analyzer.sketches import KeywordSketch
+            keyword_counter = lambda: KeywordSketch(capacity=sketch_capacity)
+        else:
+            keyword_counter = Counter
         
         # 按主題分組統計
         topic_stats = defaultdict(lambda: {
             'count': 0,
             'sources': set(),
-            'keywords': Counter(),
-            'articles': []
+            'keywords': keyword_counter(),
+            'article_ids': array('q')
         })
         
-        for article in articles:
-            topic = self._classify_article_topic(article)
+        for article, topic in self._classified(articles, chunk_size):
             if topic:
                 topic_stats[topic]['count'] += 1
                 topic_stats[topic]['sources'].add(article.source)
-                topic_stats[topic]['articles'].append(article)
+                if article.id is not None:
+                    topic_stats[topic]['article_ids'].append(article.id)
                 
                 # 統計關鍵詞
                 if article.keywords:
                     keywords = article.keywords.split(',') if isinstance(article.keywords, str) else article.keywords
-                    for keyword in keywords:
-                        if keyword.strip():
-                            topic_stats[topic]['keywords'][keyword.strip()] += 1
+                    topic_stats[topic]['keywords'].update(keyword.strip() for keyword in keywords if keyword.strip())
         
         # 計算主題熱度
         topic_heat = self._calculate_topic_heat(topic_stats)
@@ -92,9 +106,82 @@ class TopicAnalyzer:
             'analysis_time': datetime.now()
         }
 
-    def _classify_article_topic(self, article):
+    def _classified(self, articles, chunk_size=1000):
+        """把 (文章, 內文) 每 chunk_size 篇交給批次分類器，回傳 (文章, 主題)"""
+        batch = []
+        for article, content in articles:
+            batch.append((article, content or getattr(article, 'content', None)))
+            if len(batch) >= chunk_size:
+                yield from self._classify_chunk(batch)
+                batch = []
+        if batch:
+            yield from self._classify_chunk(batch)
+
+    def _classify_chunk(self, batch):
+        topics = self.classify_batch((article.title, content) for article, content in batch)
+        return zip((article for article, _ in batch), topics)
+
+    def _analyze_topic_state(self):
+        """由增量主題統計產生與 analyze_topics 相同格式的結果"""
+        from analyzer.topic_state import load_topic_summary, topic_state_built
+
+        def load(conn):
+            # 主題統計由資料庫遷移建立，不在請求中掃描全部文章；尚未建立時回傳空結果
+            if not topic_state_built(conn):
+                logger.warning("主題統計尚未建立，請執行 python -m analyzer.topic_state --rebuild")
+                return {}
+            return load_topic_summary(conn)
+
+        summary = self._with_connection(load)
+        topic_stats = {
+            topic: {'count': stats['count'], 'sources': stats['sources'], 'keywords': stats['keywords']}
+            for topic, stats in summary.items()
+        }
+        topic_heat = self._rank_topics({
+            topic: (stats['count'], len(stats['sources']), stats['keyword_count'],
+                    [kw for kw, count in stats['keywords'].most_common(5)])
+            for topic, stats in summary.items()
+        })
+        return {
+            'topic_stats': topic_stats,
+            'topic_heat': topic_heat,
+            'analysis_time': datetime.now()
+        }
+
+    def _iter_articles(self, chunk_size=1000):
+        """依 chunk_size 分批串流讀取分類需要的欄位，回傳 (文章, 內文)
+
+        只查詢 id、標題、來源與關鍵詞，內文逐批從壓縮內容表載入，不建立完整的 ORM 物件。
+        """
+        from storage.content_store import load_contents
+        from storage.models import NewsArticle, db
+
+        query = db.select(
+            NewsArticle.id, NewsArticle.title, NewsArticle.source, NewsArticle.keywords
+        ).order_by(NewsArticle.id).execution_options(yield_per=chunk_size)
+        for rows in db.session.execute(query).partitions():
+            contents = self._with_connection(load_contents, [row.id for row in rows])
+            for row in rows:
+                yield row, contents.get(row.id)
+
+    def _classify_article_topic(self, article, content=None):
         """分類文章主題"""
-        text = (article.title + ' ' + (article.content or '')).lower()
+        return self.classify(article.title, content or getattr(article, 'content', None))
+
+    def classify_batch(self, articles):
+        """以稀疏矩陣一次分類多篇 (標題, 內文)，結果與逐篇呼叫 classify 相同"""
+        from analyzer.batch_classifier import BatchTopicClassifier
+
+        # 詞庫改變時重新建立分類器
+        fingerprint = repr(self.topic_keywords)
+        if getattr(self, '_batch_fingerprint', None) != fingerprint:
+            self._batch_classifier = BatchTopicClassifier(self.topic_keywords)
+            self._batch_fingerprint = fingerprint
+        return self._batch_classifier.classify(articles)
+
+    def classify(self, title, content=None):
+        """依標題與內文分類主題，沒有符合的關鍵詞時回傳「其他」"""
+        text = (title + ' ' + (content or '')).lower()
         
         topic_scores = {}
         
@@ -114,42 +201,93 @@ class TopicAnalyzer:
 
     def _calculate_topic_heat(self, topic_stats):
         """計算主題熱度"""
-        total_articles = sum(stats['count'] for stats in topic_stats.values())
+        return self._rank_topics({
+            topic: (stats['count'], len(stats['sources']), len(stats['keywords']),
+                    [kw for kw, count in stats['keywords'].most_common(5)])
+            for topic, stats in topic_stats.items()
+        })
+
+    def _rank_topics(self, summary):
+        """依 {主題: (文章數, 來源數, 關鍵詞數, 熱門關鍵詞)} 計算熱度並排序"""
+        total_articles = sum(counts[0] for counts in summary.values())
         
         topic_heat = {}
-        for topic, stats in topic_stats.items():
+        for topic, (article_count, source_count, keyword_count, top_keywords) in summary.items():
             # 計算熱度分數（基於文章數量、來源多樣性、關鍵詞豐富度）
-            article_ratio = stats['count'] / total_articles if total_articles > 0 else 0
-            source_diversity = len(stats['sources']) / 10  # 假設最多10個來源
-            keyword_richness = len(stats['keywords']) / 50  # 假設最多50個關鍵詞
+            article_ratio = article_count / total_articles if total_articles > 0 else 0
+            source_diversity = source_count / 10  # 假設最多10個來源
+            keyword_richness = keyword_count / 50  # 假設最多50個關鍵詞
             
             heat_score = (article_ratio * 0.5 + source_diversity * 0.3 + keyword_richness * 0.2) * 100
             
             topic_heat[topic] = {
                 'score': round(heat_score, 2),
-                'article_count': stats['count'],
-                'source_count': len(stats['sources']),
-                'keyword_count': len(stats['keywords']),
-                'top_keywords': [kw for kw, count in stats['keywords'].most_common(5)]
+                'article_count': article_count,
+                'source_count': source_count,
+                'keyword_count': keyword_count,
+                'top_keywords': top_keywords
             }
         
         # 按熱度分數排序
         return dict(sorted(topic_heat.items(), key=lambda x: x[1]['score'], reverse=True))
 
-    def extract_trending_keywords(self, articles, top_n=20):
-        """提取熱門關鍵詞"""
-        all_keywords = Counter()
+    def extract_trending_keywords(self, articles=None, top_n=20, approximate=False):
+        """提取熱門關鍵詞
+
+        approximate=True 時以固定大小的 KeywordSketch 近似計數，記憶體用量不隨不同關鍵詞數成長。
+        """
+        if articles is None:
+            # 沒有提供文章時直接在資料庫的關鍵詞關聯表上聚合
+            from storage.keywords import keyword_frequency
+            return self._with_connection(keyword_frequency, top_n, exclude=self.stop_words)
+
+        if approximate:
+            from analyzer.sketches import KeywordSketch
+            all_keywords = KeywordSketch(capacity=max(top_n * 10, 100))
+        else:
+            all_keywords = Counter()
         
         for article in articles:
             if article.keywords:
                 keywords = article.keywords.split(',') if isinstance(article.keywords, str) else article.keywords
-                for keyword in keywords:
-                    keyword = keyword.strip()
-                    if keyword and keyword not in self.stop_words:
-                        all_keywords[keyword] += 1
+                all_keywords.update(
+                    keyword for keyword in (keyword.strip() for keyword in keywords)
+                    if keyword and keyword not in self.stop_words
+                )
         
         return all_keywords.most_common(top_n)
 
+    def extract_keywords(self, texts, top_n=10):
+        """以全庫文件頻率計算 TF-IDF，批次擷取多篇文字的關鍵詞（見 analyzer/tfidf.py）"""
+        from analyzer.tfidf import extract_keywords
+        return self._with_connection(extract_keywords, texts, top_n)
+
+    def get_bursting_keywords(self, top_n=20):
+        """以滑動時間窗比較各關鍵詞最近與平常的出現次數，回傳突然增加的關鍵詞（見 analyzer/trending.py）"""
+        from analyzer.trending import trending_keywords
+        return self._with_connection(trending_keywords, top_n)
+
+    def discover_topics(self, top_terms=10):
+        """固定詞庫之外，由線上分群發現的主題群（見 analyzer/clustering.py）"""
+        from analyzer.clustering import topic_clusters
+        return self._with_connection(topic_clusters, top_terms)
+
+    def get_related_keywords(self, keyword, top_n=20):
+        """獲取與指定關鍵詞共同出現的關鍵詞"""
+        from storage.keywords import keyword_cooccurrence
+        return self._with_connection(keyword_cooccurrence, keyword, top_n)
+
+    def get_topic_top_keywords(self, top_n=5):
+        """獲取各主題的熱門關鍵詞"""
+        from storage.keywords import top_keywords_by_topic
+        return self._with_connection(top_keywords_by_topic, top_n)
+
+    def _with_connection(self, query, *args, **kwargs):
+        """在資料庫連線上執行 storage 模組的查詢"""
+        from storage.models import connection
+        with connection() as conn:
+            return query(conn, *args, **kwargs)
+
     def analyze_sentiment(self, text):
         """簡單的情感分析"""
         positive_words = ['好', '棒', '讚', '優秀', '成功', '勝利', '進步', '改善', '提升', '增加', '成長', '發展', '創新', '突破', '成就', '榮譽', '光榮', '驕傲', '滿意', '開心', '快樂', '興奮', '期待', '希望', '樂觀']
@@ -165,23 +303,15 @@ class TopicAnalyzer:
         else:
             return 'neutral'
 
-    def get_topic_timeline(self, topic, days=7):
+    def get_topic_timeline(self, topic, days=7, resolution='day'):
         """獲取主題時間線"""
-        from app import NewsArticle, db
-        from datetime import datetime, timedelta
-        
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        articles = NewsArticle.query.filter(
-            NewsArticle.topic == topic,
-            NewsArticle.publish_date >= start_date,
-            NewsArticle.publish_date <= end_date
-        ).order_by(NewsArticle.publish_date).all()
-        
-        timeline = defaultdict(int)
-        for article in articles:
-            date_key = article.publish_date.strftime('%Y-%m-%d')
-            timeline[date_key] += 1
-        
-        return dict(timeline)
+        return self.get_topic_timelines([topic], days, resolution)[topic]
+
+    def get_topic_timelines(self, topics=None, days=7, resolution='day'):
+        """一次取得多個主題的時間線，topics 省略時回傳所有主題
+
+        讀取寫入時維護的按小時、日、週彙總表（storage/rollups.py 的 topic_timeline），不掃描新聞表。
+        """
+        from storage.rollups import get_timeline_series
+
+        return self._with_connection(get_timeline_series, resolution, days, topics)
@@ -0,0 +1,307 @@
+"""TopicAnalyzer 的增量主題統計
+
+每篇文章寫入時就分類並累加到各主題的文章數、來源與關鍵詞計數，統計保存在資料庫中，
+重新啟動後仍然有效；TopicAnalyzer.analyze_topics() 只需讀取這些資料表。資料表與既有文章的統計由資料庫遷移 12 建立，
+封存分區的文章需執行 --rebuild 併入。
+
+用法：
+    from analyzer.topic_state import register_topic_state
+    register_topic_state()          # 應用程式啟動時註冊寫入擴充
+
+    python -m analyzer.topic_state instance/news.db --rebuild
+"""
+import argparse
+import logging
+import sqlite3
+from collections import Counter, namedtuple
+from datetime import datetime
+
+from analyzer.lexicon import lexicon_classifier, load_lexicon
+from storage.content_store import load_contents
+from storage.dates import format_datetime
+from storage.ingestion import register_ingest_hook
+from storage.sql import chunked_in_query
+
+logger = logging.getLogger(__name__)
+
+_Article = namedtuple('_Article', 'id title content source keywords')
+
+_analyzer = None
+
+
+def _default_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        from analyzer.topic_analyzer import TopicAnalyzer
+        _analyzer = TopicAnalyzer()
+    return _analyzer
+
+
+def create_topic_state_tables(conn):
+    """建立增量主題統計表"""
+    # 每篇文章目前計入的主題、來源與關鍵詞，文章更新時據此扣除舊的貢獻
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS topic_state_article (
+            article_id INTEGER PRIMARY KEY,
+            topic VARCHAR(100) NOT NULL,
+            source VARCHAR(100),
+            keywords TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS topic_state_count (
+            topic VARCHAR(100) PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS topic_state_source (
+            topic VARCHAR(100) NOT NULL,
+            source VARCHAR(100) NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (topic, source)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS topic_state_keyword (
+            topic VARCHAR(100) NOT NULL,
+            word VARCHAR(100) NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (topic, word)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS topic_state_meta (
+            key VARCHAR(50) PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+
+def _split(keywords):
+    if not keywords:
+        return []
+    words = keywords.split(',') if isinstance(keywords, str) else keywords
+    return [word.strip() for word in words if word.strip()]
+
+
+def _contributions(topic, source, keywords):
+    """一篇文章對各統計表的貢獻"""
+    keys = [('count', topic, '')]
+    if source:
+        keys.append(('source', topic, source))
+    keys.extend(('keyword', topic, word) for word in _split(keywords))
+    return keys
+
+
+def _apply_deltas(conn, deltas):
+    for table, column in (('count', None), ('source', 'source'), ('keyword', 'word')):
+        rows = [(topic, key, delta) for (kind, topic, key), delta in deltas.items() if kind == table and delta]
+        if not rows:
+            continue
+        if column is None:
+            conn.executemany('''
+                INSERT INTO topic_state_count (topic, count) VALUES (?, ?)
+                ON CONFLICT (topic) DO UPDATE SET count = count + excluded.count
+            ''', [(topic, delta) for topic, _, delta in rows])
+            conn.executemany('DELETE FROM topic_state_count WHERE topic = ? AND count <= 0',
+                             [(topic,) for topic, _, delta in rows if delta < 0])
+        else:
+            conn.executemany(f'''
+                INSERT INTO topic_state_{table} (topic, {column}, count) VALUES (?, ?, ?)
+                ON CONFLICT (topic, {column}) DO UPDATE SET count = count + excluded.count
+            ''', rows)
+            conn.executemany(f'DELETE FROM topic_state_{table} WHERE topic = ? AND {column} = ? AND count <= 0',
+                             [(topic, key) for topic, key, delta in rows if delta < 0])
+
+
+def apply_articles(conn, articles, analyzer=None):
+    """批次分類新寫入或更新的文章並調整主題統計（不提交交易）
+
+    articles 為含 id、title、content、source、keywords 的字典；同一篇文章重複套用時會先扣除舊的貢獻。
+    分類詞庫與批次重新分類相同，包含 Topic 資料表中啟用的自訂主題。
+    """
+    articles = list(articles)
+    if not articles:
+        return
+    lexicon = load_lexicon(conn, analyzer or _default_analyzer())
+
+    previous = {row[0]: row[1:] for row in chunked_in_query(
+        conn,
+        'SELECT article_id, topic, source, keywords FROM topic_state_article WHERE article_id IN ({placeholders})',
+        [article['id'] for article in articles]
+    )}
+
+    topics = lexicon_classifier(lexicon).classify((article['title'], article.get('content')) for article in articles)
+    deltas = Counter()
+    rows = []
+    for article, topic in zip(articles, topics):
+        old = previous.get(article['id'])
+        if old is not None:
+            for key in _contributions(*old):
+                deltas[key] -= 1
+        for key in _contributions(topic, article.get('source'), article.get('keywords')):
+            deltas[key] += 1
+        rows.append((article['id'], topic, article.get('source'), article.get('keywords')))
+
+    conn.executemany('''
+        INSERT OR REPLACE INTO topic_state_article (article_id, topic, source, keywords) VALUES (?, ?, ?, ?)
+    ''', rows)
+    _apply_deltas(conn, deltas)
+
+
+def reassign_topics(conn, topics):
+    """把已計入統計的文章改列到新主題並調整計數（不提交交易）
+
+    topics 為 {文章 id: 新主題}，供批次重新分類在同一交易中同步主題統計；尚未計入的文章略過。
+    """
+    previous = chunked_in_query(
+        conn,
+        'SELECT article_id, topic, source, keywords FROM topic_state_article WHERE article_id IN ({placeholders})',
+        list(topics)
+    )
+    deltas = Counter()
+    rows = []
+    for article_id, old_topic, source, keywords in previous:
+        topic = topics[article_id]
+        if topic == old_topic:
+            continue
+        for key in _contributions(old_topic, source, keywords):
+            deltas[key] -= 1
+        for key in _contributions(topic, source, keywords):
+            deltas[key] += 1
+        rows.append((topic, article_id))
+
+    conn.executemany('UPDATE topic_state_article SET topic = ? WHERE article_id = ?', rows)
+    _apply_deltas(conn, deltas)
+    return len(rows)
+
+
+def _ingest_hook(conn, articles, crawl_run_id=None):
+    # 資料表由資料庫遷移 12 建立
+    apply_articles(conn, articles)
+
+
+def register_topic_state(analyzer=None):
+    """註冊寫入擴充，之後每批寫入的文章都在同一交易中更新主題統計"""
+    if analyzer is not None:
+        global _analyzer
+        _analyzer = analyzer
+    register_ingest_hook('topic_state', _ingest_hook)
+
+
+def _iter_table(conn, table, chunk_size):
+    """依 id 分批讀取分類需要的欄位"""
+    last_id = 0
+    while True:
+        rows = conn.execute(f'''
+            SELECT id, title, content, source, keywords FROM {table}
+            WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        # 主資料表的內文在壓縮內容表，封存分區的內文則直接存在資料表中
+        contents = load_contents(conn, [row[0] for row in rows])
+        yield [_Article(row[0], row[1], contents.get(row[0], row[2]), row[3], row[4])._asdict() for row in rows]
+        last_id = rows[-1][0]
+
+
+def _apply_table(conn, table, analyzer, chunk_size):
+    total = 0
+    for articles in _iter_table(conn, table, chunk_size):
+        apply_articles(conn, articles, analyzer)
+        total += len(articles)
+    return total
+
+
+def _mark_built(conn):
+    conn.execute('''
+        INSERT INTO topic_state_meta (key, value) VALUES ('built_at', ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value
+    ''', (format_datetime(datetime.utcnow()),))
+
+
+def build_topic_state(conn, analyzer=None, chunk_size=1000):
+    """清除並由主資料表重新計算主題統計（不提交交易，供資料庫遷移使用）"""
+    for table in ('topic_state_article', 'topic_state_count', 'topic_state_source', 'topic_state_keyword'):
+        conn.execute(f'DELETE FROM {table}')
+    total = _apply_table(conn, 'news_article', analyzer, chunk_size)
+    _mark_built(conn)
+    return total
+
+
+def rebuild_topic_state(conn, analyzer=None, chunk_size=1000):
+    """清除並從主資料表與所有封存分區重新計算主題統計（會提交交易）"""
+    from storage.partitions import attach_partition, partitions_for_range
+
+    create_topic_state_tables(conn)
+    total = build_topic_state(conn, analyzer, chunk_size)
+    conn.commit()
+
+    # 封存分區需附加資料庫，無法與主資料表在同一交易中處理
+    for _, filename in partitions_for_range(conn):
+        with attach_partition(conn, filename) as alias:
+            total += _apply_table(conn, f'{alias}.news_article', analyzer, chunk_size)
+            conn.commit()
+
+    _mark_built(conn)
+    conn.commit()
+    logger.info(f"主題統計已重建，共 {total} 篇文章")
+    return total
+
+
+def topic_state_built(conn):
+    """主題統計是否已建立（資料庫遷移 12 或 --rebuild）；讀取端不會自行重建"""
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'topic_state_meta'"
+    ).fetchone() is None:
+        return False
+    return conn.execute("SELECT 1 FROM topic_state_meta WHERE key = 'built_at'").fetchone() is not None
+
+
+def load_topic_summary(conn, top_keywords=20):
+    """讀取各主題的文章數、來源、關鍵詞數與最常見的關鍵詞"""
+    summary = {
+        topic: {'count': count, 'sources': set(), 'keyword_count': 0, 'keywords': Counter()}
+        for topic, count in conn.execute('SELECT topic, count FROM topic_state_count')
+    }
+    for topic, source in conn.execute('SELECT topic, source FROM topic_state_source'):
+        if topic in summary:
+            summary[topic]['sources'].add(source)
+    for topic, keyword_count in conn.execute('SELECT topic, COUNT(*) FROM topic_state_keyword GROUP BY topic'):
+        if topic in summary:
+            summary[topic]['keyword_count'] = keyword_count
+    for topic, word, count in conn.execute('''
+        SELECT topic, word, count FROM (
+            SELECT topic, word, count,
+                   ROW_NUMBER() OVER (PARTITION BY topic ORDER BY count DESC, word) AS rank
+            FROM topic_state_keyword
+        ) WHERE rank <= ?
+    ''', (top_keywords,)):
+        if topic in summary:
+            summary[topic]['keywords'][word] = count
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='增量主題統計')
+    parser.add_argument('database', nargs='?', default='news.db')
+    parser.add_argument('--rebuild', action='store_true', help='從所有文章重新計算主題統計')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    try:
+        if args.rebuild:
+            print(f"✅ 已重新計算 {rebuild_topic_state(conn)} 篇文章的主題統計")
+        elif not topic_state_built(conn):
+            print("⚠️ 主題統計尚未建立，請加上 --rebuild 重新計算")
+            return
+        for topic, stats in sorted(load_topic_summary(conn, 5).items(), key=lambda item: -item[1]['count']):
+            print(f"{topic:<6} {stats['count']:>6} 篇  來源 {len(stats['sources'])}  "
+                  f"關鍵詞 {stats['keyword_count']}  {', '.join(stats['keywords'])}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""以滑動時間窗偵測關鍵詞爆量（趨勢關鍵詞）
+
+每個關鍵詞以環狀緩衝區保存最近 buckets 個固定長度時段（預設每小時一格、共 48 小時）的出現次數，
+最近 recent 個時段的次數與該詞在其餘時段的平均值（自己的基準）比較，分數高代表相對平常突然增加，
+而不只是出現次數多。追蹤的關鍵詞數量有上限，記憶體用量固定。
+
+計數由寫入擴充在新文章寫入時更新；程式啟動後第一次使用時，從資料庫載入時間窗內的文章關鍵詞。
+
+用法：
+    from analyzer.trending import register_trending, trending_keywords
+    register_trending()                 # 應用程式啟動時註冊寫入擴充
+    trending_keywords(conn, top_n=20)   # [{'keyword', 'score', 'recent', 'baseline'}, ...]
+"""
+import logging
+import math
+import threading
+from array import array
+from datetime import datetime
+
+from storage.dates import to_timestamp
+from storage.ingestion import register_ingest_hook
+from storage.keywords import split_keywords
+from storage.sql import chunked_in_query
+
+logger = logging.getLogger(__name__)
+
+
+class BurstDetector:
+    """關鍵詞爆量偵測器（執行緒安全）
+
+    bucket_seconds: 每個時段的秒數
+    buckets: 環狀緩衝區的時段數，即時間窗長度
+    recent: 視為「最近」的時段數，其餘時段作為基準
+    max_keywords: 追蹤的關鍵詞上限，超過時淘汰時間窗內次數最少的詞
+    min_count: 最近時段至少出現幾次才列入趨勢
+    """
+
+    def __init__(self, bucket_seconds=3600, buckets=48, recent=3, max_keywords=5000, min_count=3):
+        if not 0 < recent < buckets:
+            raise ValueError("recent 必須介於 0 與 buckets 之間")
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self.recent = recent
+        self.max_keywords = max_keywords
+        self.min_count = min_count
+        # 關鍵詞 -> [環狀緩衝區, 最後推進到的時段編號]
+        self._rings = {}
+        self._lock = threading.Lock()
+        self.warmed = False
+        # 載入時讀到的最大文章 id，之後寫入擴充只補上 id 更大的文章
+        self.loaded_through = 0
+
+    def _empty(self):
+        return array('l', [0]) * self.buckets
+
+    def _bucket(self, timestamp):
+        return timestamp // self.bucket_seconds
+
+    def _now(self, now=None):
+        # publish_ts 以不帶時區的本機時間換算，目前時間也要用同樣方式換算
+        return self._bucket(to_timestamp(datetime.now()) if now is None else now)
+
+    def _advance(self, entry, bucket):
+        """把關鍵詞的環狀緩衝區推進到 bucket，清除中間經過的時段"""
+        ring, last = entry
+        if bucket <= last:
+            return
+        if bucket - last >= self.buckets:
+            ring[:] = self._empty()
+        else:
+            for passed in range(last + 1, bucket + 1):
+                ring[passed % self.buckets] = 0
+        entry[1] = bucket
+
+    def add(self, keywords, timestamp, now=None):
+        """記錄一篇文章的關鍵詞；早於時間窗的文章忽略，晚於目前時間的視為目前時段"""
+        current = self._now(now)
+        bucket = min(self._bucket(timestamp), current)
+        if bucket <= current - self.buckets:
+            return
+        with self._lock:
+            for keyword in keywords:
+                entry = self._rings.get(keyword)
+                if entry is None:
+                    entry = self._rings[keyword] = [self._empty(), bucket]
+                # 緩衝區只能往前推進，較舊時段的計數直接寫入對應位置
+                self._advance(entry, bucket)
+                entry[0][bucket % self.buckets] += 1
+            if len(self._rings) > self.max_keywords * 1.2:
+                self._evict(current)
+
+    def _window(self, entry, current):
+        """(最近時段次數, 基準時段平均次數)，呼叫前須先推進到 current"""
+        ring = entry[0]
+        recent = sum(ring[(current - offset) % self.buckets] for offset in range(self.recent))
+        baseline = (sum(ring) - recent) / (self.buckets - self.recent)
+        return recent, baseline
+
+    def _evict(self, current):
+        """淘汰時間窗內次數最少的關鍵詞，保留 max_keywords 個"""
+        for entry in self._rings.values():
+            self._advance(entry, current)
+        keep = sorted(self._rings, key=lambda keyword: sum(self._rings[keyword][0]), reverse=True)
+        self._rings = {keyword: self._rings[keyword] for keyword in keep[:self.max_keywords]}
+
+    def score(self, recent, baseline):
+        """爆量分數：最近次數超出基準預期的程度，以預期值的平方根標準化（加 1 平滑新出現的詞）"""
+        expected = baseline * self.recent
+        return (recent - expected) / math.sqrt(expected + 1)
+
+    def top(self, top_n=20, now=None):
+        """爆量分數最高的關鍵詞"""
+        current = self._now(now)
+        results = []
+        with self._lock:
+            for keyword, entry in list(self._rings.items()):
+                self._advance(entry, current)
+                recent, baseline = self._window(entry, current)
+                if not recent and not baseline:
+                    # 已移出時間窗
+                    del self._rings[keyword]
+                    continue
+                if recent < self.min_count:
+                    continue
+                results.append({
+                    'keyword': keyword,
+                    'score': round(self.score(recent, baseline), 3),
+                    'recent': recent,
+                    'baseline': round(baseline, 3),
+                })
+        results.sort(key=lambda item: (-item['score'], item['keyword']))
+        return [item for item in results[:top_n] if item['score'] > 0]
+
+    def warm_up(self, conn, now=None):
+        """從資料庫載入時間窗內所有文章的關鍵詞"""
+        since = (self._now(now) - self.buckets + 1) * self.bucket_seconds
+        rows = conn.execute('''
+            SELECT a.id, a.publish_ts, k.word FROM news_article a
+            JOIN article_keyword ak ON ak.article_id = a.id
+            JOIN keyword k ON k.id = ak.keyword_id
+            WHERE a.publish_ts >= ?
+        ''', (since,)).fetchall()
+        for _, timestamp, word in rows:
+            self.add([word], timestamp, now)
+        self.loaded_through = max((row[0] for row in rows), default=0)
+        self.warmed = True
+        logger.info(f"趨勢偵測已載入 {len(rows)} 筆關鍵詞紀錄")
+
+
+_detector = BurstDetector()
+_warm_up_lock = threading.Lock()
+
+
+def get_detector():
+    return _detector
+
+
+def _ensure_warm(conn):
+    with _warm_up_lock:
+        if not _detector.warmed:
+            _detector.warm_up(conn)
+            return True
+    return False
+
+
+def _new_article_ids(conn, articles, crawl_run_id):
+    """寫入擴充也會收到內容更新的既有文章，只有這次爬取新增的文章才計入"""
+    return {row[0] for row in chunked_in_query(
+        conn, 'SELECT id FROM news_article WHERE id IN ({placeholders}) AND first_crawl_run_id IS ?',
+        [article['id'] for article in articles], [crawl_run_id]
+    )}
+
+
+def _ingest_hook(conn, articles, crawl_run_id=None):
+    new_ids = _new_article_ids(conn, articles, crawl_run_id)
+    added = [(article['id'], split_keywords(article.get('keywords')), article['publish_ts'])
+             for article in articles if article['id'] in new_ids and article.get('publish_ts') is not None]
+
+    def apply():
+        # 提交後才更新計數，交易回滾時不會留下不存在的文章；
+        # 此時才第一次載入的話已包含這批文章，以 loaded_through 避免重複計入
+        _ensure_warm(conn)
+        for article_id, keywords, timestamp in added:
+            if article_id > _detector.loaded_through:
+                _detector.add(keywords, timestamp)
+
+    return apply
+
+
+def register_trending():
+    """註冊寫入擴充，新文章寫入時更新關鍵詞的時段計數"""
+    register_ingest_hook('trending', _ingest_hook)
+
+
+def trending_keywords(conn, top_n=20):
+    """目前爆量的關鍵詞，程式啟動後第一次呼叫時從資料庫載入時間窗內的文章"""
+    _ensure_warm(conn)
+    return _detector.top(top_n)
@@ -0,0 +1,153 @@
+"""各應用程式版本共用的寫入擴充與 API 路由
+
+每個應用程式只需：
+    app = Flask(__name__)
+    init_app(app)
+    init_analysis(app, 'news', 'topics')      # 省略路由名稱時包含全部共用端點
+
+寫入擴充（主題統計、TF-IDF、主題分群、爆量關鍵詞）只在這裡註冊；回應格式與共用端點不同的版本
+（例如 analyzer/app.py 的 /api/news）在自己的模組定義，不加入同名的共用路由。
+"""
+from flask import Blueprint, jsonify, request
+
+from analyzer.clustering import register_clustering, topic_clusters
+from analyzer.tfidf import register_tfidf
+from analyzer.topic_state import register_topic_state
+from analyzer.trending import register_trending, trending_keywords
+from storage.models import connection
+from storage.pagination import fetch_news_page
+from storage.rollups import TIMELINE_RESOLUTIONS, get_counts, get_timeline_series
+from storage.search import search_articles
+
+
+def register_analysis_hooks():
+    """註冊所有分析用的寫入擴充（同名擴充會被取代，重複呼叫不會重複註冊）"""
+    register_topic_state()
+    register_tfidf()
+    register_clustering()
+    register_trending()
+
+
+def get_news():
+    """獲取新聞列表"""
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    # 主題以部分字串比對，topic=經濟 也包含「經濟,科技」
+    topic = request.args.get('topic')
+    # 非數字時使用預設值，頁碼與每頁筆數至少為 1
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, request.args.get('per_page', 20, type=int))
+
+    # 以 (publish_date, id) 鍵集分頁，傳入上一頁的 next_cursor 取得下一頁
+    cursor = request.args.get('cursor')
+    try:
+        with connection() as conn:
+            result = fetch_news_page(
+                conn, topic, start_date, end_date,
+                cursor=cursor,
+                per_page=per_page,
+                offset=0 if cursor else (page - 1) * per_page
+            )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    total = result['total']
+    result['pages'] = (total + result['per_page'] - 1) // result['per_page'] if total is not None else None
+    result['current_page'] = page
+    return jsonify(result)
+
+
+def search_news():
+    """全文搜尋新聞"""
+    query = request.args.get('q', '').strip()
+    # 非數字時使用預設值，頁碼與每頁筆數至少為 1
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, request.args.get('per_page', 20, type=int))
+    if not query:
+        return jsonify({'error': '請提供搜尋關鍵詞'}), 400
+
+    try:
+        with connection() as conn:
+            articles = search_articles(
+                conn, query,
+                start_date=request.args.get('start_date'),
+                end_date=request.args.get('end_date'),
+                topic=request.args.get('topic'),
+                limit=per_page,
+                offset=(page - 1) * per_page
+            )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'query': query,
+        'articles': articles,
+        'current_page': page
+    })
+
+
+def get_topics():
+    """獲取主題統計"""
+    # 讀取寫入時同步維護的統計彙總表，不必每次掃描整個新聞表
+    with connection() as conn:
+        topics = get_counts(conn, 'topic')
+
+    return jsonify([{'name': name, 'count': count} for name, count in topics.items()])
+
+
+def get_timeline():
+    """一次取得多個主題的時間線（topics 以逗號分隔，省略時回傳所有主題）"""
+    resolution = request.args.get('resolution', 'day')
+    days = int(request.args.get('days', 7))
+    topics = [topic.strip() for topic in request.args.get('topics', '').split(',') if topic.strip()]
+    if resolution not in TIMELINE_RESOLUTIONS:
+        return jsonify({'error': f"resolution 必須是 {', '.join(TIMELINE_RESOLUTIONS)}"}), 400
+
+    # 讀取寫入時維護的時間線彙總表，只需一次索引範圍讀取
+    with connection() as conn:
+        timeline = get_timeline_series(conn, resolution, days, topics or None)
+
+    return jsonify({'resolution': resolution, 'days': days, 'topics': timeline})
+
+
+def get_trending():
+    """爆量關鍵詞：最近幾小時的出現次數相對於各詞自己的基準突然增加"""
+    top_n = int(request.args.get('top', 20))
+    with connection() as conn:
+        keywords = trending_keywords(conn, top_n)
+    return jsonify(keywords)
+
+
+def get_clusters():
+    """線上分群發現的主題：各群的代表詞與最近的文章標題"""
+    # 非數字時使用預設值，超出範圍的值由 clusters() 限制在 1 到 n_features
+    top_terms = request.args.get('top_terms', 10, type=int)
+    with connection() as conn:
+        clusters = topic_clusters(conn, top_terms)
+    return jsonify(clusters)
+
+
+# 路由名稱: (網址, 處理函式)
+ROUTES = {
+    'news': ('/api/news', get_news),
+    'search': ('/api/search', search_news),
+    'topics': ('/api/topics', get_topics),
+    'timeline': ('/api/timeline', get_timeline),
+    'trending': ('/api/trending', get_trending),
+    'clusters': ('/api/clusters', get_clusters),
+}
+
+
+def api_blueprint(*routes):
+    """包含指定共用路由的 Blueprint，省略時包含全部"""
+    blueprint = Blueprint('api', __name__)
+    for name in routes or ROUTES:
+        rule, view = ROUTES[name]
+        blueprint.add_url_rule(rule, view_func=view)
+    return blueprint
+
+
+def init_analysis(app, *routes):
+    """註冊寫入擴充並掛上共用的 API 路由"""
+    register_analysis_hooks()
+    app.register_blueprint(api_blueprint(*routes))
@@ -1,6 +1,5 @@
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
-import jieba
 import numpy as np
 from PIL import Image
 import os
@@ -9,6 +8,8 @@ from collections import Counter
 import logging
 import time
 
+from storage.token_cache import cut_many
+
 logger = logging.getLogger(__name__)
 
 class WordCloudGenerator:
@@ -58,11 +59,9 @@ class WordCloudGenerator:
                           background_color='white', colormap='viridis'):
         """生成文字雲"""
         try:
-            # 合併所有文字
-            combined_text = ' '.join(texts) if isinstance(texts, list) else texts
-            
-            # 使用jieba分詞
-            words = jieba.lcut(combined_text)
+            # 逐篇分詞（經由分詞快取，已分詞過的文章不再重算），結果與合併後分詞相同
+            texts = texts if isinstance(texts, list) else [texts]
+            words = [word for tokens in cut_many(texts) for word in tokens]
             
             # 過濾停用詞和短詞
             filtered_words = []
@@ -144,12 +143,13 @@ class WordCloudGenerator:
     def generate_topic_wordcloud(self, topic, articles, width=800, height=600):
         """為特定主題生成文字雲"""
         try:
-            # 提取該主題的所有文章文字
+            # 提取該主題的所有文章文字，內文從壓縮內容表載入（news_article.content 已不存放內文）
+            articles = [article for article in articles if article.topic == topic]
+            contents = self._load_contents([article.id for article in articles])
             texts = []
             for article in articles:
-                if article.topic == topic:
-                    text = article.title + ' ' + (article.content or '')
-                    texts.append(text)
+                text = article.title + ' ' + (contents.get(article.id) or '')
+                texts.append(text)
             
             if not texts:
                 return self._generate_default_wordcloud()
@@ -160,6 +160,13 @@ class WordCloudGenerator:
             logger.error(f"生成主題文字雲時發生錯誤: {e}")
             return self._generate_default_wordcloud()
 
+    def _load_contents(self, article_ids):
+        """從壓縮內容表載入文章內文（需在應用程式情境中呼叫）"""
+        from storage.content_store import load_contents
+        from storage.models import connection
+        with connection() as conn:
+            return load_contents(conn, article_ids)
+
     def generate_comparison_wordcloud(self, topics_data, width=800, height=600):
         """生成比較文字雲（多個主題並排顯示）"""
         try:
@@ -184,8 +191,8 @@ class WordCloudGenerator:
                     break
                 
                 # 生成該主題的文字雲
-                combined_text = ' '.join(texts) if isinstance(texts, list) else texts
-                words = jieba.lcut(combined_text)
+                texts = texts if isinstance(texts, list) else [texts]
+                words = [word for tokens in cut_many(texts) for word in tokens]
                 
                 filtered_words = []
                 for word in words:
@@ -0,0 +1,97 @@
+"""寫入效能基準測試：逐筆查詢寫入 vs 批次寫入
+
+兩種做法都經由 upsert_articles 寫入，內文壓縮、全文索引、關鍵詞關聯、統計彙總與寫入擴充完全相同，
+差別只在逐筆做法每篇文章各自查詢與寫入。預設不註冊寫入擴充，加上 --hooks 時兩者都啟用應用程式的分析擴充。
+
+用法：
+    python benchmarks/ingestion_benchmark.py --sizes 10000 100000
+    python benchmarks/ingestion_benchmark.py --sizes 10000 --hooks
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import jieba
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage.ingestion import INGEST_HOOKS, run_after_commit, upsert_articles
+from storage.migrations import migrate
+from storage.token_cache import configure_token_cache
+
+
+def generate_articles(count, seed_date=datetime(2025, 1, 1)):
+    """產生測試用文章"""
+    topics = ['政治', '經濟', '社會', '國際', '科技', '體育', '娛樂', '環境']
+    for i in range(count):
+        yield {
+            'title': f'測試新聞標題 {i}：{topics[i % len(topics)]}議題最新發展',
+            'content': f'這是第 {i} 篇測試新聞的內容，' * 20,
+            'source': f'來源{i % 30}',
+            'url': f'https://news.example.com/{i // 1000}/article-{i}?utm_source=bench',
+            'publish_date': seed_date + timedelta(minutes=i),
+            'topic': topics[i % len(topics)],
+            'keywords': ','.join(topics[j % len(topics)] for j in range(i, i + 3))
+        }
+
+
+def naive_ingest(conn, articles):
+    """舊做法：每篇文章各查一次是否存在，再逐筆寫入（附帶的寫入與批次做法相同，最後一次提交）"""
+    actions = []
+    for article in articles:
+        upsert_articles(conn, [article], chunk_size=1, commit=False, after_commit=actions)
+    conn.commit()
+    run_after_commit(actions)
+
+
+def run_case(name, size, ingest):
+    """在全新的資料庫上執行一次首次寫入與一次重複寫入"""
+    # 每個案例使用空的分詞快取，不沿用前一個案例已分詞的文字
+    configure_token_cache(None)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        migrate(conn)
+
+        started = time.perf_counter()
+        ingest(conn, generate_articles(size))
+        first = time.perf_counter() - started
+
+        started = time.perf_counter()
+        ingest(conn, generate_articles(size))
+        repeat = time.perf_counter() - started
+
+        total = conn.execute('SELECT COUNT(*) FROM news_article').fetchone()[0]
+        conn.close()
+
+    print(f"{name:<8} {size:>8} 篇  首次 {first:8.2f}s ({size / first:9.0f} 篇/秒)  "
+          f"重複 {repeat:8.2f}s ({size / repeat:9.0f} 篇/秒)  資料表 {total} 筆")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='新聞寫入效能基準測試')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--naive-max', type=int, default=10000,
+                        help='逐筆寫入只跑到此筆數，避免大資料量時耗時過久')
+    parser.add_argument('--hooks', action='store_true', help='兩種做法都啟用應用程式的分析寫入擴充')
+    args = parser.parse_args()
+
+    if args.hooks:
+        from analyzer.web import register_analysis_hooks
+        register_analysis_hooks()
+    print(f"寫入擴充: {', '.join(INGEST_HOOKS) or '無'}")
+    # 先載入分詞詞典，不計入第一個案例的時間
+    jieba.initialize()
+
+    for size in args.sizes:
+        if size <= args.naive_max:
+            run_case('逐筆', size, naive_ingest)
+        run_case('批次', size, lambda conn, articles: upsert_articles(conn, articles, chunk_size=args.chunk_size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""並行寫入基準測試：每個爬取執行緒各自寫入 vs 單一寫入執行緒
+
+用法：
+    python benchmarks/writer_benchmark.py --threads 1 4 16 --batches 20 --batch-size 50
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ingestion_benchmark import generate_articles
+from storage.ingestion import ingest_articles
+from storage.migrations import migrate
+from storage.sqlite_config import BUSY_TIMEOUT, configure_connection
+from storage.writer import IngestWriter
+
+
+def connect(path):
+    return configure_connection(sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False))
+
+
+def crawl_batches(worker, batches, batch_size):
+    """每個爬取執行緒產生的文章批次，網址不與其他執行緒重複"""
+    articles = list(generate_articles((worker + 1) * batches * batch_size))[worker * batches * batch_size:]
+    return [articles[i:i + batch_size] for i in range(0, len(articles), batch_size)]
+
+
+def per_thread_writes(path, threads, batches, batch_size):
+    """舊做法：每個爬取執行緒開自己的連線寫入，互相爭奪寫入鎖"""
+    errors = []
+
+    def work(worker):
+        conn = connect(path)
+        try:
+            for batch in crawl_batches(worker, batches, batch_size):
+                ingest_articles(conn, batch)
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    return run_threads(work, threads), errors
+
+
+def single_writer(path, threads, batches, batch_size):
+    """所有爬取執行緒把文章交給同一條寫入執行緒"""
+    writer = IngestWriter(lambda: connect(path))
+    errors = []
+
+    def work(worker):
+        try:
+            futures = [writer.submit(batch) for batch in crawl_batches(worker, batches, batch_size)]
+            for future in futures:
+                future.result()
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    elapsed = run_threads(work, threads)
+    writer.close()
+    return elapsed, errors
+
+
+def run_threads(work, threads):
+    workers = [threading.Thread(target=work, args=(worker,)) for worker in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+
+def run_case(name, strategy, threads, batches, batch_size):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = connect(path)
+        migrate(conn)
+        conn.close()
+
+        elapsed, errors = strategy(path, threads, batches, batch_size)
+
+        conn = sqlite3.connect(path)
+        total = conn.execute('SELECT COUNT(*) FROM news_article').fetchone()[0]
+        conn.close()
+
+    print(f"{name:<10} {threads:>3} 執行緒  {elapsed:8.2f}s ({total / elapsed:8.0f} 篇/秒)  "
+          f"資料表 {total} 筆  鎖定錯誤 {len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='並行寫入基準測試')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--batches', type=int, default=20, help='每個執行緒提交的批次數')
+    parser.add_argument('--batch-size', type=int, default=50, help='每個批次的文章數')
+    args = parser.parse_args()
+
+    for threads in args.threads:
+        run_case('各自寫入', per_thread_writes, threads, args.batches, args.batch_size)
+        run_case('單一寫入', single_writer, threads, args.batches, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
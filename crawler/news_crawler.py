@@ -3,17 +3,21 @@ from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 import time
 import random
-import jieba
 import re
 from fake_useragent import UserAgent
 import logging
 
+from storage.token_cache import cut_many
+
 # 設定日誌
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class NewsCrawler:
-    def __init__(self):
+    def __init__(self, keyword_extractor=None):
+        # 批次擷取關鍵詞的函式（例如 analyzer.tfidf.TfidfKeywordExtractor(...).extract），
+        # 接收文字列表並回傳對應的關鍵詞列表；未提供時使用詞頻
+        self.keyword_extractor = keyword_extractor
         self.ua = UserAgent()
         self.session = requests.Session()
         self.session.headers.update({
@@ -164,6 +168,12 @@ class NewsCrawler:
                 except Exception as e:
                     logger.warning(f"提取文章時發生錯誤: {e}")
                     continue
+            
+            # 同一網站的文章一次查詢文件頻率擷取關鍵詞
+            if self.keyword_extractor is not None and articles:
+                texts = [article['title'] + ' ' + (article['content'] or '') for article in articles]
+                for article, keywords in zip(articles, self.keyword_extractor(texts)):
+                    article['keywords'] = keywords
                     
         except Exception as e:
             logger.error(f"爬取網站時發生錯誤: {e}")
@@ -203,8 +213,8 @@ class NewsCrawler:
             # 提取文章內容
             content = self._extract_content(link)
             
-            # 提取關鍵詞
-            keywords = self._extract_keywords(title + ' ' + (content or ''))
+            # 提取關鍵詞（有 keyword_extractor 時由 _crawl_site 整批擷取）
+            keywords = self._extract_keywords(title, content) if self.keyword_extractor is None else []
             
             return {
                 'title': title,
@@ -285,13 +295,14 @@ class NewsCrawler:
         
         return None
 
-    def _extract_keywords(self, text):
-        """提取關鍵詞"""
-        if not text:
+    def _extract_keywords(self, *texts):
+        """提取關鍵詞（標題與內文分開分詞，與 TF-IDF 寫入擴充共用分詞快取）"""
+        texts = [text for text in texts if text]
+        if not texts:
             return []
         
-        # 使用jieba分詞
-        words = jieba.lcut(text)
+        # 使用jieba分詞（經由分詞快取）
+        words = [word for tokens in cut_many(texts) for word in tokens]
         
         # 過濾停用詞和短詞
         stop_words = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一個', '上', '也', '很', '到', '說', '要', '去', '你', '會', '著', '沒有', '看', '好', '自己', '這', '那', '什麼', '可以', '因為', '所以', '但是', '如果', '或者', '而且', '然後', '因為', '所以', '但是', '如果', '或者', '而且', '然後'}
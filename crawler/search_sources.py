@@ -0,0 +1,73 @@
+import threading
+import time
+from urllib.parse import quote
+
+# 已註冊的搜尋來源（依註冊順序排列）
+SEARCH_SOURCES = {}
+
+
+class RateLimiter:
+    """限制單一搜尋來源的請求間隔與同時連線數"""
+
+    def __init__(self, min_interval=1.0, max_concurrent=1):
+        self.min_interval = min_interval
+        self.max_concurrent = max_concurrent
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def __enter__(self):
+        self._semaphore.acquire()
+        # 預約下一個可用的請求時間，避免同一來源的請求擠在一起
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._semaphore.release()
+        return False
+
+
+def register_search_source(key, name, search_url, base_url, parser=None,
+                           min_interval=1.0, max_concurrent=1, timeout=10):
+    """註冊搜尋來源，可直接傳入 parser 或當作裝飾器使用
+
+    search_url 以 {keyword} 作為關鍵詞佔位符；parser 的簽名為
+    parser(crawler, soup, source, keyword)，回傳文章字典列表。
+    """
+    def decorator(func):
+        SEARCH_SOURCES[key] = {
+            'key': key,
+            'name': name,
+            'search_url': search_url,
+            'base_url': base_url,
+            'parser': func,
+            'timeout': timeout,
+            'rate_limiter': RateLimiter(min_interval, max_concurrent)
+        }
+        return func
+
+    if parser is not None:
+        return decorator(parser)
+    return decorator
+
+
+def unregister_search_source(key):
+    """移除已註冊的搜尋來源"""
+    SEARCH_SOURCES.pop(key, None)
+
+
+def get_search_sources(keys=None):
+    """取得搜尋來源列表，未指定時回傳全部"""
+    if keys is None:
+        return list(SEARCH_SOURCES.values())
+    return [SEARCH_SOURCES[key] for key in keys if key in SEARCH_SOURCES]
+
+
+def build_search_url(source, keyword):
+    """依來源的網址模板組出搜尋網址"""
+    return source['search_url'].format(keyword=quote(keyword))
@@ -0,0 +1 @@
+# 儲存模組初始化檔案
@@ -0,0 +1,274 @@
+import argparse
+import logging
+import sqlite3
+import zlib
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import jieba
+
+from storage.dates import format_datetime
+from storage.sql import chunked_in_query
+
+logger = logging.getLogger(__name__)
+
+# 有安裝 zstandard 時使用 zstd，否則使用標準庫的 zlib
+DEFAULT_CODEC = 'zstd' if zstandard is not None else 'zlib'
+ZSTD_LEVEL = 9
+ZLIB_LEVEL = 9
+
+# zlib 的預設字典最多只能使用 32KB 的視窗
+DICTIONARY_SIZE = 32 * 1024
+
+# 累積到這麼多篇文章才自動訓練第一個字典
+DICTIONARY_MIN_SAMPLES = 200
+
+
+def create_content_tables(conn):
+    """建立壓縮內容表與共用壓縮字典表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS content_dictionary (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data BLOB NOT NULL,
+            sample_count INTEGER NOT NULL,
+            created_at DATETIME NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS article_content (
+            article_id INTEGER PRIMARY KEY,
+            codec VARCHAR(10) NOT NULL,
+            dictionary_id INTEGER,
+            raw_size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+    ''')
+
+
+def build_dictionary(texts, size=DICTIONARY_SIZE):
+    """以新聞內文中常見的詞與詞組建立預設字典
+
+    壓縮器從字典尾端找匹配的距離最短，因此價值最高（出現次數 × 位元組數）的片段放在最後。
+    """
+    scores = Counter()
+    for text in texts:
+        tokens = [token for token in jieba.lcut(text, HMM=False) if token.strip()]
+        for index, token in enumerate(tokens):
+            if len(token) > 1:
+                scores[token] += 1
+            if index:
+                scores[tokens[index - 1] + token] += 1
+
+    pieces = []
+    total = 0
+    for piece, count in scores.most_common():
+        if count < 2:
+            break
+        data = piece.encode('utf-8')
+        if total + len(data) > size:
+            continue
+        pieces.append(data)
+        total += len(data)
+    return b''.join(reversed(pieces))
+
+
+def train_dictionary(conn, sample_size=1000):
+    """從最近的文章內容訓練新的壓縮字典並存入資料庫，回傳字典 id（沒有內容時回傳 None）"""
+    rows = conn.execute('''
+        SELECT article_id FROM article_content ORDER BY article_id DESC LIMIT ?
+    ''', (sample_size,)).fetchall()
+    texts = [text for text in load_contents(conn, [row[0] for row in rows]).values() if text]
+    texts += [row[0] for row in conn.execute('''
+        SELECT content FROM news_article WHERE content IS NOT NULL ORDER BY id DESC LIMIT ?
+    ''', (max(sample_size - len(texts), 0),))]
+    if not texts:
+        return None
+
+    data = build_dictionary(texts)
+    if not data:
+        return None
+    cursor = conn.execute(
+        'INSERT INTO content_dictionary (data, sample_count, created_at) VALUES (?, ?, ?)',
+        (data, len(texts), format_datetime(datetime.utcnow()))
+    )
+    logger.info(f"以 {len(texts)} 篇文章訓練壓縮字典 {cursor.lastrowid}（{len(data)} bytes）")
+    return cursor.lastrowid
+
+
+def _dictionary(conn, dictionary_id):
+    if dictionary_id is None:
+        return None
+    row = conn.execute('SELECT data FROM content_dictionary WHERE id = ?', (dictionary_id,)).fetchone()
+    return row[0] if row else None
+
+
+@lru_cache(maxsize=8)
+def _zstd_dictionary(dictionary):
+    return zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+
+
+def ensure_dictionary(conn, min_samples=DICTIONARY_MIN_SAMPLES):
+    """還沒有字典且文章數足夠時訓練第一個字典，並重新壓縮既有內容（不提交交易）"""
+    if latest_dictionary_id(conn) is not None:
+        return None
+    if conn.execute('SELECT COUNT(*) FROM article_content').fetchone()[0] < min_samples:
+        return None
+    dictionary_id = train_dictionary(conn)
+    if dictionary_id is not None:
+        recompress_contents(conn, dictionary_id)
+    return dictionary_id
+
+
+def latest_dictionary_id(conn):
+    """目前用來壓縮新內容的字典 id"""
+    return conn.execute('SELECT MAX(id) FROM content_dictionary').fetchone()[0]
+
+
+def compress(text, codec=DEFAULT_CODEC, dictionary=None):
+    """壓縮文字內容"""
+    data = text.encode('utf-8')
+    if codec == 'zstd':
+        dict_data = _zstd_dictionary(dictionary) if dictionary else None
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dict_data).compress(data)
+    compressor = zlib.compressobj(ZLIB_LEVEL, zdict=dictionary) if dictionary else zlib.compressobj(ZLIB_LEVEL)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(data, codec, dictionary=None):
+    """解壓縮文字內容"""
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('此內容以 zstd 壓縮，請先執行 pip install zstandard')
+        dict_data = _zstd_dictionary(dictionary) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(data).decode('utf-8')
+    decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return (decompressor.decompress(data) + decompressor.flush()).decode('utf-8')
+
+
+def store_contents(conn, contents, dictionary_id=None):
+    """壓縮並寫入文章內容，contents 為 (id, 內容) 序列；內容為空時刪除（不提交交易）"""
+    contents = list(contents)
+    if not contents:
+        return
+    if dictionary_id is None:
+        dictionary_id = latest_dictionary_id(conn)
+    dictionary = _dictionary(conn, dictionary_id)
+
+    conn.executemany(
+        'DELETE FROM article_content WHERE article_id = ?',
+        [(article_id,) for article_id, content in contents if not content]
+    )
+    conn.executemany('''
+        INSERT OR REPLACE INTO article_content (article_id, codec, dictionary_id, raw_size, data)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(
+        article_id, DEFAULT_CODEC, dictionary_id, len(content.encode('utf-8')),
+        compress(content, DEFAULT_CODEC, dictionary)
+    ) for article_id, content in contents if content])
+
+
+def load_contents(conn, article_ids):
+    """批次讀取並解壓縮文章內容，回傳 {id: 內容}；沒有內容的文章不會出現在結果中"""
+    contents = {}
+    dictionaries = {}
+    for article_id, codec, dictionary_id, data in chunked_in_query(
+        conn,
+        'SELECT article_id, codec, dictionary_id, data FROM article_content WHERE article_id IN ({placeholders})',
+        article_ids
+    ):
+        if dictionary_id not in dictionaries:
+            dictionaries[dictionary_id] = _dictionary(conn, dictionary_id)
+        contents[article_id] = decompress(data, codec, dictionaries[dictionary_id])
+    return contents
+
+
+def load_content(conn, article_id):
+    """讀取單篇文章內容"""
+    return load_contents(conn, [article_id]).get(article_id)
+
+
+def delete_contents(conn, article_ids):
+    """刪除文章內容（不提交交易）"""
+    conn.executemany('DELETE FROM article_content WHERE article_id = ?', [(article_id,) for article_id in article_ids])
+
+
+def move_inline_contents(conn, batch_size=1000):
+    """把仍存在 news_article.content 的內容搬到壓縮內容表（不提交交易）"""
+    total = 0
+    last_id = 0
+    while True:
+        rows = conn.execute('''
+            SELECT id, content FROM news_article
+            WHERE id > ? AND content IS NOT NULL
+            ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        store_contents(conn, rows)
+        conn.executemany('UPDATE news_article SET content = NULL WHERE id = ?', [(row[0],) for row in rows])
+        last_id = rows[-1][0]
+        total += len(rows)
+    return total
+
+
+def recompress_contents(conn, dictionary_id, batch_size=1000):
+    """以指定字典重新壓縮所有內容（不提交交易）"""
+    total = 0
+    last_id = 0
+    while True:
+        ids = [row[0] for row in conn.execute('''
+            SELECT article_id FROM article_content
+            WHERE article_id > ? AND (dictionary_id IS NULL OR dictionary_id != ? OR codec != ?)
+            ORDER BY article_id LIMIT ?
+        ''', (last_id, dictionary_id, DEFAULT_CODEC, batch_size))]
+        if not ids:
+            break
+        store_contents(conn, load_contents(conn, ids).items(), dictionary_id)
+        last_id = ids[-1]
+        total += len(ids)
+    return total
+
+
+def content_stats(conn):
+    """壓縮前後的總大小"""
+    count, raw_size, stored_size = conn.execute(
+        'SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(length(data)), 0) FROM article_content'
+    ).fetchone()
+    return {'articles': count, 'raw_bytes': raw_size, 'stored_bytes': stored_size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文章內容壓縮儲存')
+    parser.add_argument('database', nargs='?', default='news.db')
+    parser.add_argument('--train', action='store_true', help='以目前的文章重新訓練字典並重新壓縮所有內容')
+    parser.add_argument('--vacuum', action='store_true', help='搬移內容後回收資料庫檔案空間')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    try:
+        create_content_tables(conn)
+        moved = move_inline_contents(conn)
+        if args.train:
+            dictionary_id = train_dictionary(conn)
+            if dictionary_id is not None:
+                print(f"✅ 已重新壓縮 {recompress_contents(conn, dictionary_id)} 篇文章")
+        conn.commit()
+        if args.vacuum:
+            conn.execute('VACUUM')
+
+        stats = content_stats(conn)
+        ratio = stats['stored_bytes'] / stats['raw_bytes'] if stats['raw_bytes'] else 0
+        print(f"搬移 {moved} 篇；共 {stats['articles']} 篇，原始 {stats['raw_bytes']} bytes，"
+              f"壓縮後 {stats['stored_bytes']} bytes（{ratio:.0%}），編碼 {DEFAULT_CODEC}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import calendar
+from datetime import datetime, date, timedelta
+from email.utils import parsedate_to_datetime
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SECONDS_PER_DAY = 86400
+
+# 爬蟲與舊資料中出現過的日期格式
+_FORMATS = (DATETIME_FORMAT, '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d', '%Y/%m/%d',
+            '%Y/%m/%d %H:%M', '%Y/%m/%d %H:%M:%S', '%Y年%m月%d日', '%Y年%m月%d日 %H:%M')
+
+
+def parse_datetime(value):
+    """把 datetime/date/字串解析成不帶時區的 datetime，無法解析時回傳 None
+
+    帶時區的時間轉成本機時間，與爬蟲使用的 datetime.now() 一致。
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+
+    value = str(value).strip()
+    if not value:
+        return None
+    for fmt in _FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    # ISO 8601（含時區）與 RSS 使用的 RFC 2822 格式
+    for parse in (datetime.fromisoformat, parsedate_to_datetime):
+        try:
+            return parse_datetime(parse(value))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def format_datetime(value):
+    """將 datetime/date/字串統一成與 SQLAlchemy 相容的日期時間字串，無法解析的字串原樣回傳"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        return None if value is None else str(value).strip()
+    return parsed.strftime(DATETIME_FORMAT)
+
+
+def to_timestamp(value):
+    """日期時間轉成整數秒數（publish_ts 欄位），無法解析時回傳 None
+
+    不帶時區的時間視為 UTC 換算，與 SQLite 的 strftime('%s', publish_date) 相同，兩者可互相對照。
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        return None
+    return calendar.timegm(parsed.timetuple())
+
+
+def from_timestamp(value):
+    """to_timestamp 的反向換算"""
+    if value is None:
+        return None
+    return datetime.utcfromtimestamp(value)
+
+
+def day_range(start_date=None, end_date=None):
+    """把查詢的日期範圍換算成發布日期字串的上下界：起始日 00:00（含）到結束日隔天 00:00（不含）
+
+    結束日整天都包含在範圍內，與統計彙總表的每日計數一致；未指定的一端回傳 None，無法解析時拋出 ValueError。
+    """
+    bounds = []
+    for value, days in ((start_date, 0), (end_date, 1)):
+        if not value:
+            bounds.append(None)
+            continue
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f'無效的日期：{value}')
+        day = datetime(parsed.year, parsed.month, parsed.day) + timedelta(days=days)
+        bounds.append(day.strftime(DATETIME_FORMAT))
+    return tuple(bounds)
+
+
+def timestamp_range(start_date=None, end_date=None):
+    """day_range 的上下界換算成 publish_ts 的整數秒數，供以 publish_ts 比較的查詢使用"""
+    return tuple(None if bound is None else to_timestamp(bound) for bound in day_range(start_date, end_date))
@@ -0,0 +1,232 @@
+"""新聞資料的欄式匯出（Parquet / Arrow IPC）
+
+用法：
+    python -m storage.export instance/news.db exports/
+    python -m storage.export instance/news.db exports/ --incremental
+
+輸出依發布月份分目錄（exports/month=2025-01/part-*.parquet），可直接由 pandas、DuckDB、Spark 讀取。
+增量匯出只寫出上次匯出後新增或更新的文章，同一篇文章可能出現在多個檔案，讀取時以 canonical_url 取 last_crawl_run_id 最大的一筆。
+"""
+import argparse
+import logging
+import os
+import sqlite3
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from storage.content_store import load_contents
+from storage.dates import format_datetime
+from storage.ingestion import fail_stale_crawl_runs
+from storage.keywords import split_keywords
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = (
+    'id', 'title', 'content', 'source', 'url', 'canonical_url', 'publish_date', 'topic',
+    'keywords', 'content_hash', 'last_crawl_run_id', 'created_at', 'updated_at'
+)
+
+FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+
+
+def create_export_table(conn):
+    """建立匯出紀錄表，保存每個匯出目錄已匯出到哪一次爬取"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS export_state (
+            target VARCHAR(500) PRIMARY KEY,
+            crawl_run_id INTEGER NOT NULL,
+            exported_at DATETIME NOT NULL
+        )
+    ''')
+
+
+def export_schema():
+    """匯出檔案的欄位定義"""
+    return pa.schema([
+        ('id', pa.int64()),
+        ('title', pa.string()),
+        ('content', pa.string()),
+        ('source', pa.string()),
+        ('url', pa.string()),
+        ('canonical_url', pa.string()),
+        ('publish_date', pa.timestamp('us')),
+        ('topic', pa.string()),
+        ('keywords', pa.list_(pa.string())),
+        ('content_hash', pa.string()),
+        ('last_crawl_run_id', pa.int64()),
+        ('created_at', pa.timestamp('us')),
+        ('updated_at', pa.timestamp('us')),
+    ])
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+class _PartitionWriters:
+    """依月份分目錄的檔案寫入器，每個月份一個檔案，每個批次寫成一個 row group"""
+
+    def __init__(self, output_dir, file_format, name):
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.name = name
+        self.schema = export_schema()
+        self.writers = {}
+
+    def _open(self, month):
+        directory = os.path.join(self.output_dir, f'month={month}')
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.name + FORMATS[self.file_format])
+        if self.file_format == 'parquet':
+            return pq.ParquetWriter(path, self.schema, compression='zstd')
+        return pa.ipc.new_file(path, self.schema)
+
+    def write(self, rows):
+        by_month = {}
+        for row in rows:
+            month = row['publish_date'][:7] if row['publish_date'] else 'unknown'
+            by_month.setdefault(month, []).append(row)
+
+        for month, month_rows in by_month.items():
+            if month not in self.writers:
+                self.writers[month] = self._open(month)
+            table = pa.Table.from_pylist([{
+                **row,
+                'keywords': list(split_keywords(row['keywords'])),
+                'publish_date': _parse_datetime(row['publish_date']),
+                'created_at': _parse_datetime(row['created_at']),
+                'updated_at': _parse_datetime(row['updated_at'])
+            } for row in month_rows], schema=self.schema)
+            if self.file_format == 'parquet':
+                self.writers[month].write_table(table)
+            else:
+                self.writers[month].write(table)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        return len(self.writers)
+
+
+def _iter_rows(conn, table, after_run_id=None, until_run_id=None, chunk_size=5000):
+    """依 id 分批讀取文章，每次只保留一個批次在記憶體中"""
+    columns = ', '.join(EXPORT_COLUMNS)
+    conditions = ['id > ?']
+    params = []
+    if after_run_id is not None:
+        conditions.append('last_crawl_run_id > ? AND last_crawl_run_id <= ?')
+        params.extend([after_run_id, until_run_id])
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT {columns} FROM {table} WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?",
+            [last_id] + params + [chunk_size]
+        ).fetchall()
+        if not rows:
+            break
+        rows = [dict(zip(EXPORT_COLUMNS, row)) for row in rows]
+        # 主資料表的內文在壓縮內容表，封存分區的內文則直接存在資料表中
+        contents = load_contents(conn, [row['id'] for row in rows])
+        for row in rows:
+            row['content'] = contents.get(row['id'], row['content'])
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def export_watermark(conn):
+    """本次匯出涵蓋到的爬取紀錄 id
+
+    爬取可能同時進行且完成順序不定，只取最大的已完成 id 會跳過較早開始、仍在進行的爬取，
+    因此上限為最早一筆進行中爬取的前一筆；沒有進行中的爬取時為最新的爬取紀錄。
+    開始超過 STALE_CRAWL_RUN_AGE 仍在進行的爬取視為已中斷並標記為失敗，不會讓上限永遠停在該筆（不提交交易）。
+    """
+    fail_stale_crawl_runs(conn, commit=False)
+    running = conn.execute("SELECT MIN(id) FROM crawl_run WHERE status = 'running'").fetchone()[0]
+    if running is not None:
+        logger.info(f"爬取紀錄 {running} 尚在進行，本次只匯出到爬取紀錄 {running - 1}")
+        return running - 1
+    return conn.execute('SELECT COALESCE(MAX(id), 0) FROM crawl_run').fetchone()[0]
+
+
+def export_articles(conn, output_dir, incremental=False, file_format='parquet', chunk_size=5000):
+    """匯出文章、關鍵詞與主題到欄式檔案，回傳匯出的筆數、檔案數與匯出到的爬取紀錄 id
+
+    完整匯出包含已封存的分區；增量匯出只包含上次匯出後的爬取所新增或更新的文章。
+    """
+    if pa is None:
+        raise RuntimeError('匯出需要 pyarrow，請先執行 pip install pyarrow')
+    if file_format not in FORMATS:
+        raise ValueError(f'不支援的匯出格式: {file_format}')
+
+    create_export_table(conn)
+    target = os.path.abspath(output_dir)
+    until_run_id = export_watermark(conn)
+    after_run_id = None
+    if incremental:
+        row = conn.execute('SELECT crawl_run_id FROM export_state WHERE target = ?', (target,)).fetchone()
+        after_run_id = row[0] if row else 0
+        until_run_id = max(until_run_id, after_run_id)
+
+    name = f"part-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{until_run_id}"
+    writers = _PartitionWriters(output_dir, file_format, name)
+    exported = 0
+    try:
+        for rows in _iter_rows(conn, 'news_article', after_run_id, until_run_id, chunk_size):
+            writers.write(rows)
+            exported += len(rows)
+
+        if not incremental:
+            from storage.partitions import attach_partition, partitions_for_range
+
+            for _, filename in partitions_for_range(conn):
+                with attach_partition(conn, filename) as alias:
+                    for rows in _iter_rows(conn, f'{alias}.news_article', chunk_size=chunk_size):
+                        writers.write(rows)
+                        exported += len(rows)
+    finally:
+        files = writers.close()
+
+    conn.execute('''
+        INSERT INTO export_state (target, crawl_run_id, exported_at) VALUES (?, ?, ?)
+        ON CONFLICT (target) DO UPDATE SET crawl_run_id = excluded.crawl_run_id, exported_at = excluded.exported_at
+    ''', (target, until_run_id, format_datetime(datetime.utcnow())))
+    conn.commit()
+
+    logger.info(f"匯出 {exported} 篇文章至 {output_dir}（{files} 個檔案）")
+    return {'rows': exported, 'files': files, 'crawl_run_id': until_run_id}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='匯出新聞資料為 Parquet / Arrow 檔案')
+    parser.add_argument('database', nargs='?', default='news.db')
+    parser.add_argument('output_dir', nargs='?', default='exports')
+    parser.add_argument('--incremental', action='store_true', help='只匯出上次匯出後新增或更新的文章')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='parquet')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    try:
+        stats = export_articles(conn, args.output_dir, args.incremental, args.format, args.chunk_size)
+    finally:
+        conn.close()
+    print(f"✅ 已匯出 {stats['rows']} 篇文章，{stats['files']} 個檔案（至爬取紀錄 {stats['crawl_run_id']}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from storage.content_store import ensure_dictionary, load_contents, store_contents
+from storage.dates import format_datetime, parse_datetime, to_timestamp
+from storage.keywords import index_keywords
+from storage.partitions import fetch_archived
+from storage.rollups import update_rollups
+from storage.search import index_articles
+from storage.sql import chunked_in_query, chunks
+
+logger = logging.getLogger(__name__)
+
+# 會被移除的追蹤參數
+TRACKING_PARAMS = {'fbclid', 'gclid', 'yclid', 'igshid', 'mc_cid', 'mc_eid'}
+
+# 參與內容雜湊的欄位，任一欄位變動即視為文章已更新
+HASHED_FIELDS = ('title', 'content', 'source', 'publish_date', 'topic', 'keywords')
+
+# 開始超過此時間仍在進行的爬取紀錄視為已中斷（寫入行程當掉，沒有更新狀態）
+STALE_CRAWL_RUN_AGE = timedelta(hours=1)
+
+# 已註冊的寫入擴充（依註冊順序呼叫）
+INGEST_HOOKS = {}
+
+
+def register_ingest_hook(name, hook):
+    """註冊寫入擴充，同名的擴充會被取代
+
+    hook(conn, articles, crawl_run_id) 在每個批次寫入後、提交前呼叫，articles 為新增或更新的文章字典
+    （id、title、content、source、url、publish_date、publish_ts、topic、keywords），擴充的寫入與文章在同一交易中提交。
+    hook 可回傳一個不帶參數的函式，在該批次提交成功後才呼叫，用來更新行程內的記憶體狀態；交易回滾時不會呼叫。
+    """
+    INGEST_HOOKS[name] = hook
+    return hook
+
+
+def run_after_commit(actions):
+    """依序執行寫入擴充的提交後動作；資料已提交，個別動作失敗只記錄錯誤"""
+    for action in actions:
+        try:
+            action()
+        except Exception:
+            logger.exception("寫入擴充的提交後動作失敗")
+
+
+def canonicalize_url(url):
+    """標準化網址：統一大小寫、移除追蹤參數與錨點、排序查詢參數"""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'http').lower()
+    netloc = parts.netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+
+    path = parts.path or '/'
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/')
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))
+
+
+def compute_content_hash(article):
+    """計算文章內容雜湊，用來判斷重新爬到的文章是否有變動"""
+    parts = []
+    for field in HASHED_FIELDS:
+        value = article.get(field)
+        if field == 'publish_date':
+            value = format_datetime(value)
+        parts.append('' if value is None else str(value))
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def prepare_article(article):
+    """把爬蟲產生的文章字典整理成資料表欄位"""
+    keywords = article.get('keywords') or ''
+    if not isinstance(keywords, str):
+        keywords = ','.join(keywords)
+
+    # 發布時間統一成同一種字串格式與整數時間戳記；無法解析時以爬取時間代替
+    published = parse_datetime(article.get('publish_date')) or datetime.now()
+    row = {
+        'title': article['title'],
+        'content': article.get('content'),
+        'source': article.get('source') or '',
+        'url': article['url'],
+        'publish_date': format_datetime(published),
+        'publish_ts': to_timestamp(published),
+        'topic': article.get('topic') or '',
+        'keywords': keywords
+    }
+    row['canonical_url'] = canonicalize_url(row['url'])
+    row['content_hash'] = compute_content_hash(row)
+    return row
+
+
+def start_crawl_run(conn, keyword=None, start_date=None, end_date=None, commit=True):
+    """建立爬取紀錄並回傳其 id"""
+    cursor = conn.execute('''
+        INSERT INTO crawl_run (keyword, start_date, end_date, status, started_at)
+        VALUES (?, ?, ?, 'running', ?)
+    ''', (keyword, format_datetime(start_date), format_datetime(end_date), format_datetime(datetime.utcnow())))
+    if commit:
+        conn.commit()
+    return cursor.lastrowid
+
+
+def finish_crawl_run(conn, crawl_run_id, stats=None, status='finished', commit=True):
+    """更新爬取紀錄的結果統計"""
+    stats = stats or {}
+    conn.execute('''
+        UPDATE crawl_run
+        SET status = ?, fetched_count = ?, new_count = ?, updated_count = ?,
+            unchanged_count = ?, finished_at = ?
+        WHERE id = ?
+    ''', (
+        status,
+        stats.get('fetched', 0),
+        stats.get('new', 0),
+        stats.get('updated', 0),
+        stats.get('unchanged', 0),
+        format_datetime(datetime.utcnow()),
+        crawl_run_id
+    ))
+    if commit:
+        conn.commit()
+
+
+def fail_stale_crawl_runs(conn, max_age=STALE_CRAWL_RUN_AGE, commit=True):
+    """把開始超過 max_age 仍在進行的爬取紀錄標記為失敗，回傳標記的筆數
+
+    中斷的爬取會一直停在 running，增量匯出的上限（storage/export.py）因此無法前進。
+    """
+    now = datetime.utcnow()
+    cursor = conn.execute('''
+        UPDATE crawl_run SET status = 'failed', finished_at = ?
+        WHERE status = 'running' AND started_at < ?
+    ''', (format_datetime(now), format_datetime(now - max_age)))
+    if cursor.rowcount:
+        logger.warning(f"{cursor.rowcount} 筆爬取紀錄進行超過 {max_age}，已標記為失敗")
+    if commit:
+        conn.commit()
+    return cursor.rowcount
+
+
+def fetch_existing(conn, canonical_urls):
+    """以單一 IN 查詢（超過參數上限時分段）取得已存在文章的 (id, 內容雜湊, 主題, 來源, 發布日期)"""
+    return {row[0]: row[1:] for row in chunked_in_query(
+        conn,
+        'SELECT canonical_url, id, content_hash, topic, source, publish_date '
+        'FROM news_article WHERE canonical_url IN ({placeholders})',
+        canonical_urls
+    )}
+
+
+def upsert_articles(conn, articles, crawl_run_id=None, chunk_size=1000, commit=True, after_commit=None):
+    """依標準化網址批次寫入文章：新文章插入、有變動者更新並保留舊版本、未變動者不寫入
+
+    已搬到封存分區的文章視為不再變動，重新爬到時計入未變動，避免主資料表與分區各有一份。
+
+    每個批次只查詢一次既有文章，並以 executemany 寫入後提交，單一批次失敗只會回滾該批次。
+    commit=False 時不提交也不回滾，由呼叫端把多次寫入合併成一個交易；寫入擴充的提交後動作加入
+    after_commit 串列，由呼叫端提交後以 run_after_commit 執行。
+    """
+    stats = {'fetched': 0, 'new': 0, 'updated': 0, 'unchanged': 0}
+
+    for chunk in chunks(articles, chunk_size):
+        now = format_datetime(datetime.utcnow())
+
+        # 同一批次內重複的網址以最後一筆為準
+        rows = {}
+        for article in chunk:
+            row = prepare_article(article)
+            rows[row['canonical_url']] = row
+        stats['fetched'] += len(chunk)
+        stats['unchanged'] += len(chunk) - len(rows)
+
+        existing = fetch_existing(conn, rows.keys())
+        archived = fetch_archived(conn, [url for url in rows if url not in existing])
+
+        inserts = []
+        updates = []
+        updated_urls = []
+        replaced = []
+        for canonical_url, row in rows.items():
+            match = existing.get(canonical_url)
+            if canonical_url in archived:
+                stats['unchanged'] += 1
+            elif match is None:
+                inserts.append((
+                    row['title'], row['content'], row['source'], row['url'], row['publish_date'],
+                    row['topic'], row['keywords'], canonical_url, row['content_hash'],
+                    crawl_run_id, crawl_run_id, now, row['publish_ts']
+                ))
+            elif match[1] != row['content_hash']:
+                updated_urls.append((canonical_url, match[0]))
+                updates.append((
+                    row['title'], row['content'], row['source'], row['url'], row['publish_date'],
+                    row['topic'], row['keywords'], row['content_hash'], crawl_run_id, now,
+                    row['publish_ts'], match[0]
+                ))
+                replaced.append(match[2:])
+            else:
+                stats['unchanged'] += 1
+
+        try:
+            # 內文另存於壓縮內容表，news_article 只保留中繼資料
+            if inserts:
+                conn.executemany('''
+                    INSERT INTO news_article
+                    (title, source, url, publish_date, topic, keywords,
+                     canonical_url, content_hash, first_crawl_run_id, last_crawl_run_id, created_at, publish_ts)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [insert[:1] + insert[2:] for insert in inserts])
+            if updates:
+                # 先保存舊版本再覆寫
+                old_contents = load_contents(conn, [update[-1] for update in updates])
+                conn.executemany('''
+                    INSERT INTO article_revision
+                    (article_id, crawl_run_id, title, content, source, url, publish_date,
+                     topic, keywords, content_hash, recorded_at)
+                    SELECT id, last_crawl_run_id, title, COALESCE(?, content), source, url, publish_date,
+                           topic, keywords, content_hash, ?
+                    FROM news_article WHERE id = ?
+                ''', [(old_contents.get(update[-1]), now, update[-1]) for update in updates])
+                conn.executemany('''
+                    UPDATE news_article
+                    SET title = ?, content = NULL, source = ?, url = ?, publish_date = ?, topic = ?,
+                        keywords = ?, content_hash = ?, last_crawl_run_id = ?, updated_at = ?, publish_ts = ?
+                    WHERE id = ?
+                ''', [update[:1] + update[2:] for update in updates])
+
+            # 內文、全文索引、關鍵詞關聯與統計彙總和文章在同一交易中更新
+            inserted_ids = fetch_existing(conn, [insert[7] for insert in inserts])
+            written = [(inserted_ids[insert[7]][0], insert[0], insert[1], insert[6]) for insert in inserts] + \
+                      [(update[-1], update[0], update[1], update[6]) for update in updates]
+            store_contents(conn, [(article_id, content) for article_id, _, content, _ in written])
+            index_articles(conn, [(article_id, title, content) for article_id, title, content, _ in written])
+            index_keywords(conn, [(article_id, keywords) for article_id, _, _, keywords in written])
+            update_rollups(conn,
+                           added=[(insert[5], insert[2], insert[4]) for insert in inserts] +
+                                 [(update[5], update[2], update[4]) for update in updates],
+                           removed=replaced)
+            actions = []
+            if INGEST_HOOKS:
+                changed = [dict(rows[insert[7]], id=inserted_ids[insert[7]][0]) for insert in inserts] + \
+                          [dict(rows[canonical_url], id=article_id) for canonical_url, article_id in updated_urls]
+                for hook in INGEST_HOOKS.values():
+                    action = hook(conn, changed, crawl_run_id)
+                    if action is not None:
+                        actions.append(action)
+            if commit:
+                conn.commit()
+        except Exception:
+            if commit:
+                conn.rollback()
+            raise
+
+        if commit:
+            run_after_commit(actions)
+        elif after_commit is not None:
+            after_commit.extend(actions)
+
+        stats['new'] += len(inserts)
+        stats['updated'] += len(updates)
+
+    return stats
+
+
+def ingest_articles(conn, articles, keyword=None, start_date=None, end_date=None, chunk_size=1000):
+    """執行一次增量寫入，並在 crawl_run 記錄這次爬取的來源與結果"""
+    crawl_run_id = start_crawl_run(conn, keyword, start_date, end_date)
+    try:
+        stats = upsert_articles(conn, articles, crawl_run_id, chunk_size=chunk_size)
+    except Exception:
+        finish_crawl_run(conn, crawl_run_id, status='failed')
+        raise
+
+    finish_crawl_run(conn, crawl_run_id, stats)
+    if ensure_dictionary(conn) is not None:
+        conn.commit()
+    stats['crawl_run_id'] = crawl_run_id
+    logger.info(f"爬取紀錄 {crawl_run_id}: 新增 {stats['new']}、更新 {stats['updated']}、未變動 {stats['unchanged']}")
+    return stats
@@ -0,0 +1,162 @@
+import logging
+
+from storage.dates import timestamp_range
+from storage.sql import chunked_in_query
+
+logger = logging.getLogger(__name__)
+
+
+def create_keyword_tables(conn):
+    """建立關鍵詞字典表與文章關鍵詞關聯表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS keyword (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            word VARCHAR(100) NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS article_keyword (
+            article_id INTEGER NOT NULL,
+            keyword_id INTEGER NOT NULL,
+            weight REAL NOT NULL DEFAULT 1.0,
+            PRIMARY KEY (article_id, keyword_id)
+        ) WITHOUT ROWID
+    ''')
+    # 依關鍵詞查文章（頻率、共現）用的反向索引
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_article_keyword_keyword_id ON article_keyword (keyword_id, article_id)')
+
+
+def split_keywords(value):
+    """把逗號串接的關鍵詞拆成 {關鍵詞: 權重}，重複出現的關鍵詞權重累加"""
+    if not value:
+        return {}
+    words = value.split(',') if isinstance(value, str) else value
+    weights = {}
+    for word in words:
+        word = word.strip()
+        if word:
+            weights[word] = weights.get(word, 0.0) + 1.0
+    return weights
+
+
+def _keyword_ids(conn, words):
+    """取得關鍵詞 id，字典中沒有的詞會先新增"""
+    words = list(words)
+    conn.executemany('INSERT OR IGNORE INTO keyword (word) VALUES (?)', [(word,) for word in words])
+    return dict(chunked_in_query(conn, 'SELECT word, id FROM keyword WHERE word IN ({placeholders})', words))
+
+
+def index_keywords(conn, articles):
+    """寫入或更新文章的關鍵詞關聯，articles 為 (id, keywords) 序列（不提交交易）"""
+    articles = [(article_id, split_keywords(keywords)) for article_id, keywords in articles]
+    if not articles:
+        return
+
+    conn.executemany('DELETE FROM article_keyword WHERE article_id = ?', [(article_id,) for article_id, _ in articles])
+    ids = _keyword_ids(conn, {word for _, weights in articles for word in weights})
+    conn.executemany(
+        'INSERT INTO article_keyword (article_id, keyword_id, weight) VALUES (?, ?, ?)',
+        [(article_id, ids[word], weight) for article_id, weights in articles for word, weight in weights.items()]
+    )
+
+
+def rebuild_keyword_index(conn, batch_size=1000):
+    """清空並依 id 分批從 news_article.keywords 重建關鍵詞關聯（不提交交易）"""
+    conn.execute('DELETE FROM article_keyword')
+    last_id = 0
+    total = 0
+    while True:
+        rows = conn.execute(
+            'SELECT id, keywords FROM news_article WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        index_keywords(conn, rows)
+        last_id = rows[-1][0]
+        total += len(rows)
+    logger.info(f"關鍵詞索引重建完成，共 {total} 篇文章")
+    return total
+
+
+def _article_filters(topic=None, start_date=None, end_date=None):
+    """組出文章篩選條件，回傳 (條件列表, 參數列表)
+
+    結束日整天都包含在範圍內；日期無法解析時拋出 ValueError。
+    """
+    conditions = []
+    params = []
+    if topic:
+        conditions.append('a.topic = ?')
+        params.append(topic)
+    start, end = timestamp_range(start_date, end_date)
+    if start is not None:
+        conditions.append('a.publish_ts >= ?')
+        params.append(start)
+    if end is not None:
+        conditions.append('a.publish_ts < ?')
+        params.append(end)
+    return conditions, params
+
+
+def keyword_frequency(conn, top_n=20, topic=None, start_date=None, end_date=None, exclude=None):
+    """統計關鍵詞出現的文章數，回傳 [(關鍵詞, 文章數)]，依文章數遞減排序"""
+    conditions, params = _article_filters(topic, start_date, end_date)
+    join = 'JOIN news_article a ON a.id = ak.article_id' if conditions else ''
+    exclude = list(exclude or ())
+    if exclude:
+        conditions.append(f"k.word NOT IN ({', '.join('?' * len(exclude))})")
+        params.extend(exclude)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    return conn.execute(f'''
+        SELECT k.word, COUNT(*) AS article_count
+        FROM article_keyword ak
+        JOIN keyword k ON k.id = ak.keyword_id
+        {join}
+        {where}
+        GROUP BY ak.keyword_id
+        ORDER BY article_count DESC, k.word
+        LIMIT ?
+    ''', params + [top_n]).fetchall()
+
+
+def keyword_cooccurrence(conn, word, top_n=20):
+    """統計與指定關鍵詞出現在同一篇文章的其他關鍵詞，回傳 [(關鍵詞, 共同出現文章數)]"""
+    return conn.execute('''
+        SELECT k.word, COUNT(*) AS article_count
+        FROM keyword target
+        JOIN article_keyword base ON base.keyword_id = target.id
+        JOIN article_keyword other ON other.article_id = base.article_id AND other.keyword_id != base.keyword_id
+        JOIN keyword k ON k.id = other.keyword_id
+        WHERE target.word = ?
+        GROUP BY other.keyword_id
+        ORDER BY article_count DESC, k.word
+        LIMIT ?
+    ''', (word, top_n)).fetchall()
+
+
+def top_keywords_by_topic(conn, top_n=5, start_date=None, end_date=None):
+    """各主題出現最多的前 top_n 個關鍵詞，回傳 {主題: [(關鍵詞, 文章數)]}"""
+    conditions, params = _article_filters(start_date=start_date, end_date=end_date)
+    conditions.insert(0, 'a.topic IS NOT NULL')
+
+    rows = conn.execute(f'''
+        SELECT topic, word, article_count
+        FROM (
+            SELECT a.topic AS topic, k.word AS word, COUNT(*) AS article_count,
+                   ROW_NUMBER() OVER (PARTITION BY a.topic ORDER BY COUNT(*) DESC, k.word) AS rank
+            FROM article_keyword ak
+            JOIN news_article a ON a.id = ak.article_id
+            JOIN keyword k ON k.id = ak.keyword_id
+            WHERE {' AND '.join(conditions)}
+            GROUP BY a.topic, ak.keyword_id
+        )
+        WHERE rank <= ?
+        ORDER BY topic, rank
+    ''', params + [top_n]).fetchall()
+
+    result = {}
+    for topic, word, count in rows:
+        result.setdefault(topic, []).append((word, count))
+    return result
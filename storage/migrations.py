@@ -0,0 +1,366 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 回填既有資料時每批讀取的文章數
+MIGRATION_BATCH_SIZE = 1000
+
+
+def _table_columns(conn, table):
+    """取得資料表現有欄位名稱"""
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _add_columns(conn, table, columns):
+    """補上缺少的欄位（SQLite 只能逐欄 ALTER TABLE）"""
+    existing = _table_columns(conn, table)
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}')
+
+
+def _migration_1(conn):
+    """增量寫入：標準化網址、內容雜湊、爬取紀錄與歷史版本"""
+    from storage.ingestion import canonicalize_url, compute_content_hash
+
+    # 與 Flask-SQLAlchemy 模型相容的新聞表（已由 create_all 建立時不會變動）
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS news_article (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title VARCHAR(500) NOT NULL,
+            content TEXT,
+            source VARCHAR(100),
+            url VARCHAR(500),
+            publish_date DATETIME,
+            topic VARCHAR(100),
+            keywords TEXT,
+            created_at DATETIME
+        )
+    ''')
+    _add_columns(conn, 'news_article', [
+        ('keywords', 'TEXT'),
+        ('canonical_url', 'VARCHAR(500)'),
+        ('content_hash', 'VARCHAR(40)'),
+        ('first_crawl_run_id', 'INTEGER'),
+        ('last_crawl_run_id', 'INTEGER'),
+        ('updated_at', 'DATETIME')
+    ])
+
+    # 每次爬取的紀錄
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_run (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyword VARCHAR(200),
+            start_date DATETIME,
+            end_date DATETIME,
+            status VARCHAR(20) NOT NULL,
+            fetched_count INTEGER DEFAULT 0,
+            new_count INTEGER DEFAULT 0,
+            updated_count INTEGER DEFAULT 0,
+            unchanged_count INTEGER DEFAULT 0,
+            started_at DATETIME NOT NULL,
+            finished_at DATETIME
+        )
+    ''')
+
+    # 文章被更新前的舊版本
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS article_revision (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            article_id INTEGER NOT NULL,
+            crawl_run_id INTEGER,
+            title VARCHAR(500),
+            content TEXT,
+            source VARCHAR(100),
+            url VARCHAR(500),
+            publish_date DATETIME,
+            topic VARCHAR(100),
+            keywords TEXT,
+            content_hash VARCHAR(40),
+            recorded_at DATETIME NOT NULL
+        )
+    ''')
+
+    # 回填既有資料的標準化網址與內容雜湊，依 id 分批讀取，記憶體用量不隨文章數成長
+    last_id = 0
+    while True:
+        rows = conn.execute(f'''
+            SELECT id, title, content, source, url, publish_date, topic, keywords
+            FROM news_article
+            WHERE canonical_url IS NULL AND id > ?
+            ORDER BY id LIMIT {MIGRATION_BATCH_SIZE}
+        ''', (last_id,)).fetchall()
+        if not rows:
+            break
+        conn.executemany(
+            'UPDATE news_article SET canonical_url = ?, content_hash = ? WHERE id = ?',
+            [(canonicalize_url(row[4] or ''), compute_content_hash({
+                'title': row[1],
+                'content': row[2],
+                'source': row[3],
+                'publish_date': row[5],
+                'topic': row[6],
+                'keywords': row[7]
+            }), row[0]) for row in rows]
+        )
+        last_id = rows[-1][0]
+
+
+def _migration_2(conn):
+    """熱門查詢欄位的索引與標準化網址唯一約束"""
+    # 合併重複的標準化網址：保留最早的一筆，其餘存為歷史版本後刪除
+    duplicates = conn.execute('''
+        SELECT a.id, keep.id
+        FROM news_article a
+        JOIN (
+            SELECT canonical_url, MIN(id) AS id
+            FROM news_article
+            WHERE canonical_url IS NOT NULL
+            GROUP BY canonical_url
+            HAVING COUNT(*) > 1
+        ) keep ON keep.canonical_url = a.canonical_url AND a.id != keep.id
+    ''').fetchall()
+    if duplicates:
+        logger.info(f"合併 {len(duplicates)} 筆重複網址的文章")
+        conn.executemany('''
+            INSERT INTO article_revision
+            (article_id, crawl_run_id, title, content, source, url, publish_date,
+             topic, keywords, content_hash, recorded_at)
+            SELECT ?, last_crawl_run_id, title, content, source, url, publish_date,
+                   topic, keywords, content_hash, CURRENT_TIMESTAMP
+            FROM news_article WHERE id = ?
+        ''', [(keep_id, duplicate_id) for duplicate_id, keep_id in duplicates])
+        conn.executemany('DELETE FROM news_article WHERE id = ?', [(duplicate_id,) for duplicate_id, _ in duplicates])
+
+    # 索引名稱與 SQLAlchemy 模型宣告一致，create_all 建立的新資料庫不會重複建立
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS ux_news_article_canonical_url ON news_article (canonical_url)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_news_article_url ON news_article (url)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_news_article_publish_date ON news_article (publish_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_news_article_topic_publish_date ON news_article (topic, publish_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_news_article_source ON news_article (source)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_news_article_created_at ON news_article (created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_article_revision_article_id ON article_revision (article_id)')
+    conn.execute('ANALYZE')
+
+
+def _migration_3(conn):
+    """以 jieba 分詞的 FTS5 全文索引"""
+    from storage.search import create_search_index
+
+    create_search_index(conn)
+    # 全部文章分詞的時間太長，不在啟動時的遷移中進行，由離線指令分批建立索引
+    if conn.execute('SELECT 1 FROM news_article LIMIT 1').fetchone() is not None:
+        logger.warning("既有文章尚未建立全文索引，請執行 python -m storage.search --rebuild")
+
+
+def _migration_4(conn):
+    """正規化的關鍵詞字典與文章關鍵詞關聯表"""
+    from storage.keywords import create_keyword_tables, rebuild_keyword_index
+
+    create_keyword_tables(conn)
+    rebuild_keyword_index(conn)
+    conn.execute('ANALYZE')
+
+
+def _migration_5(conn):
+    """主題、來源與每日文章數的統計彙總表"""
+    from storage.rollups import create_rollup_table, rebuild_rollups
+
+    create_rollup_table(conn)
+    rebuild_rollups(conn)
+
+
+def _migration_6(conn):
+    """按月封存分區的目錄表"""
+    from storage.partitions import create_partition_catalog
+
+    create_partition_catalog(conn)
+
+
+def _migration_7(conn):
+    """增量匯出：依最後爬取紀錄查詢的索引與匯出紀錄表"""
+    from storage.export import create_export_table
+
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_news_article_last_crawl_run_id ON news_article (last_crawl_run_id)')
+    create_export_table(conn)
+
+
+def _migration_8(conn):
+    """文章內文移到以共用字典壓縮的內容表"""
+    from storage.content_store import (DICTIONARY_MIN_SAMPLES, create_content_tables, move_inline_contents,
+                                       train_dictionary)
+
+    create_content_tables(conn)
+    # 文章太少時字典沒有代表性，先以無字典壓縮，文章數足夠後由 ensure_dictionary 訓練
+    if conn.execute('SELECT COUNT(*) FROM news_article WHERE content IS NOT NULL').fetchone()[0] >= DICTIONARY_MIN_SAMPLES:
+        train_dictionary(conn)
+    moved = move_inline_contents(conn)
+    logger.info(f"已壓縮 {moved} 篇文章的內文，執行 VACUUM 後資料庫檔案才會縮小")
+
+
+def _migration_9(conn):
+    """整數發布時間戳記欄位：統一舊資料的日期格式並建立索引，日期範圍查詢改以整數比較"""
+    from storage.dates import format_datetime, to_timestamp
+    from storage.rollups import update_stats_rollup
+
+    _add_columns(conn, 'news_article', [('publish_ts', 'INTEGER')])
+
+    # 舊版寫入的發布日期可能只有日期、帶微秒或使用其他分隔符號；依 id 分批處理
+    last_id = 0
+    changed_total = 0
+    while True:
+        rows = conn.execute(
+            f'SELECT id, topic, source, publish_date FROM news_article WHERE id > ? ORDER BY id LIMIT {MIGRATION_BATCH_SIZE}',
+            (last_id,)
+        ).fetchall()
+        if not rows:
+            break
+        changed = [row for row in rows if row[3] and format_datetime(row[3]) != row[3]]
+        if changed:
+            conn.executemany('UPDATE news_article SET publish_date = ? WHERE id = ?',
+                             [(format_datetime(row[3]), row[0]) for row in changed])
+            update_stats_rollup(conn,
+                                added=[(row[1], row[2], format_datetime(row[3])) for row in changed],
+                                removed=[(row[1], row[2], row[3]) for row in changed])
+            changed_total += len(changed)
+        conn.executemany('UPDATE news_article SET publish_ts = ? WHERE id = ?',
+                         [(to_timestamp(row[3]), row[0]) for row in rows])
+        last_id = rows[-1][0]
+    if changed_total:
+        logger.info(f"統一 {changed_total} 篇文章的發布日期格式")
+
+    conn.execute('CREATE INDEX IF NOT EXISTS ix_news_article_publish_ts ON news_article (publish_ts)')
+    conn.execute('ANALYZE')
+
+
+def _migration_10(conn):
+    """主題按小時、日、週的文章數彙總表，時間線查詢不再掃描新聞表"""
+    from storage.rollups import create_timeline_table, rebuild_timeline
+
+    create_timeline_table(conn)
+    rebuild_timeline(conn, reset=True)
+    # 封存分區需附加資料庫，無法在遷移交易中處理，執行 python -m storage.rollups --rebuild 併入
+    logger.info("主題時間線已由主資料表建立")
+
+
+def _migration_11(conn):
+    """已封存文章的標準化網址目錄，避免重新爬到的封存文章再次寫入主資料表"""
+    from storage.partitions import backfill_archived_articles, create_archived_article_table
+
+    create_archived_article_table(conn)
+    logger.info(f"已登錄 {backfill_archived_articles(conn)} 篇封存文章的網址")
+
+
+def _migration_12(conn):
+    """TopicAnalyzer 的增量主題統計表，並由既有文章建立統計"""
+    from analyzer.topic_state import build_topic_state, create_topic_state_tables, topic_state_built
+
+    # 先前版本在第一次讀取時建立過的統計保留不動
+    if topic_state_built(conn):
+        return
+    create_topic_state_tables(conn)
+    total = build_topic_state(conn)
+    # 封存分區需附加資料庫，無法在遷移交易中處理，執行 python -m analyzer.topic_state --rebuild 併入
+    logger.info(f"主題統計已由主資料表的 {total} 篇文章建立")
+
+
+def _migration_13(conn):
+    """TF-IDF 文件頻率表"""
+    from analyzer.tfidf import create_tfidf_tables
+
+    create_tfidf_tables(conn)
+    # 全部文章分詞的時間太長，不在啟動時的遷移中進行
+    if conn.execute("SELECT 1 FROM tfidf_meta WHERE key = 'documents'").fetchone() is None and \
+            conn.execute('SELECT 1 FROM news_article LIMIT 1').fetchone() is not None:
+        logger.warning("既有文章尚未計入文件頻率，請執行 python -m analyzer.tfidf --rebuild")
+
+
+def _migration_14(conn):
+    """線上主題分群模型的保存表"""
+    from analyzer.clustering import create_cluster_table
+
+    create_cluster_table(conn)
+
+
+def _migration_15(conn):
+    """新聞表改用 AUTOINCREMENT，封存後刪除的最大 id 不會再分配給新文章"""
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'news_article'").fetchone()[0]
+    if 'AUTOINCREMENT' not in sql.upper():
+        # SQLite 無法修改主鍵定義：建立新表、複製資料後取代舊表，並重建原有的索引
+        indexes = [row[0] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'news_article' AND sql IS NOT NULL"
+        )]
+        columns = list(conn.execute('PRAGMA table_info(news_article)'))
+        definitions = []
+        for _, name, ddl, notnull, default, _ in columns:
+            if name == 'id':
+                definitions.append('id INTEGER PRIMARY KEY AUTOINCREMENT')
+                continue
+            definition = f'{name} {ddl}'
+            if notnull:
+                definition += ' NOT NULL'
+            if default is not None:
+                definition += f' DEFAULT {default}'
+            definitions.append(definition)
+        names = ', '.join(column[1] for column in columns)
+        conn.execute(f"CREATE TABLE news_article_new ({', '.join(definitions)})")
+        conn.execute(f'INSERT INTO news_article_new ({names}) SELECT {names} FROM news_article')
+        conn.execute('DROP TABLE news_article')
+        conn.execute('ALTER TABLE news_article_new RENAME TO news_article')
+        for index in indexes:
+            conn.execute(index)
+
+    # 已封存或已刪除文章的 id 可能大於主資料表目前的最大 id，序號從所有曾使用過的 id 之後開始
+    last_id = max(conn.execute(f'SELECT COALESCE(MAX({column}), 0) FROM {table}').fetchone()[0] for table, column in (
+        ('news_article', 'id'),
+        ('archived_article', 'article_id'),
+        ('article_revision', 'article_id'),
+        ('tfidf_article', 'article_id'),
+        ('topic_state_article', 'article_id'),
+    ))
+    if conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'news_article'", (last_id,)).rowcount == 0:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('news_article', ?)", (last_id,))
+
+
+# (版本號, 遷移函式)，版本號記錄在 PRAGMA user_version
+MIGRATIONS = [
+    (1, _migration_1),
+    (2, _migration_2),
+    (3, _migration_3),
+    (4, _migration_4),
+    (5, _migration_5),
+    (6, _migration_6),
+    (7, _migration_7),
+    (8, _migration_8),
+    (9, _migration_9),
+    (10, _migration_10),
+    (11, _migration_11),
+    (12, _migration_12),
+    (13, _migration_13),
+    (14, _migration_14),
+    (15, _migration_15),
+]
+
+
+def migrate(conn):
+    """依序套用尚未執行的資料庫遷移，每個遷移在單一交易中完成"""
+    if conn.in_transaction:
+        conn.commit()
+
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for target, migration in MIGRATIONS:
+        if target <= version:
+            continue
+
+        logger.info(f"套用資料庫遷移 {target}: {migration.__doc__}")
+        conn.execute('BEGIN')
+        try:
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = target
+
+    return version
@@ -0,0 +1,134 @@
+"""所有應用程式版本共用的資料模型、資料庫引擎與連線
+
+用法：
+    from storage.models import db, NewsArticle, Topic, connection, init_app, init_database
+
+    app = Flask(__name__)
+    init_app(app)
+
+模型、索引與連線設定都只在這裡定義，各個應用程式不再各自宣告。
+"""
+import atexit
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+from storage.migrations import migrate
+from storage.sqlite_config import BUSY_TIMEOUT, configure_connection
+from storage.token_cache import configure_token_cache
+from storage.writer import IngestWriter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_URI = 'sqlite:///news.db'
+
+# 與 PRAGMA busy_timeout 相同的等待時間（storage/sqlite_config.py），爬取寫入期間的讀取不會立即失敗
+ENGINE_OPTIONS = {
+    'connect_args': {'timeout': BUSY_TIMEOUT},
+}
+
+db = SQLAlchemy()
+
+# 每個資料庫引擎共用一條寫入執行緒
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+# 資料庫模型
+class NewsArticle(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(500), nullable=False)
+    content = db.Column(db.Text)
+    source = db.Column(db.String(100), nullable=False, index=True)
+    url = db.Column(db.String(500), nullable=False, index=True)
+    publish_date = db.Column(db.DateTime, nullable=False, index=True)
+    # 發布時間的整數秒數，日期範圍查詢以此欄位比較
+    publish_ts = db.Column(db.Integer, index=True)
+    topic = db.Column(db.String(100))
+    keywords = db.Column(db.Text)
+    canonical_url = db.Column(db.String(500))
+    content_hash = db.Column(db.String(40))
+    first_crawl_run_id = db.Column(db.Integer)
+    last_crawl_run_id = db.Column(db.Integer, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ux_news_article_canonical_url', 'canonical_url', unique=True),
+        db.Index('ix_news_article_topic_publish_date', 'topic', 'publish_date'),
+        # 封存會刪除主資料表中 id 最大的文章，AUTOINCREMENT 確保 id 不會再分配給新文章
+        {'sqlite_autoincrement': True},
+    )
+
+
+class Topic(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    keyword = db.Column(db.String(100), nullable=False)
+    priority = db.Column(db.Integer, default=1)
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def _on_connect(dbapi_connection, connection_record):
+    # 連線池每建立一條新連線時套用 PRAGMA（WAL、快取、busy_timeout 等）
+    configure_connection(dbapi_connection)
+
+
+def init_app(app, database_uri=DEFAULT_DATABASE_URI):
+    """把共用的資料庫設定套用到 Flask 應用程式
+
+    分詞快取（storage/token_cache.py）放在 instance 目錄，TOKEN_CACHE_PATH 設為 None 時只使用記憶體。
+    """
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', database_uri)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', ENGINE_OPTIONS)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.setdefault('TOKEN_CACHE_PATH', os.path.join(app.instance_path, 'token_cache.db'))
+    if app.config['TOKEN_CACHE_PATH']:
+        os.makedirs(os.path.dirname(app.config['TOKEN_CACHE_PATH']) or '.', exist_ok=True)
+    configure_token_cache(app.config['TOKEN_CACHE_PATH'])
+    db.init_app(app)
+    with app.app_context():
+        event.listen(db.engine, 'connect', _on_connect)
+    return db
+
+
+def init_database(app):
+    """建立資料表並套用尚未執行的資料庫遷移"""
+    with app.app_context():
+        db.create_all()
+        with connection() as conn:
+            version = migrate(conn)
+    logger.info(f"資料庫結構版本 {version}")
+    return version
+
+
+@contextmanager
+def connection():
+    """從共用引擎的連線池借用 DB-API 連線，供 storage 模組的查詢使用，離開區塊時歸還
+
+    需要在應用程式上下文中呼叫。
+    """
+    conn = db.engine.raw_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_writer(app):
+    """取得應用程式資料庫共用的寫入執行緒，所有爬取工作都經由它寫入"""
+    with app.app_context():
+        engine = db.engine
+    with _writers_lock:
+        if engine not in _writers:
+            writer = IngestWriter(engine.raw_connection)
+            # 程式結束前寫完已排隊的工作
+            atexit.register(writer.close)
+            _writers[engine] = writer
+        return _writers[engine]
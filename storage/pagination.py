@@ -0,0 +1,126 @@
+import base64
+import json
+
+from storage.dates import day_range
+from storage.partitions import article_filters, count_articles, partitions_for_range, query_articles
+from storage.rollups import get_count, keys_containing
+
+# 列表查詢回傳的欄位，與 /api/news 的回應一致
+NEWS_COLUMNS = ('id', 'title', 'source', 'url', 'publish_date', 'topic', 'keywords')
+
+MAX_PER_PAGE = 100
+
+
+def encode_cursor(publish_date, article_id):
+    """把最後一筆的 (發布日期, id) 編碼成不透明的游標字串"""
+    data = json.dumps([publish_date, article_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游標字串，格式不正確時拋出 ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        publish_date, article_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('無效的游標')
+    if not isinstance(publish_date, str) or not isinstance(article_id, int):
+        raise ValueError('無效的游標')
+    return publish_date, article_id
+
+
+def approximate_total(conn, topics=None, start_date=None, end_date=None):
+    """由統計彙總表估計符合條件的文章數，結束日整天都計入，與列表查詢的範圍一致
+
+    topics 為 matching_topics 取得的主題列表（None 表示不篩選主題）。統計彙總表也計入已封存的文章。
+    主題與日期同時篩選時彙總表沒有對應的計數，改以 (topic, publish_date) 索引計算主資料表與重疊分區的筆數。
+    """
+    start, end = day_range(start_date, end_date)
+    if topics is not None:
+        if not topics:
+            return 0
+        if start or end:
+            return count_articles(conn, start_date, end_date, topics)
+        return sum(get_count(conn, 'topic', topic) for topic in topics)
+    if not start and not end:
+        return get_count(conn, 'total')
+
+    conditions = ["dimension = 'day'"]
+    params = []
+    if start:
+        conditions.append('key >= ?')
+        params.append(start[:10])
+    if end:
+        conditions.append('key < ?')
+        params.append(end[:10])
+    return conn.execute(
+        f"SELECT COALESCE(SUM(count), 0) FROM stats_rollup WHERE {' AND '.join(conditions)}", params
+    ).fetchone()[0]
+
+
+def matching_topics(conn, topic):
+    """主題篩選以部分字串比對：回傳名稱包含 topic 的主題（例如「經濟」也符合「經濟,科技」）
+
+    主題種類不多，先由統計彙總表（也計入已封存的文章）找出符合的主題，再以 topic IN (...) 查詢，
+    仍可使用 (topic, publish_date) 索引。未指定主題時回傳 None。
+    """
+    if not topic:
+        return None
+    return keys_containing(conn, 'topic', topic)
+
+
+def recent_articles(conn, limit=20):
+    """最近爬取的文章（依寫入時間由新到舊），回傳 (id, title, content, source, url, publish_date, topic) 列"""
+    return conn.execute('''
+        SELECT id, title, content, source, url, publish_date, topic
+        FROM news_article
+        ORDER BY created_at DESC
+        LIMIT ?
+    ''', (limit,)).fetchall()
+
+
+def fetch_news_page(conn, topic=None, start_date=None, end_date=None, cursor=None, per_page=20, offset=0):
+    """以 (publish_date, id) 做鍵集分頁，依發布日期由新到舊取得一頁新聞
+
+    傳入上一頁的 next_cursor 取得下一頁，任何深度的頁面都只需一次索引定位。
+    查詢範圍涵蓋已封存的月份時，同樣以鍵集分頁合併主資料表與對應的封存分區。
+    topic 以部分字串比對（見 matching_topics）。
+    offset 僅供舊的 page 參數使用；日期或游標格式不正確時拋出 ValueError。
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    offset = max(0, offset)
+    # 沒有符合的主題時不必查詢，但日期格式不正確仍要拋出 ValueError
+    day_range(start_date, end_date)
+    topics = matching_topics(conn, topic)
+    after = decode_cursor(cursor) if cursor else None
+
+    # 多取一筆判斷是否還有下一頁
+    if topics == []:
+        rows = []
+    elif partitions_for_range(conn, start_date, end_date):
+        rows = [tuple(article[column] for column in NEWS_COLUMNS) for article in query_articles(
+            conn, start_date, end_date, topics, limit=per_page + 1, offset=offset, after=after
+        )]
+    else:
+        where, params = article_filters(start_date, end_date, topics, after)
+        rows = conn.execute(f'''
+            SELECT {', '.join(NEWS_COLUMNS)} FROM news_article
+            {where}
+            ORDER BY publish_date DESC, id DESC
+            LIMIT ? OFFSET ?
+        ''', params + [per_page + 1, offset]).fetchall()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    articles = [dict(zip(NEWS_COLUMNS, row)) for row in rows]
+    next_cursor = encode_cursor(rows[-1][4], rows[-1][0]) if has_more else None
+    for article in articles:
+        if article['publish_date']:
+            article['publish_date'] = article['publish_date'].replace(' ', 'T')
+
+    return {
+        'articles': articles,
+        'next_cursor': next_cursor,
+        'per_page': per_page,
+        'total': approximate_total(conn, topics, start_date, end_date)
+    }
@@ -0,0 +1,400 @@
+import argparse
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from storage.content_store import delete_contents, load_contents
+from storage.dates import day_range, format_datetime
+from storage.rollups import rebuild_rollups, rebuild_timeline, update_rollups
+from storage.search import remove_articles
+from storage.sql import chunked_in_query
+
+logger = logging.getLogger(__name__)
+
+# 封存分區放在主資料庫旁的目錄，每個月一個資料庫檔案
+ARCHIVE_DIR = 'archive'
+PARTITION_ALIAS = 'part'
+
+# 寫入擴充以文章 id 為鍵的逐篇資料表，封存時一併刪除；主題統計與文件頻率的計數保留，與統計彙總表一致
+ARTICLE_STATE_TABLES = ('tfidf_article', 'topic_state_article')
+
+# 列表查詢回傳的欄位，與 /api/news 的回應一致
+ARTICLE_COLUMNS = ('id', 'title', 'source', 'url', 'publish_date', 'topic', 'keywords')
+
+
+def create_partition_catalog(conn):
+    """建立封存分區目錄表，記錄每個月份分區的檔案與狀態"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS article_partition (
+            month VARCHAR(7) PRIMARY KEY,
+            filename VARCHAR(200) NOT NULL,
+            article_count INTEGER NOT NULL DEFAULT 0,
+            archived_at DATETIME,
+            compacted_at DATETIME
+        )
+    ''')
+
+
+def create_archived_article_table(conn):
+    """建立已封存文章的標準化網址目錄，重新爬到已封存的文章時不再寫回主資料表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archived_article (
+            canonical_url VARCHAR(500) PRIMARY KEY,
+            article_id INTEGER NOT NULL,
+            month VARCHAR(7) NOT NULL
+        )
+    ''')
+
+
+def backfill_archived_articles(conn):
+    """由既有分區檔案補齊已封存文章目錄，找不到的分區檔案略過並記錄警告
+
+    分區以獨立連線唯讀開啟，可在遷移交易中執行。
+    """
+    total = 0
+    for month, filename in conn.execute('SELECT month, filename FROM article_partition ORDER BY month').fetchall():
+        path = partition_path(conn, filename)
+        if not os.path.exists(path):
+            logger.warning(f"找不到 {month} 的封存分區 {path}，略過")
+            continue
+        partition = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            rows = partition.execute(
+                'SELECT canonical_url, id FROM news_article WHERE canonical_url IS NOT NULL'
+            ).fetchall()
+        finally:
+            partition.close()
+        conn.executemany('INSERT OR REPLACE INTO archived_article (canonical_url, article_id, month) VALUES (?, ?, ?)',
+                         [(canonical_url, article_id, month) for canonical_url, article_id in rows])
+        total += len(rows)
+    return total
+
+
+def fetch_archived(conn, canonical_urls):
+    """已封存文章中出現的標準化網址"""
+    return {row[0] for row in chunked_in_query(
+        conn,
+        'SELECT canonical_url FROM archived_article WHERE canonical_url IN ({placeholders})',
+        canonical_urls
+    )}
+
+
+def month_key(value):
+    """取得日期所屬月份，格式為 YYYY-MM"""
+    return format_datetime(value)[:7]
+
+
+def month_range(month):
+    """月份的起始時間（含）與下個月的起始時間（不含）"""
+    start = datetime.strptime(month, '%Y-%m')
+    end = (start + timedelta(days=32)).replace(day=1)
+    return format_datetime(start), format_datetime(end)
+
+
+def archive_directory(conn):
+    """主資料庫所在目錄下的封存目錄"""
+    for _, name, path in conn.execute('PRAGMA database_list'):
+        if name == 'main' and path:
+            return os.path.join(os.path.dirname(path), ARCHIVE_DIR)
+    return ARCHIVE_DIR
+
+
+def partition_path(conn, filename):
+    """分區檔案的完整路徑"""
+    return os.path.join(archive_directory(conn), filename)
+
+
+@contextmanager
+def attach_partition(conn, filename, create=False):
+    """暫時附加封存分區，離開區塊時卸離（呼叫端需先提交交易）
+
+    SQLite 附加不存在的檔案時會建立空資料庫，因此只有封存時（create=True）允許建立，
+    其他情況找不到檔案會拋出 FileNotFoundError。
+    """
+    path = partition_path(conn, filename)
+    if create:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    elif not os.path.exists(path):
+        raise FileNotFoundError(f"找不到封存分區 {path}")
+    conn.execute(f'ATTACH DATABASE ? AS {PARTITION_ALIAS}', (path,))
+    try:
+        yield PARTITION_ALIAS
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute(f'DETACH DATABASE {PARTITION_ALIAS}')
+
+
+def _main_columns(conn):
+    """主資料表的欄位與型別"""
+    return [(row[1], row[2]) for row in conn.execute('PRAGMA main.table_info(news_article)')]
+
+
+def _create_partition_table(conn):
+    """在已附加的分區建立與主資料表欄位一致的新聞表"""
+    columns = _main_columns(conn)
+    definitions = ', '.join(
+        'id INTEGER PRIMARY KEY' if name == 'id' else f'{name} {ddl}' for name, ddl in columns
+    )
+    conn.execute(f'CREATE TABLE IF NOT EXISTS {PARTITION_ALIAS}.news_article ({definitions})')
+
+    # 主資料表之後新增的欄位也補到既有分區
+    existing = {row[1] for row in conn.execute(f'PRAGMA {PARTITION_ALIAS}.table_info(news_article)')}
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {PARTITION_ALIAS}.news_article ADD COLUMN {name} {ddl}')
+
+    conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {PARTITION_ALIAS}.ux_news_article_canonical_url '
+                 f'ON news_article (canonical_url)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {PARTITION_ALIAS}.ix_news_article_publish_date '
+                 f'ON news_article (publish_date)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {PARTITION_ALIAS}.ix_news_article_topic_publish_date '
+                 f'ON news_article (topic, publish_date)')
+    return [name for name, _ in columns]
+
+
+def _archive_month(conn, month):
+    """把某個月份的文章從主資料表搬到該月的分區"""
+    start, end = month_range(month)
+    filename = f"news_{month.replace('-', '_')}.db"
+
+    with attach_partition(conn, filename, create=True):
+        columns = ', '.join(_create_partition_table(conn))
+        conn.execute('BEGIN')
+        try:
+            ids = [row[0] for row in conn.execute(
+                'SELECT id FROM main.news_article WHERE publish_date >= ? AND publish_date < ?', (start, end)
+            )]
+            # 重新爬到已封存的文章時，分區中的舊資料會被取代，統計需扣除舊的一筆
+            replaced = conn.execute(f'''
+                SELECT topic, source, publish_date FROM {PARTITION_ALIAS}.news_article
+                WHERE canonical_url IN (
+                    SELECT canonical_url FROM main.news_article WHERE publish_date >= ? AND publish_date < ?
+                )
+            ''', (start, end)).fetchall()
+
+            conn.execute(f'''
+                INSERT OR REPLACE INTO {PARTITION_ALIAS}.news_article ({columns})
+                SELECT {columns} FROM main.news_article WHERE publish_date >= ? AND publish_date < ?
+            ''', (start, end))
+
+            # 封存分區直接存放內文，壓縮時再整欄清除
+            contents = load_contents(conn, ids)
+            conn.executemany(f'UPDATE {PARTITION_ALIAS}.news_article SET content = ? WHERE id = ?',
+                             [(content, article_id) for article_id, content in contents.items()])
+            delete_contents(conn, ids)
+            remove_articles(conn, ids)
+            conn.executemany('DELETE FROM main.article_keyword WHERE article_id = ?', [(article_id,) for article_id in ids])
+            for table in ARTICLE_STATE_TABLES:
+                if conn.execute("SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                    conn.executemany(f'DELETE FROM main.{table} WHERE article_id = ?', [(article_id,) for article_id in ids])
+            conn.execute('''
+                INSERT OR REPLACE INTO main.archived_article (canonical_url, article_id, month)
+                SELECT canonical_url, id, ? FROM main.news_article
+                WHERE publish_date >= ? AND publish_date < ? AND canonical_url IS NOT NULL
+            ''', (month, start, end))
+            conn.execute('DELETE FROM main.news_article WHERE publish_date >= ? AND publish_date < ?', (start, end))
+            update_rollups(conn, removed=replaced)
+
+            article_count = conn.execute(f'SELECT COUNT(*) FROM {PARTITION_ALIAS}.news_article').fetchone()[0]
+            conn.execute('''
+                INSERT INTO article_partition (month, filename, article_count, archived_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (month) DO UPDATE SET
+                    article_count = excluded.article_count,
+                    archived_at = excluded.archived_at,
+                    compacted_at = NULL
+            ''', (month, filename, article_count, format_datetime(datetime.utcnow())))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    logger.info(f"已封存 {month} 的 {len(ids)} 篇文章至 {filename}")
+    return len(ids)
+
+
+def archive_articles(conn, before):
+    """把 before 所在月份之前的文章依月份搬到封存分區，回傳搬移的文章數
+
+    封存後的文章不再出現在全文搜尋與關鍵詞統計中，但仍計入統計彙總表，並可由 query_articles 查詢。
+    """
+    if conn.in_transaction:
+        conn.commit()
+
+    cutoff = month_range(month_key(before))[0]
+    months = [row[0] for row in conn.execute(
+        'SELECT DISTINCT substr(publish_date, 1, 7) FROM news_article WHERE publish_date < ?', (cutoff,)
+    )]
+    return sum(_archive_month(conn, month) for month in months)
+
+
+def compact_partitions(conn, before):
+    """壓縮 before 所在月份之前的分區：刪除全文內容只保留中繼資料，並回收檔案空間"""
+    if conn.in_transaction:
+        conn.commit()
+
+    partitions = conn.execute('''
+        SELECT month, filename FROM article_partition
+        WHERE compacted_at IS NULL AND month < ?
+        ORDER BY month
+    ''', (month_key(before),)).fetchall()
+
+    compacted = 0
+    for month, filename in partitions:
+        path = partition_path(conn, filename)
+        if not os.path.exists(path):
+            logger.warning(f"找不到 {month} 的封存分區 {path}，略過壓縮")
+            continue
+        partition = sqlite3.connect(path)
+        try:
+            partition.execute('UPDATE news_article SET content = NULL')
+            partition.commit()
+            partition.execute('VACUUM')
+        finally:
+            partition.close()
+
+        conn.execute('UPDATE article_partition SET compacted_at = ? WHERE month = ?',
+                     (format_datetime(datetime.utcnow()), month))
+        conn.commit()
+        compacted += 1
+        logger.info(f"已壓縮 {month} 的封存分區")
+
+    return compacted
+
+
+def apply_retention(conn, archive_after_days=90, compact_after_days=365, now=None):
+    """保留政策：超過 archive_after_days 的文章封存，超過 compact_after_days 的分區壓縮"""
+    now = now or datetime.now()
+    return {
+        'archived': archive_articles(conn, now - timedelta(days=archive_after_days)),
+        'compacted': compact_partitions(conn, now - timedelta(days=compact_after_days))
+    }
+
+
+def partitions_for_range(conn, start_date=None, end_date=None):
+    """與日期範圍重疊的封存分區，由新到舊排序；檔案已不存在的分區略過並記錄警告"""
+    conditions = []
+    params = []
+    if start_date:
+        conditions.append('month >= ?')
+        params.append(month_key(start_date))
+    if end_date:
+        conditions.append('month <= ?')
+        params.append(month_key(end_date))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    partitions = []
+    for month, filename in conn.execute(
+        f'SELECT month, filename FROM article_partition {where} ORDER BY month DESC', params
+    ).fetchall():
+        if os.path.exists(partition_path(conn, filename)):
+            partitions.append((month, filename))
+        else:
+            logger.warning(f"找不到 {month} 的封存分區 {partition_path(conn, filename)}，略過")
+    return partitions
+
+
+def article_filters(start_date=None, end_date=None, topic=None, after=None):
+    """列表查詢的篩選條件：結束日整天都包含在內，topic 可為主題或主題列表，after 為鍵集分頁的 (發布日期, id)"""
+    start, end = day_range(start_date, end_date)
+    conditions = []
+    params = []
+    if start:
+        conditions.append('publish_date >= ?')
+        params.append(start)
+    if end:
+        conditions.append('publish_date < ?')
+        params.append(end)
+    if topic:
+        topics = [topic] if isinstance(topic, str) else list(topic)
+        conditions.append(f"topic IN ({', '.join('?' * len(topics))})")
+        params.extend(topics)
+    if after:
+        conditions.append('(publish_date, id) < (?, ?)')
+        params.extend(after)
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ''), params
+
+
+def query_articles(conn, start_date=None, end_date=None, topic=None, limit=20, offset=0, after=None):
+    """依 (發布日期, id) 由新到舊查詢文章，只附加與日期範圍重疊的封存分區
+
+    先查主資料表，再由新到舊逐一附加分區；已取得足夠且比下一個分區更新的文章時就停止。
+    after 為上一頁最後一筆的 (發布日期, id)，用於鍵集分頁。
+    """
+    where, params = article_filters(start_date, end_date, topic, after)
+    columns = ', '.join(ARTICLE_COLUMNS)
+    needed = offset + limit
+
+    def sort_key(row):
+        return row[4] or '', row[0]
+
+    rows = conn.execute(
+        f'SELECT {columns} FROM main.news_article {where} ORDER BY publish_date DESC, id DESC LIMIT ?',
+        params + [needed]
+    ).fetchall()
+
+    for month, filename in partitions_for_range(conn, start_date, end_date):
+        if len(rows) >= needed and (rows[needed - 1][4] or '') >= month_range(month)[1]:
+            break
+        with attach_partition(conn, filename) as alias:
+            rows += conn.execute(
+                f'SELECT {columns} FROM {alias}.news_article {where} ORDER BY publish_date DESC, id DESC LIMIT ?',
+                params + [needed]
+            ).fetchall()
+        rows = sorted(rows, key=sort_key, reverse=True)[:needed]
+
+    return [dict(zip(ARTICLE_COLUMNS, row)) for row in rows[offset:needed]]
+
+
+def count_articles(conn, start_date=None, end_date=None, topic=None):
+    """計算主資料表與重疊分區中符合條件的文章數"""
+    where, params = article_filters(start_date, end_date, topic)
+    total = conn.execute(f'SELECT COUNT(*) FROM main.news_article {where}', params).fetchone()[0]
+    for _, filename in partitions_for_range(conn, start_date, end_date):
+        with attach_partition(conn, filename) as alias:
+            total += conn.execute(f'SELECT COUNT(*) FROM {alias}.news_article {where}', params).fetchone()[0]
+    return total
+
+
+def add_partition_rollups(conn):
+    """把各封存分區的文章數累加到統計彙總表
+
+    附加與卸離資料庫不能在交易中進行，因此每個分區各自提交。
+    """
+    if conn.in_transaction:
+        conn.commit()
+    for _, filename in partitions_for_range(conn):
+        with attach_partition(conn, filename) as alias:
+            rebuild_rollups(conn, f'{alias}.news_article', reset=False)
+            rebuild_timeline(conn, f'{alias}.news_article')
+            conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='新聞封存分區與保留政策')
+    parser.add_argument('database', nargs='?', default='news.db')
+    parser.add_argument('--archive-after', type=int, default=90, help='超過幾天的文章搬到封存分區')
+    parser.add_argument('--compact-after', type=int, default=365, help='超過幾天的分區刪除全文內容')
+    parser.add_argument('--list', action='store_true', help='只列出現有分區')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    conn = sqlite3.connect(args.database)
+    try:
+        create_partition_catalog(conn)
+        create_archived_article_table(conn)
+        if not args.list:
+            stats = apply_retention(conn, args.archive_after, args.compact_after)
+            print(f"✅ 封存 {stats['archived']} 篇文章，壓縮 {stats['compacted']} 個分區")
+        for month, filename, count, archived_at, compacted_at in conn.execute(
+            'SELECT month, filename, article_count, archived_at, compacted_at FROM article_partition ORDER BY month'
+        ):
+            print(f"{month}  {filename:<20} {count:>8} 篇  {'已壓縮' if compacted_at else ''}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
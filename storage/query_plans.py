@@ -0,0 +1,175 @@
+import argparse
+import logging
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+from storage.ingestion import fetch_existing
+from storage.partitions import PARTITION_ALIAS
+from storage.pagination import encode_cursor, fetch_news_page, recent_articles
+from storage.rollups import get_count, get_counts, get_distinct_count, get_timeline, get_top
+
+logger = logging.getLogger(__name__)
+
+# 每個月份一列的目錄表，完整掃描的成本固定，不列入檢查
+CATALOG_TABLES = ('article_partition',)
+
+# 供查詢計畫檢查使用的範例游標與日期
+_SAMPLE_DATE = '2025-01-01 00:00:00'
+_SAMPLE_TS = 1735689600
+
+# 各 API 端點呼叫的查詢函式；檢查時實際呼叫這些函式並記錄執行的 SELECT，查詢內容不會與端點脫節。
+# expect 為預期的存取方式：
+#   'search'     以索引定位，不隨資料量線性成長
+#   'index-scan' 聚合查詢可接受完整掃描索引，但不可掃描資料表
+ENDPOINT_QUERIES = [
+    {
+        'endpoint': 'GET /api/news',
+        'call': lambda conn: fetch_news_page(conn),
+        'expect': 'index-scan'
+    },
+    {
+        'endpoint': 'GET /api/news?cursor=',
+        'call': lambda conn: fetch_news_page(conn, cursor=encode_cursor(_SAMPLE_DATE, 100)),
+        'expect': 'search'
+    },
+    {
+        'endpoint': 'GET /api/news?topic=&cursor=',
+        'call': lambda conn: fetch_news_page(conn, '科技', cursor=encode_cursor(_SAMPLE_DATE, 100)),
+        'expect': 'search'
+    },
+    {
+        'endpoint': 'GET /api/news?start_date=&end_date=',
+        'call': lambda conn: fetch_news_page(conn, start_date='2025-01-01', end_date='2025-01-31'),
+        'expect': 'search'
+    },
+    {
+        'endpoint': 'GET /api/news?topic=&start_date=&end_date=',
+        'call': lambda conn: fetch_news_page(conn, '科技', start_date='2025-01-01', end_date='2025-01-31'),
+        'expect': 'search'
+    },
+    {
+        'endpoint': 'GET /api/news (analyzer/app.py)',
+        'call': lambda conn: recent_articles(conn, 20),
+        'expect': 'index-scan'
+    },
+    {
+        'endpoint': 'GET /api/topics',
+        'call': lambda conn: get_counts(conn, 'topic'),
+        'expect': 'search'
+    },
+    {
+        'endpoint': 'GET /api/stats (total, today)',
+        'call': lambda conn: get_count(conn, 'day', '2025-01-01'),
+        'expect': 'search'
+    },
+    {
+        'endpoint': 'GET /api/stats (topics, sources)',
+        'call': lambda conn: get_distinct_count(conn, 'source'),
+        'expect': 'search'
+    },
+    {
+        'endpoint': 'GET /api/stats (hot topic)',
+        'call': lambda conn: get_top(conn, 'topic'),
+        'expect': 'search'
+    },
+    {
+        'endpoint': 'GET /api/timeline, TopicAnalyzer.get_topic_timelines',
+        'call': lambda conn: get_timeline(conn, 'day', _SAMPLE_TS, _SAMPLE_TS + 30 * 86400),
+        'expect': 'search'
+    },
+    {
+        'endpoint': 'POST /api/crawl (ingestion lookup)',
+        'call': lambda conn: fetch_existing(conn, ['https://example.com/a', 'https://example.com/b']),
+        'expect': 'search'
+    },
+]
+
+
+@contextmanager
+def capture_queries(conn):
+    """記錄區塊中執行的 SQL（參數已代入）"""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        yield statements
+    finally:
+        conn.set_trace_callback(None)
+
+
+def endpoint_statements(conn, call):
+    """實際呼叫端點的查詢函式，回傳其執行的 SELECT 語句
+
+    查詢封存分區的語句在分區卸離後無法 EXPLAIN，不列入檢查（分區與主資料表的索引相同）；
+    只讀取目錄表的語句也略過。
+    """
+    with capture_queries(conn) as statements:
+        call(conn)
+    return [
+        sql for sql in statements
+        if sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+        and f'{PARTITION_ALIAS}.' not in sql
+        and not any(f'FROM {table}' in sql for table in CATALOG_TABLES)
+    ]
+
+
+def explain(conn, sql, params=()):
+    """回傳查詢計畫的每一步說明"""
+    return [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def classify_plan(plan):
+    """依查詢計畫判斷存取方式：search、index-scan 或 table-scan"""
+    access = 'search'
+    for detail in plan:
+        if not detail.startswith('SCAN'):
+            continue
+        if 'INDEX' in detail:
+            access = 'index-scan'
+        else:
+            return 'table-scan'
+    return access
+
+
+def check_query_plans(conn, queries=None):
+    """檢查各端點實際執行的查詢計畫是否符合預期，每個 SELECT 一筆結果"""
+    rank = {'search': 0, 'index-scan': 1, 'table-scan': 2}
+    results = []
+    for query in queries or ENDPOINT_QUERIES:
+        for sql in endpoint_statements(conn, query['call']):
+            plan = explain(conn, sql)
+            access = classify_plan(plan)
+            results.append({
+                'endpoint': query['endpoint'],
+                'sql': ' '.join(sql.split()),
+                'plan': plan,
+                'access': access,
+                'expect': query['expect'],
+                'ok': rank[access] <= rank[query['expect']]
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='檢查 API 端點查詢是否使用索引')
+    parser.add_argument('database', nargs='?', default='news.db')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    try:
+        results = check_query_plans(conn)
+    finally:
+        conn.close()
+
+    for result in results:
+        mark = '✅' if result['ok'] else '❌'
+        print(f"{mark} {result['endpoint']}: {result['access']}（預期 {result['expect']}）")
+        print(f"      {result['sql']}")
+        for detail in result['plan']:
+            print(f"      {detail}")
+
+    return 0 if all(result['ok'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
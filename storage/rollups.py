@@ -0,0 +1,288 @@
+import argparse
+import logging
+import sqlite3
+from collections import Counter
+from datetime import datetime, timedelta
+
+from storage.dates import SECONDS_PER_DAY, from_timestamp, to_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+def create_rollup_table(conn):
+    """建立統計彙總表，每個 (維度, 鍵值) 一列
+
+    維度：total（總數）、topic（主題）、source（來源）、day（發布日期）。
+    主題按小時、日、週的文章數另存於 topic_timeline，由資料庫遷移 10 建立（見 create_timeline_table）。
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stats_rollup (
+            dimension VARCHAR(20) NOT NULL,
+            key VARCHAR(100) NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID
+    ''')
+
+
+# 主題時間線的時間粒度（秒）；每週從星期一開始
+TIMELINE_RESOLUTIONS = {
+    'hour': 3600,
+    'day': SECONDS_PER_DAY,
+    'week': 7 * SECONDS_PER_DAY,
+}
+
+# 各時間粒度的時段標籤格式（每週以星期一的日期表示）
+TIMELINE_LABELS = {
+    'hour': '%Y-%m-%d %H:00',
+    'day': '%Y-%m-%d',
+    'week': '%Y-%m-%d',
+}
+
+# 1970-01-01 是星期四，往前推三天對齊到星期一
+_WEEK_OFFSET = 3 * SECONDS_PER_DAY
+
+
+def create_timeline_table(conn):
+    """建立主題時間線彙總表，每個 (粒度, 時段起點, 主題) 一列
+
+    主鍵以粒度、時段開頭，一段時間內所有主題的數列只需一次索引範圍讀取。
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS topic_timeline (
+            resolution VARCHAR(10) NOT NULL,
+            bucket INTEGER NOT NULL,
+            topic VARCHAR(100) NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (resolution, bucket, topic)
+        ) WITHOUT ROWID
+    ''')
+
+
+def bucket_start(timestamp, resolution='day'):
+    """時間戳記所屬時段的起點（與 publish_ts 相同的整數秒數）"""
+    if resolution == 'week':
+        return timestamp - (timestamp + _WEEK_OFFSET) % TIMELINE_RESOLUTIONS['week']
+    return timestamp - timestamp % TIMELINE_RESOLUTIONS[resolution]
+
+
+def timeline_keys(topic, publish_date):
+    """一篇文章會計入的 (粒度, 時段起點, 主題)"""
+    timestamp = to_timestamp(publish_date) if topic and publish_date else None
+    if timestamp is None:
+        return []
+    return [(resolution, bucket_start(timestamp, resolution), topic) for resolution in TIMELINE_RESOLUTIONS]
+
+
+def rollup_keys(topic, source, publish_date):
+    """一篇文章會計入的 (維度, 鍵值)"""
+    keys = [('total', '')]
+    if topic:
+        keys.append(('topic', topic))
+    if source:
+        keys.append(('source', source))
+    if publish_date:
+        keys.append(('day', str(publish_date)[:10]))
+    return keys
+
+
+def update_rollups(conn, added=(), removed=()):
+    """依新增與移除的文章調整統計與主題時間線，文章以 (topic, source, publish_date) 表示（不提交交易）"""
+    update_stats_rollup(conn, added, removed)
+
+    timeline = Counter()
+    for article in added:
+        for key in timeline_keys(article[0], article[2]):
+            timeline[key] += 1
+    for article in removed:
+        for key in timeline_keys(article[0], article[2]):
+            timeline[key] -= 1
+    _update_timeline(conn, {key: delta for key, delta in timeline.items() if delta})
+
+
+def update_stats_rollup(conn, added=(), removed=()):
+    """只調整 stats_rollup，不含主題時間線（供建立時間線之前的資料庫遷移使用，不提交交易）"""
+    deltas = Counter()
+    for article in added:
+        for key in rollup_keys(*article):
+            deltas[key] += 1
+    for article in removed:
+        for key in rollup_keys(*article):
+            deltas[key] -= 1
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    conn.executemany('''
+        INSERT INTO stats_rollup (dimension, key, count) VALUES (?, ?, ?)
+        ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count
+    ''', [(dimension, key, delta) for (dimension, key), delta in deltas.items()])
+
+    # 歸零的鍵值移除，讓主題數、來源數等於該維度的列數
+    conn.executemany(
+        'DELETE FROM stats_rollup WHERE dimension = ? AND key = ? AND count <= 0',
+        [(dimension, key) for (dimension, key), delta in deltas.items() if delta < 0]
+    )
+
+
+def _update_timeline(conn, deltas):
+    if not deltas:
+        return
+    conn.executemany('''
+        INSERT INTO topic_timeline (resolution, bucket, topic, count) VALUES (?, ?, ?, ?)
+        ON CONFLICT (resolution, bucket, topic) DO UPDATE SET count = count + excluded.count
+    ''', [key + (delta,) for key, delta in deltas.items()])
+    conn.executemany(
+        'DELETE FROM topic_timeline WHERE resolution = ? AND bucket = ? AND topic = ? AND count <= 0',
+        [key for key, delta in deltas.items() if delta < 0]
+    )
+
+
+def rebuild_rollups(conn, table='news_article', reset=True):
+    """從新聞資料表重新計算 stats_rollup，用於修復（不提交交易）
+
+    reset=False 時把 table 的統計累加到現有數值上，用來併入封存分區。主題時間線由 rebuild_timeline 另外重建。
+    """
+    if reset:
+        conn.execute('DELETE FROM stats_rollup')
+    for select in (
+        f"SELECT 'total', '', COUNT(*) FROM {table}",
+        f"SELECT 'topic', topic, COUNT(*) FROM {table} WHERE topic != '' GROUP BY topic",
+        f"SELECT 'source', source, COUNT(*) FROM {table} WHERE source != '' GROUP BY source",
+        f"SELECT 'day', substr(publish_date, 1, 10), COUNT(*) FROM {table} "
+        f"WHERE publish_date IS NOT NULL GROUP BY substr(publish_date, 1, 10)",
+    ):
+        # WHERE true 讓 SQLite 正確解析 SELECT 後接 ON CONFLICT 的語法
+        conn.execute(f'''
+            INSERT INTO stats_rollup (dimension, key, count)
+            SELECT * FROM ({select}) WHERE true
+            ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count
+        ''')
+    logger.info(f"統計彙總表已由 {table} 重新計算")
+
+
+def rebuild_timeline(conn, table='news_article', reset=False):
+    """把 table 的文章累加到主題時間線，reset=True 時先清空（不提交交易）
+
+    以 strftime('%s', publish_date) 換算時間戳記，與 to_timestamp 相同，也適用於沒有 publish_ts 欄位的封存分區。
+    """
+    if reset:
+        conn.execute('DELETE FROM topic_timeline')
+    for resolution, seconds in TIMELINE_RESOLUTIONS.items():
+        offset = _WEEK_OFFSET if resolution == 'week' else 0
+        conn.execute(f'''
+            INSERT INTO topic_timeline (resolution, bucket, topic, count)
+            SELECT ?, ts - (ts + ?) % ?, topic, COUNT(*) FROM (
+                SELECT CAST(strftime('%s', publish_date) AS INTEGER) AS ts, topic FROM {table}
+                WHERE topic != '' AND publish_date IS NOT NULL
+            ) WHERE ts IS NOT NULL
+            GROUP BY 2, 3
+            ON CONFLICT (resolution, bucket, topic) DO UPDATE SET count = count + excluded.count
+        ''', (resolution, offset, seconds))
+
+
+def get_count(conn, dimension, key=''):
+    """取得單一鍵值的文章數"""
+    row = conn.execute(
+        'SELECT count FROM stats_rollup WHERE dimension = ? AND key = ?', (dimension, key)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def get_counts(conn, dimension):
+    """取得某維度所有鍵值的文章數，依鍵值排序"""
+    return dict(conn.execute(
+        'SELECT key, count FROM stats_rollup WHERE dimension = ? ORDER BY key', (dimension,)
+    ).fetchall())
+
+
+def keys_containing(conn, dimension, text):
+    """某維度中包含 text 的鍵值，例如 topic=經濟 也符合「經濟,科技」"""
+    return [row[0] for row in conn.execute(
+        'SELECT key FROM stats_rollup WHERE dimension = ? AND instr(key, ?) > 0 ORDER BY key', (dimension, text)
+    )]
+
+
+def get_distinct_count(conn, dimension):
+    """某維度不同鍵值的數量，例如主題數、來源數"""
+    return conn.execute('SELECT COUNT(*) FROM stats_rollup WHERE dimension = ?', (dimension,)).fetchone()[0]
+
+
+def get_top(conn, dimension):
+    """某維度文章數最多的鍵值，沒有資料時回傳 None"""
+    row = conn.execute('''
+        SELECT key FROM stats_rollup WHERE dimension = ?
+        ORDER BY count DESC, key LIMIT 1
+    ''', (dimension,)).fetchone()
+    return row[0] if row else None
+
+
+def get_timeline(conn, resolution='day', start_ts=None, end_ts=None, topics=None):
+    """讀取主題時間線，回傳 {主題: [(時段起點, 文章數), ...]}，各數列依時間排序
+
+    start_ts、end_ts 為整數秒數，涵蓋包含這兩個時間點的時段；topics 省略時回傳所有主題。
+    """
+    if resolution not in TIMELINE_RESOLUTIONS:
+        raise ValueError(f"不支援的時間粒度: {resolution}")
+    conditions = ['resolution = ?']
+    params = [resolution]
+    if start_ts is not None:
+        conditions.append('bucket >= ?')
+        params.append(bucket_start(start_ts, resolution))
+    if end_ts is not None:
+        conditions.append('bucket <= ?')
+        params.append(end_ts)
+    if topics:
+        conditions.append(f"topic IN ({', '.join('?' * len(topics))})")
+        params.extend(topics)
+
+    timeline = {topic: [] for topic in topics or ()}
+    for bucket, topic, count in conn.execute(
+        f"SELECT bucket, topic, count FROM topic_timeline WHERE {' AND '.join(conditions)} ORDER BY bucket, topic",
+        params
+    ):
+        timeline.setdefault(topic, []).append((bucket, count))
+    return timeline
+
+
+def get_timeline_series(conn, resolution='day', days=7, topics=None):
+    """最近 days 天各主題的時間線，回傳 {主題: {時段標籤: 文章數}}，供 API 與 TopicAnalyzer 使用"""
+    end_date = datetime.now()
+    timeline = get_timeline(conn, resolution, to_timestamp(end_date - timedelta(days=days)),
+                            to_timestamp(end_date), topics)
+    label = TIMELINE_LABELS[resolution]
+    return {
+        topic: {from_timestamp(bucket).strftime(label): count for bucket, count in series}
+        for topic, series in timeline.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='新聞統計彙總表')
+    parser.add_argument('database', nargs='?', default='news.db')
+    parser.add_argument('--rebuild', action='store_true', help='從新聞資料表重建統計')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    try:
+        if args.rebuild:
+            from storage.partitions import add_partition_rollups
+
+            create_rollup_table(conn)
+            create_timeline_table(conn)
+            rebuild_rollups(conn)
+            rebuild_timeline(conn, reset=True)
+            conn.commit()
+            add_partition_rollups(conn)
+            print("✅ 統計彙總表已重建")
+        print(f"總新聞數: {get_count(conn, 'total')}")
+        for dimension in ('topic', 'source'):
+            for key, count in get_counts(conn, dimension).items():
+                print(f"{dimension:<8} {key:<20} {count}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
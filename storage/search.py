@@ -0,0 +1,178 @@
+import argparse
+import logging
+import re
+import sqlite3
+
+import jieba
+
+from storage.content_store import load_contents
+from storage.dates import timestamp_range
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'news_article_fts'
+
+# 只保留含文字或數字的詞，標點與空白不進索引
+_TOKEN_PATTERN = re.compile(r'\w')
+
+
+def segment(text, for_search=True):
+    """以 jieba 分詞並用空白串接，交給 FTS5 的 unicode61 斷詞器
+
+    關閉 HMM 新詞發現，讓同一個詞在標題、內文與查詢中切出一致的結果。
+    """
+    if not text:
+        return ''
+    cut = jieba.lcut_for_search if for_search else jieba.lcut
+    return ' '.join(token.lower() for token in cut(text, HMM=False) if _TOKEN_PATTERN.search(token))
+
+
+def create_search_index(conn):
+    """建立全文檢索虛擬表，rowid 對應 news_article.id"""
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE}
+        USING fts5(title, content, tokenize = 'unicode61 remove_diacritics 2')
+    ''')
+
+
+def index_articles(conn, articles):
+    """寫入或更新文章的分詞索引，articles 為 (id, title, content) 序列（不提交交易）"""
+    articles = list(articles)
+    if not articles:
+        return
+    conn.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = ?', [(article[0],) for article in articles])
+    conn.executemany(
+        f'INSERT INTO {SEARCH_TABLE} (rowid, title, content) VALUES (?, ?, ?)',
+        [(article_id, segment(title), segment(content)) for article_id, title, content in articles]
+    )
+
+
+def remove_articles(conn, article_ids):
+    """從全文索引移除文章（不提交交易）"""
+    conn.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = ?', [(article_id,) for article_id in article_ids])
+
+
+def rebuild_search_index(conn, batch_size=1000, commit=False):
+    """清空並依 id 分批重建全文索引
+
+    commit=True 時每個批次各自提交，重建期間不會一直持有寫入鎖（供離線重建使用）；否則不提交交易。
+    """
+    conn.execute(f'DELETE FROM {SEARCH_TABLE}')
+    last_id = 0
+    total = 0
+    while True:
+        rows = conn.execute(
+            'SELECT id, title, content FROM news_article WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        contents = load_contents(conn, [row[0] for row in rows])
+        index_articles(conn, [(article_id, title, contents.get(article_id, content)) for article_id, title, content in rows])
+        last_id = rows[-1][0]
+        total += len(rows)
+        if commit:
+            conn.commit()
+    logger.info(f"全文索引重建完成，共 {total} 篇文章")
+    return total
+
+
+def _phrase(tokens):
+    return '"{}"'.format(' '.join(tokens).replace('"', '""'))
+
+
+def build_match_query(query):
+    """把使用者輸入分詞後組成 FTS5 MATCH 語法，所有詞都必須出現
+
+    詞典外的詞會被切成單字，連續的單字合成相鄰片語；中文詞也接受文章中被切成單字的寫法。
+    """
+    terms = []
+    for part in query.split():
+        run = []
+        for token in segment(part, for_search=False).split() + [None]:
+            if token is not None and len(token) == 1:
+                run.append(token)
+                continue
+            if run:
+                terms.append(_phrase(run))
+                run = []
+            if token is None:
+                break
+            if token.isascii():
+                terms.append(_phrase([token]))
+            else:
+                terms.append(f'({_phrase([token])} OR {_phrase(token)})')
+    if not terms:
+        return None
+    return ' AND '.join(terms)
+
+
+def search_articles(conn, query, start_date=None, end_date=None, topic=None, limit=20, offset=0):
+    """全文搜尋，依 BM25 排序（標題權重較高），可加上日期與主題篩選
+
+    日期範圍與 /api/news 相同（起始日 00:00 到結束日整天）；回傳文章字典列表，score 越小越相關。
+    日期無法解析時拋出 ValueError。
+    """
+    start_ts, end_ts = timestamp_range(start_date, end_date)
+    match = build_match_query(query)
+    if match is None:
+        return []
+
+    conditions = [f'{SEARCH_TABLE} MATCH ?']
+    params = [match]
+    if start_ts is not None:
+        conditions.append('a.publish_ts >= ?')
+        params.append(start_ts)
+    if end_ts is not None:
+        conditions.append('a.publish_ts < ?')
+        params.append(end_ts)
+    if topic:
+        conditions.append('a.topic = ?')
+        params.append(topic)
+    params.extend([limit, offset])
+
+    rows = conn.execute(f'''
+        SELECT a.id, a.title, a.source, a.url, a.publish_date, a.topic, a.keywords,
+               bm25({SEARCH_TABLE}, 10.0, 1.0) AS score
+        FROM {SEARCH_TABLE}
+        JOIN news_article a ON a.id = {SEARCH_TABLE}.rowid
+        WHERE {' AND '.join(conditions)}
+        ORDER BY score
+        LIMIT ? OFFSET ?
+    ''', params).fetchall()
+
+    return [{
+        'id': row[0],
+        'title': row[1],
+        'source': row[2],
+        'url': row[3],
+        'publish_date': row[4],
+        'topic': row[5],
+        'keywords': row[6],
+        'score': round(row[7], 4)
+    } for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='新聞全文檢索')
+    parser.add_argument('query', nargs='?', help='搜尋關鍵詞')
+    parser.add_argument('--database', default='news.db')
+    parser.add_argument('--rebuild', action='store_true', help='重建全文索引')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    try:
+        if args.rebuild:
+            create_search_index(conn)
+            total = rebuild_search_index(conn, commit=True)
+            conn.commit()
+            print(f"✅ 已重建 {total} 篇文章的全文索引")
+        if args.query:
+            for article in search_articles(conn, args.query):
+                print(f"{article['score']:>8} {article['publish_date']} [{article['topic']}] {article['title']}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""共用的 SQL 工具：大量值的 IN 查詢分段"""
+
+# 單一 SQL 語句可綁定的參數數量上限（舊版 SQLite 預設 999）
+MAX_SQL_VARIABLES = 900
+
+
+def chunks(items, size):
+    """將可迭代物件切成固定大小的批次"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def chunked_in_query(conn, sql, values, params=()):
+    """以 IN (...) 查詢大量值，超過參數上限時分段執行，回傳所有結果列
+
+    sql 中以 {placeholders} 標示 IN 的參數位置，params 為接在每段 IN 參數之後的其他參數：
+        chunked_in_query(conn, 'SELECT id FROM news_article WHERE id IN ({placeholders}) AND topic = ?', ids, [topic])
+    """
+    params = list(params)
+    rows = []
+    for batch in chunks(values, MAX_SQL_VARIABLES - len(params)):
+        placeholders = ', '.join('?' * len(batch))
+        rows.extend(conn.execute(sql.format(placeholders=placeholders), batch + params).fetchall())
+    return rows
@@ -0,0 +1,25 @@
+"""所有 SQLite 連線共用的 PRAGMA 與等待時間
+
+應用程式的連線由 storage.models 的 SQLAlchemy 引擎與連線池管理，建立連線時套用這裡的設定；
+離線指令與基準測試自行開啟的連線也以 configure_connection 套用相同設定。
+"""
+
+# 遇到寫入鎖時最多等待的秒數；sqlite3.connect(timeout=...) 與 PRAGMA busy_timeout 使用同一個值
+BUSY_TIMEOUT = 30
+
+# 每條連線建立時套用的 PRAGMA
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',       # 讀取不再被寫入阻塞
+    'synchronous': 'NORMAL',     # WAL 模式下仍能保證資料庫一致性
+    'cache_size': -64000,        # 約 64MB 頁面快取
+    'mmap_size': 268435456,      # 256MB 記憶體映射讀取
+    'temp_store': 'MEMORY',
+    'busy_timeout': BUSY_TIMEOUT * 1000,
+}
+
+
+def configure_connection(conn, pragmas=None):
+    """對連線套用 PRAGMA 設定"""
+    for name, value in (pragmas or DEFAULT_PRAGMAS).items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
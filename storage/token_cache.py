@@ -0,0 +1,356 @@
+"""以內容雜湊為鍵的持久化分詞快取
+
+同一篇文章的文字會在爬蟲擷取關鍵詞、TF-IDF 文件頻率、文字雲等多處以 jieba 重複分詞。
+這裡把分詞結果以「正規化文字 + 詞典版本 + HMM 設定」的雜湊為鍵保存：
+    - 詞彙表（token_vocab）把每個詞對應到整數 id，分詞結果存成 uint32 的 id 陣列（BLOB），
+      比存 JSON 字串小得多
+    - 快取放在獨立的 SQLite 檔案，不佔用新聞資料庫，刪除檔案即可清空
+    - 前面有一層記憶體 LRU，同一行程內重複的文字不必查詢資料庫
+詞典版本由 jieba 版本、詞典檔與詞典內容（總詞頻、詞數）組成，載入自訂詞典或 add_word 後會自動改用新的鍵。
+快取檔案無法寫入時（例如唯讀的部署環境）只使用記憶體 LRU。
+storage.models.init_app 會把快取檔案設定在 Flask 的 instance 目錄（TOKEN_CACHE_PATH）；尚未設定時只使用記憶體，
+不會在目前目錄留下檔案。
+
+用法：
+    from storage.token_cache import cut, cut_many
+    cut('台積電股價上漲')                  # 與 jieba.lcut 相同的結果
+    cut_many([title, content])             # 一次查詢多篇文字
+
+    configure_token_cache('instance/token_cache.db', memory_items=20000)
+
+    python -m storage.token_cache instance/token_cache.db --prune 1000000
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+import jieba
+
+from storage.sql import chunked_in_query
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join('instance', 'token_cache.db')
+DEFAULT_MEMORY_ITEMS = 10000
+
+
+def normalize_text(text):
+    """快取鍵使用的正規化：Unicode NFC，分詞也以正規化後的文字進行"""
+    return unicodedata.normalize('NFC', text or '')
+
+
+def dictionary_version(tokenizer=None):
+    """目前 jieba 詞典的版本字串，詞典內容改變時隨之改變"""
+    tokenizer = tokenizer or jieba.dt
+    tokenizer.check_initialized()
+    name = tokenizer.dictionary or jieba.DEFAULT_DICT_NAME
+    return f'jieba {jieba.__version__}|{name}|{tokenizer.total}|{len(tokenizer.FREQ)}'
+
+
+def _encode(ids):
+    return array('I', ids).tobytes()
+
+
+def _decode(data):
+    ids = array('I')
+    ids.frombytes(data)
+    return ids
+
+
+class TokenCache:
+    """分詞快取（執行緒安全）
+
+    path: 快取的 SQLite 檔案，None 時只使用記憶體
+    memory_items: 記憶體 LRU 保留的文字數
+    """
+
+    def __init__(self, path=None, memory_items=DEFAULT_MEMORY_ITEMS):
+        self.path = path
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._token_ids = {}
+        self._tokens = {}
+        self._versions = {}
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # --- 快取檔案 ---------------------------------------------------------
+
+    def _connection(self):
+        """開啟快取檔案並建立資料表，無法使用時改為只用記憶體（回傳 None）"""
+        if self._conn is None and self.path is not None:
+            try:
+                conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('PRAGMA synchronous=NORMAL')
+                create_token_cache_tables(conn)
+                conn.commit()
+                self._conn = conn
+            except sqlite3.Error as e:
+                logger.warning(f"無法使用分詞快取檔案 {self.path}，只使用記憶體快取: {e}")
+                self.path = None
+        return self._conn
+
+    def _disable_disk(self, error):
+        logger.warning(f"分詞快取檔案 {self.path} 發生錯誤，之後只使用記憶體快取: {error}")
+        try:
+            self._conn.close()
+        except sqlite3.Error:
+            pass
+        self._conn = None
+        self.path = None
+
+    def _version_id(self, conn, version):
+        if version not in self._versions:
+            conn.execute('INSERT OR IGNORE INTO token_dictionary (version, created_at) VALUES (?, ?)',
+                         (version, int(time.time())))
+            self._versions[version] = conn.execute(
+                'SELECT id FROM token_dictionary WHERE version = ?', (version,)
+            ).fetchone()[0]
+        return self._versions[version]
+
+    def _load_tokens(self, conn, ids):
+        """把尚未載入的詞 id 對應回詞"""
+        missing = {token_id for token_id in ids if token_id not in self._tokens}
+        for token_id, token in chunked_in_query(
+            conn, 'SELECT id, token FROM token_vocab WHERE id IN ({placeholders})', missing
+        ):
+            self._tokens[token_id] = token
+            self._token_ids[token] = token_id
+
+    def _assign_ids(self, conn, tokens):
+        """確保詞都有 id，新詞加入詞彙表；詞彙表只增不減，多個行程共用同一檔案時 id 仍一致"""
+        missing = list({token for token in tokens if token not in self._token_ids})
+        conn.executemany('INSERT OR IGNORE INTO token_vocab (token) VALUES (?)', [(token,) for token in missing])
+        for token_id, token in chunked_in_query(
+            conn, 'SELECT id, token FROM token_vocab WHERE token IN ({placeholders})', missing
+        ):
+            self._tokens[token_id] = token
+            self._token_ids[token] = token_id
+
+    def _read(self, conn, keys):
+        decoded = {key: _decode(data) for key, data in chunked_in_query(
+            conn, 'SELECT key, tokens FROM token_cache WHERE key IN ({placeholders})', keys
+        )}
+        self._load_tokens(conn, [token_id for ids in decoded.values() for token_id in ids])
+        return {key: tuple(self._tokens[token_id] for token_id in ids) for key, ids in decoded.items()}
+
+    def _write(self, conn, version, results):
+        version_id = self._version_id(conn, version)
+        self._assign_ids(conn, [token for tokens in results.values() for token in tokens])
+        now = int(time.time())
+        conn.executemany(
+            'INSERT OR IGNORE INTO token_cache (key, dictionary_id, tokens, created_at) VALUES (?, ?, ?, ?)',
+            [(key, version_id, _encode(self._token_ids[token] for token in tokens), now)
+             for key, tokens in results.items()]
+        )
+        conn.commit()
+
+    # --- 分詞 -------------------------------------------------------------
+
+    @staticmethod
+    def key(text, version, HMM=True):
+        """快取鍵：詞典版本、HMM 設定與正規化文字的 16 bytes 雜湊"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f'{version}|{int(bool(HMM))}'.encode('utf-8'))
+        digest.update(b'\x00')
+        digest.update(text.encode('utf-8', 'surrogatepass'))
+        return digest.digest()
+
+    def _remember(self, key, tokens):
+        self._memory[key] = tokens
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def cut_many(self, texts, HMM=True):
+        """批次分詞，回傳與 texts 對應的詞列表（與 jieba.lcut 的結果相同）
+
+        先查記憶體 LRU，再以一次（超過參數上限時分段）查詢讀取快取檔案，都沒有的才交給 jieba 並寫回。
+        """
+        texts = [normalize_text(text) for text in texts]
+        version = dictionary_version()
+        keys = [self.key(text, version, HMM) for text in texts]
+        results = {}
+        with self._lock:
+            for key in keys:
+                tokens = self._memory.get(key)
+                if tokens is not None:
+                    self._memory.move_to_end(key)
+                    results[key] = tokens
+            self.hits += sum(1 for key in keys if key in results)
+
+            pending = list(dict.fromkeys(key for key in keys if key not in results))
+            conn = self._connection() if pending else None
+            if conn is not None:
+                try:
+                    stored = self._read(conn, pending)
+                except sqlite3.Error as e:
+                    self._disable_disk(e)
+                    stored = {}
+                self.disk_hits += len(stored)
+                for key, tokens in stored.items():
+                    results[key] = tokens
+                    self._remember(key, tokens)
+
+        # 分詞不持有鎖，其他執行緒可同時使用快取
+        computed = {}
+        for key, text in zip(keys, texts):
+            if key not in results and key not in computed:
+                computed[key] = tuple(jieba.lcut(text, HMM=HMM))
+
+        if computed:
+            with self._lock:
+                self.misses += len(computed)
+                for key, tokens in computed.items():
+                    results[key] = tokens
+                    self._remember(key, tokens)
+                conn = self._connection()
+                if conn is not None:
+                    try:
+                        self._write(conn, version, computed)
+                    except sqlite3.Error as e:
+                        conn.rollback()
+                        self._disable_disk(e)
+        return [list(results[key]) for key in keys]
+
+    def cut(self, text, HMM=True):
+        return self.cut_many([text], HMM)[0]
+
+    def stats(self):
+        """本行程的命中統計與快取檔案的筆數"""
+        with self._lock:
+            stats = {
+                'memory_hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_items': len(self._memory),
+            }
+            conn = self._connection()
+            if conn is not None:
+                stats['disk_items'] = conn.execute('SELECT COUNT(*) FROM token_cache').fetchone()[0]
+                stats['vocabulary'] = conn.execute('SELECT COUNT(*) FROM token_vocab').fetchone()[0]
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def create_token_cache_tables(conn):
+    """建立詞彙表、詞典版本表與分詞結果表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS token_vocab (
+            id INTEGER PRIMARY KEY,
+            token TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS token_dictionary (
+            id INTEGER PRIMARY KEY,
+            version TEXT NOT NULL UNIQUE,
+            created_at INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS token_cache (
+            key BLOB PRIMARY KEY,
+            dictionary_id INTEGER NOT NULL,
+            tokens BLOB NOT NULL,
+            created_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+def prune_cache(conn, max_entries=None, keep_version=None):
+    """刪除其他詞典版本的分詞結果，並只保留最新的 max_entries 筆（會提交交易），回傳刪除筆數"""
+    deleted = 0
+    if keep_version is not None:
+        deleted += conn.execute('''
+            DELETE FROM token_cache WHERE dictionary_id NOT IN (
+                SELECT id FROM token_dictionary WHERE version = ?
+            )
+        ''', (keep_version,)).rowcount
+    if max_entries is not None:
+        row = conn.execute('SELECT created_at FROM token_cache ORDER BY created_at DESC LIMIT 1 OFFSET ?',
+                           (max_entries,)).fetchone()
+        if row:
+            deleted += conn.execute('DELETE FROM token_cache WHERE created_at <= ?', (row[0],)).rowcount
+    conn.commit()
+    return deleted
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def configure_token_cache(path=None, memory_items=DEFAULT_MEMORY_ITEMS):
+    """設定共用的分詞快取（storage.models.init_app 會呼叫），path 為 None 時只使用記憶體"""
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = TokenCache(path, memory_items)
+        return _cache
+
+
+def get_token_cache():
+    """取得共用的分詞快取，尚未設定時只使用記憶體"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TokenCache()
+        return _cache
+
+
+def cut(text, HMM=True):
+    """以共用快取分詞，結果與 jieba.lcut(text, HMM=HMM) 相同"""
+    return get_token_cache().cut(text, HMM)
+
+
+def cut_many(texts, HMM=True):
+    """以共用快取批次分詞"""
+    return get_token_cache().cut_many(texts, HMM)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分詞快取')
+    parser.add_argument('path', nargs='?', default=DEFAULT_CACHE_PATH)
+    parser.add_argument('--prune', type=int, metavar='N', help='只保留最新的 N 筆分詞結果')
+    parser.add_argument('--drop-stale', action='store_true', help='刪除目前詞典版本以外的分詞結果')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.path)
+    try:
+        create_token_cache_tables(conn)
+        if args.prune is not None or args.drop_stale:
+            keep_version = dictionary_version() if args.drop_stale else None
+            print(f"✅ 已刪除 {prune_cache(conn, args.prune, keep_version)} 筆分詞結果")
+        entries = conn.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(tokens)), 0) FROM token_cache').fetchone()
+        vocabulary = conn.execute('SELECT COUNT(*) FROM token_vocab').fetchone()[0]
+        print(f"分詞結果: {entries[0]} 筆（{entries[1] / 1024 / 1024:.1f} MB）")
+        print(f"詞彙: {vocabulary} 個")
+        for version, count in conn.execute('''
+            SELECT d.version, COUNT(c.key) FROM token_dictionary d
+            LEFT JOIN token_cache c ON c.dictionary_id = d.id
+            GROUP BY d.id ORDER BY d.id
+        '''):
+            print(f"  {version}: {count} 筆")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""單一寫入執行緒的爬取結果寫入佇列
+
+SQLite 同一時間只允許一個寫入者，多個爬取執行緒各自寫入時會互相等待寫入鎖，
+甚至出現 "database is locked"。所有寫入改由一條專用執行緒以同一條連線完成：
+爬取工作把文章放進有界佇列，寫入執行緒把同時排隊的小批次合併成一個交易寫入。
+佇列已滿時 submit() 會阻塞（或在逾時後拋出 queue.Full），讓爬取速度配合寫入速度。
+
+用法：
+    writer = IngestWriter(connect)
+    future = writer.submit(articles, keyword='台積電')
+    stats = future.result()
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from storage.content_store import ensure_dictionary
+from storage.ingestion import (
+    fail_stale_crawl_runs, finish_crawl_run, ingest_articles, run_after_commit, start_crawl_run, upsert_articles
+)
+
+logger = logging.getLogger(__name__)
+
+# 佇列最多容納的寫入工作數，超過時提交端會等待
+DEFAULT_MAX_PENDING = 64
+
+# 合併成同一個交易的文章數上限；單一工作超過此數量時單獨寫入並分批提交
+DEFAULT_BATCH_SIZE = 1000
+
+_STOP = object()
+
+
+class _Job:
+    def __init__(self, articles, keyword, start_date, end_date):
+        self.articles = articles
+        self.keyword = keyword
+        self.start_date = start_date
+        self.end_date = end_date
+        self.future = Future()
+
+
+class IngestWriter:
+    """以單一執行緒與單一連線處理所有寫入工作，connect 為建立 DB-API 連線的函式"""
+
+    def __init__(self, connect, max_pending=DEFAULT_MAX_PENDING, batch_size=DEFAULT_BATCH_SIZE):
+        self.connect = connect
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('寫入執行緒已關閉')
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, articles, keyword=None, start_date=None, end_date=None, timeout=None):
+        """把一次爬取的文章放進寫入佇列，回傳完成時帶有寫入統計的 Future
+
+        佇列已滿時最多等待 timeout 秒（None 表示一直等待），逾時拋出 queue.Full。
+        """
+        self._ensure_started()
+        job = _Job(list(articles), keyword, start_date, end_date)
+        self._queue.put(job, timeout=timeout)
+        return job.future
+
+    def ingest(self, articles, keyword=None, start_date=None, end_date=None, timeout=None):
+        """提交並等待寫入完成，回傳與 ingest_articles 相同的統計"""
+        return self.submit(articles, keyword, start_date, end_date, timeout).result()
+
+    def pending(self):
+        """佇列中尚未處理的工作數"""
+        return self._queue.qsize()
+
+    def close(self, timeout=None):
+        """寫完佇列中已提交的工作後停止寫入執行緒"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _next_group(self):
+        """取出下一組要合併寫入的工作；收到停止訊號時回傳 (工作, True)"""
+        jobs = [self._queue.get()]
+        if jobs[0] is _STOP:
+            return [], True
+        total = len(jobs[0].articles)
+        while total < self.batch_size:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is _STOP:
+                return jobs, True
+            jobs.append(job)
+            total += len(job.articles)
+        return jobs, False
+
+    def _run(self):
+        conn = self.connect()
+        try:
+            # 先前中斷的寫入行程留下的進行中爬取紀錄
+            fail_stale_crawl_runs(conn)
+            while True:
+                jobs, stop = self._next_group()
+                if jobs:
+                    self._write(conn, jobs)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _write(self, conn, jobs):
+        if len(jobs) > 1:
+            try:
+                results = self._write_group(conn, jobs)
+            except Exception as e:
+                # 合併交易失敗時逐一重寫，只讓出錯的工作失敗
+                logger.warning(f"合併寫入 {len(jobs)} 個工作失敗，改為逐一寫入: {e}")
+            else:
+                for job, stats in zip(jobs, results):
+                    job.future.set_result(stats)
+                return
+
+        for job in jobs:
+            try:
+                stats = ingest_articles(conn, job.articles, job.keyword, job.start_date, job.end_date,
+                                        chunk_size=self.batch_size)
+            except Exception as e:
+                logger.error(f"寫入失敗: {e}")
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(stats)
+
+    def _write_group(self, conn, jobs):
+        """在單一交易中寫入多個工作，每個工作仍有各自的爬取紀錄"""
+        if conn.in_transaction:
+            conn.commit()
+        try:
+            results = []
+            actions = []
+            for job in jobs:
+                crawl_run_id = start_crawl_run(conn, job.keyword, job.start_date, job.end_date, commit=False)
+                stats = upsert_articles(conn, job.articles, crawl_run_id, chunk_size=self.batch_size, commit=False,
+                                        after_commit=actions)
+                finish_crawl_run(conn, crawl_run_id, stats, commit=False)
+                stats['crawl_run_id'] = crawl_run_id
+                results.append(stats)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        run_after_commit(actions)
+
+        if ensure_dictionary(conn) is not None:
+            conn.commit()
+        logger.info(f"合併寫入 {len(jobs)} 個工作，共 {sum(stats['fetched'] for stats in results)} 篇文章")
+        return results
@@ -0,0 +1,54 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from storage import ingestion
+from storage.migrations import migrate
+from storage.models import init_app, init_database
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """已套用所有遷移的空資料庫"""
+    conn = sqlite3.connect(str(tmp_path / 'news.db'))
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def app(tmp_path):
+    """與應用程式相同方式（create_all 加上遷移）建立資料庫的 Flask 應用程式，測試期間位於應用程式上下文中"""
+    app = Flask(__name__)
+    app.config['TOKEN_CACHE_PATH'] = None
+    init_app(app, f"sqlite:///{tmp_path / 'news.db'}")
+    init_database(app)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture(autouse=True)
+def isolated_ingest_hooks():
+    """測試中註冊的寫入擴充不影響其他測試"""
+    hooks = dict(ingestion.INGEST_HOOKS)
+    ingestion.INGEST_HOOKS.clear()
+    yield ingestion.INGEST_HOOKS
+    ingestion.INGEST_HOOKS.clear()
+    ingestion.INGEST_HOOKS.update(hooks)
+
+
+def make_article(index, publish_date=None, **fields):
+    """測試用的爬蟲文章字典"""
+    article = {
+        'title': f'測試新聞 {index}',
+        'content': f'第 {index} 篇測試新聞的內容，台灣經濟與科技發展。',
+        'source': '測試新聞網',
+        'url': f'https://example.com/news/{index}',
+        'publish_date': publish_date or datetime(2026, 10, 18, 12, 0) - timedelta(hours=index),
+        'topic': '經濟',
+        'keywords': '經濟,科技',
+    }
+    article.update(fields)
+    return article
@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from analyzer import clustering
+from analyzer.clustering import register_clustering
+from analyzer.tfidf import register_tfidf
+from analyzer.web import api_blueprint
+from storage.ingestion import ingest_articles
+from storage.models import connection
+from storage.partitions import archive_articles
+
+from conftest import make_article
+
+# 每 9 小時一篇，從 2026-01-01 到 2026-02-26
+FIRST_PUBLISHED = datetime(2026, 1, 1, 6)
+ARTICLES = [
+    make_article(index, publish_date=FIRST_PUBLISHED + timedelta(hours=9 * index), topic=('經濟', '科技')[index % 2])
+    for index in range(150)
+]
+
+
+@pytest.fixture
+def client(app):
+    """掛上共用 API 路由、資料庫在暫存目錄的測試應用程式"""
+    app.register_blueprint(api_blueprint())
+    return app.test_client()
+
+
+def _ingest(articles):
+    with connection() as conn:
+        ingest_articles(conn, articles)
+
+
+def _archive(before):
+    with connection() as conn:
+        return archive_articles(conn, before)
+
+
+def _expected(start=None, end=None):
+    """發布時間在 [start, end) 之間的文章網址，依發布時間由新到舊"""
+    return [
+        article['url'] for article in sorted(ARTICLES, key=lambda article: article['publish_date'], reverse=True)
+        if (start is None or article['publish_date'] >= start) and (end is None or article['publish_date'] < end)
+    ]
+
+
+def _all_pages(client, **params):
+    """依 next_cursor 讀完所有頁面，回傳文章網址與第一頁的 total"""
+    urls = []
+    response = client.get('/api/news', query_string=dict(params, per_page=7))
+    total = response.get_json()['total']
+    while True:
+        assert response.status_code == 200
+        data = response.get_json()
+        urls += [article['url'] for article in data['articles']]
+        if not data['next_cursor']:
+            return urls, total
+        response = client.get('/api/news', query_string=dict(params, per_page=7, cursor=data['next_cursor']))
+
+
+def test_news_cursor_paging_returns_every_article_once(client):
+    _ingest(ARTICLES)
+
+    urls, total = _all_pages(client)
+    assert urls == _expected()
+    assert total == len(ARTICLES)
+
+
+def test_news_end_date_includes_the_whole_end_day(client):
+    _ingest(ARTICLES)
+
+    data = client.get('/api/news', query_string={'start_date': '2026-01-05', 'end_date': '2026-01-05'}).get_json()
+    expected = _expected(datetime(2026, 1, 5), datetime(2026, 1, 6))
+    assert [article['url'] for article in data['articles']] == expected
+    assert data['total'] == len(expected)
+
+    data = client.get('/api/news', query_string={'topic': '經濟', 'end_date': '2026-01-05'}).get_json()
+    assert data['total'] == sum(
+        1 for article in ARTICLES if article['topic'] == '經濟' and article['publish_date'] < datetime(2026, 1, 6)
+    )
+
+
+def test_news_cursor_paging_across_archived_months(client):
+    _ingest(ARTICLES)
+    assert _archive(datetime(2026, 2, 1)) == len(_expected(end=datetime(2026, 2, 1)))
+
+    urls, total = _all_pages(client, start_date='2026-01-20', end_date='2026-02-10')
+    expected = _expected(datetime(2026, 1, 20), datetime(2026, 2, 11))
+    assert urls == expected
+    assert total == len(expected)
+
+    urls, total = _all_pages(client)
+    assert urls == _expected()
+    assert total == len(ARTICLES)
+
+
+def test_news_end_date_only_reads_archived_months(client):
+    _ingest(ARTICLES)
+    _archive(datetime(2026, 2, 1))
+
+    urls, total = _all_pages(client, end_date='2026-01-15')
+    expected = _expected(end=datetime(2026, 1, 16))
+    assert urls == expected
+    assert total == len(expected)
+
+
+def test_news_topic_matches_substrings(client):
+    mixed = [make_article(1000 + index, publish_date=datetime(2026, 1, 10, index), topic='經濟,科技') for index in range(3)]
+    _ingest(ARTICLES + mixed)
+    _archive(datetime(2026, 2, 1))
+
+    urls, total = _all_pages(client, topic='經濟')
+    newest_first = sorted(ARTICLES + mixed, key=lambda article: article['publish_date'], reverse=True)
+    expected = [article['url'] for article in newest_first if '經濟' in article['topic']]
+    assert urls == expected
+    assert total == len(expected)
+
+    data = client.get('/api/news', query_string={'topic': '經濟,科技', 'end_date': '2026-01-31'}).get_json()
+    assert [article['url'] for article in data['articles']] == [article['url'] for article in reversed(mixed)]
+    assert data['total'] == len(mixed)
+
+    data = client.get('/api/news', query_string={'topic': '不存在的主題'}).get_json()
+    assert data['articles'] == [] and data['total'] == 0
+
+
+@pytest.mark.parametrize('page, per_page', [('0', '5'), ('-3', '5'), ('abc', '0'), ('2', '-1')])
+def test_news_clamps_page_and_per_page(client, page, per_page):
+    _ingest(ARTICLES)
+    _archive(datetime(2026, 2, 1))
+
+    response = client.get('/api/news', query_string={'page': page, 'per_page': per_page})
+    assert response.status_code == 200
+    data = response.get_json()
+    current_page = max(1, int(page)) if page.lstrip('-').isdigit() else 1
+    size = max(1, int(per_page))
+    assert data['current_page'] == current_page
+    assert [article['url'] for article in data['articles']] == \
+        _expected()[(current_page - 1) * size:current_page * size]
+
+
+def test_news_rejects_invalid_cursor_and_dates(client):
+    assert client.get('/api/news', query_string={'cursor': 'not-a-cursor'}).status_code == 400
+    assert client.get('/api/news', query_string={'end_date': '2026-13-40'}).status_code == 400
+
+
+def test_search_includes_the_whole_end_day(client):
+    _ingest(ARTICLES)
+
+    data = client.get('/api/search', query_string={
+        'q': '經濟', 'start_date': '2026-01-05', 'end_date': '2026-01-05', 'per_page': 100
+    }).get_json()
+    assert sorted(article['url'] for article in data['articles']) == \
+        sorted(_expected(datetime(2026, 1, 5), datetime(2026, 1, 6)))
+
+
+def test_search_rejects_invalid_dates_and_ignores_invalid_pages(client):
+    _ingest(ARTICLES[:5])
+
+    assert client.get('/api/search', query_string={'q': '經濟', 'end_date': 'yesterday'}).status_code == 400
+    response = client.get('/api/search', query_string={'q': '經濟', 'page': 'abc', 'per_page': '-3'})
+    assert response.status_code == 200
+    assert response.get_json()['current_page'] == 1
+    assert len(response.get_json()['articles']) == 1
+
+
+@pytest.fixture
+def clustering_hooks(monkeypatch):
+    """每個測試從空的分群模型開始，不沿用其他測試資料庫的模型"""
+    monkeypatch.setattr(clustering, '_model', None)
+    monkeypatch.setattr(clustering, '_version', None)
+    monkeypatch.setattr(clustering, '_checked_at', 0.0)
+    monkeypatch.setattr(clustering, '_batches', 0)
+    register_tfidf()
+    register_clustering()
+
+
+@pytest.mark.parametrize('top_terms', ['20000', '0', '-5', 'abc'])
+def test_clusters_accepts_out_of_range_top_terms(client, clustering_hooks, top_terms):
+    _ingest(ARTICLES[:30])
+
+    response = client.get('/api/clusters', query_string={'top_terms': top_terms})
+    assert response.status_code == 200
+    clusters = response.get_json()
+    assert clusters
+    for cluster in clusters:
+        assert 1 <= len(cluster['top_terms']) <= clustering.OnlineTopicClusters().n_features
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from analyzer import batch_classifier
+from analyzer.batch_classifier import BatchTopicClassifier
+from analyzer.topic_analyzer import TopicAnalyzer
+
+FILLER = ['今天', '記者', '報導', '表示', '民眾', '下午', '持續', '關注', '。', '，', ' ', 'abc', '123']
+
+
+def _articles(analyzer, count=300, seed=11):
+    """由詞庫詞與一般詞隨機組成的 (標題, 內文)，包含同分、沒有符合的詞與沒有內文的文章"""
+    rng = random.Random(seed)
+    keywords = [keyword for config in analyzer.topic_keywords.values() for keyword in config['keywords']]
+    articles = [('今天天氣晴', None), ('', ''), ('Ai 與 gdp', '科技經濟'), ('選舉', '程式設計')]
+    for _ in range(count):
+        words = rng.choices(keywords, k=rng.randint(0, 4)) + rng.choices(FILLER, k=rng.randint(0, 8))
+        rng.shuffle(words)
+        split = rng.randint(0, len(words))
+        articles.append((''.join(words[:split]), ''.join(words[split:]) if rng.random() < 0.8 else None))
+    return articles
+
+
+@pytest.fixture(params=['scipy', 'numpy'])
+def matrix_backend(request, monkeypatch):
+    """分別以 scipy.sparse 與只用 numpy 計算分數"""
+    if request.param == 'numpy':
+        monkeypatch.setattr(batch_classifier, 'sparse', None)
+    elif batch_classifier.sparse is None:
+        pytest.skip('未安裝 scipy')
+
+
+def test_batch_matches_classify(matrix_backend):
+    analyzer = TopicAnalyzer()
+    articles = _articles(analyzer)
+
+    expected = [analyzer.classify(title, content) for title, content in articles]
+    assert BatchTopicClassifier(analyzer.topic_keywords).classify(articles) == expected
+    assert analyzer.classify_batch(articles) == expected
+    assert len(set(expected)) > 3
+
+
+def test_batch_matches_classify_with_custom_weights(matrix_backend):
+    # 單字詞、互相包含的詞、重複列出的詞與不同權重
+    analyzer = TopicAnalyzer()
+    analyzer.topic_keywords = {
+        '天氣': {'keywords': ['雨', '颱風', '颱風假', '颱風'], 'weight': 1.0},
+        '交通': {'keywords': ['高鐵', '停駛', '風'], 'weight': 1.5},
+        '空白': {'keywords': [], 'weight': 3.0},
+    }
+    articles = [
+        ('颱風假', '高鐵停駛'), ('下雨', None), ('風很大', '雨'), ('颱風', '風'), ('晴天', '出遊'), ('高鐵', '颱風假'),
+    ]
+
+    expected = [analyzer.classify(title, content) for title, content in articles]
+    assert BatchTopicClassifier(analyzer.topic_keywords).classify(articles) == expected
+    assert analyzer.classify_batch(articles) == expected
+
+
+def test_empty_inputs():
+    assert BatchTopicClassifier(TopicAnalyzer().topic_keywords).classify([]) == []
+    assert BatchTopicClassifier({}).classify([('颱風', None)]) == ['其他']
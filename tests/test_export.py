@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+from storage.dates import format_datetime
+from storage.export import export_watermark
+from storage.ingestion import ingest_articles, start_crawl_run
+
+from conftest import make_article
+
+
+def _start_run(conn, started_at):
+    crawl_run_id = start_crawl_run(conn)
+    conn.execute('UPDATE crawl_run SET started_at = ? WHERE id = ?', (format_datetime(started_at), crawl_run_id))
+    conn.commit()
+    return crawl_run_id
+
+
+def test_watermark_stops_before_a_running_crawl(conn):
+    ingest_articles(conn, [make_article(0)])
+    running = _start_run(conn, datetime.utcnow())
+    ingest_articles(conn, [make_article(1)])
+
+    assert export_watermark(conn) == running - 1
+
+
+def test_watermark_skips_a_crashed_crawl(conn):
+    crashed = _start_run(conn, datetime.utcnow() - timedelta(hours=3))
+    latest = ingest_articles(conn, [make_article(0)])['crawl_run_id']
+
+    assert export_watermark(conn) == latest
+    assert conn.execute('SELECT status FROM crawl_run WHERE id = ?', (crashed,)).fetchone()[0] == 'failed'
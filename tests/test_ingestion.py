@@ -0,0 +1,64 @@
+import pytest
+
+from storage.content_store import load_contents
+from storage.ingestion import ingest_articles, register_ingest_hook, upsert_articles
+from storage.rollups import get_count, get_counts
+
+from conftest import make_article
+
+
+def _article_count(conn):
+    return conn.execute('SELECT COUNT(*) FROM news_article').fetchone()[0]
+
+
+def test_upsert_counts_new_updated_and_unchanged(conn):
+    first = upsert_articles(conn, [make_article(index) for index in range(3)])
+    assert first == {'fetched': 3, 'new': 3, 'updated': 0, 'unchanged': 0}
+
+    second = upsert_articles(conn, [
+        make_article(0),
+        make_article(0, url='https://EXAMPLE.com/news/0/?utm_source=feed#top'),
+        make_article(1, title='更新後的標題'),
+        make_article(2, topic='科技'),
+        make_article(3),
+    ])
+    assert second == {'fetched': 5, 'new': 1, 'updated': 2, 'unchanged': 2}
+    assert _article_count(conn) == 4
+    assert conn.execute('SELECT COUNT(*) FROM article_revision').fetchone()[0] == 2
+
+    title, article_id = conn.execute(
+        "SELECT title, id FROM news_article WHERE url = 'https://example.com/news/1'"
+    ).fetchone()
+    assert title == '更新後的標題'
+    assert load_contents(conn, [article_id]) == {article_id: make_article(1)['content']}
+
+
+def test_upsert_moves_rollup_counts_to_the_new_version(conn):
+    upsert_articles(conn, [make_article(index) for index in range(3)])
+    upsert_articles(conn, [make_article(2, topic='科技', source='另一家新聞')])
+
+    assert get_count(conn, 'total') == 3
+    assert get_counts(conn, 'topic') == {'經濟': 2, '科技': 1}
+    assert get_counts(conn, 'source') == {'另一家新聞': 1, '測試新聞網': 2}
+    assert sum(get_counts(conn, 'day').values()) == 3
+
+
+def test_failed_hook_rolls_back_the_batch(conn, isolated_ingest_hooks):
+    applied = []
+
+    def failing_hook(conn, articles, crawl_run_id):
+        raise RuntimeError('hook failed')
+
+    register_ingest_hook('after', lambda conn, articles, crawl_run_id: lambda: applied.append(len(articles)))
+    register_ingest_hook('failing', failing_hook)
+    with pytest.raises(RuntimeError):
+        ingest_articles(conn, [make_article(index) for index in range(3)])
+
+    assert _article_count(conn) == 0
+    assert get_count(conn, 'total') == 0
+    assert applied == []
+    assert conn.execute('SELECT status FROM crawl_run').fetchall() == [('failed',)]
+
+    del isolated_ingest_hooks['failing']
+    assert ingest_articles(conn, [make_article(index) for index in range(3)])['new'] == 3
+    assert applied == [3]
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+import pytest
+
+from storage.ingestion import upsert_articles
+from storage.keywords import keyword_frequency, top_keywords_by_topic
+
+from conftest import make_article
+
+
+def test_keyword_filters_include_the_whole_end_day(conn):
+    upsert_articles(conn, [
+        make_article(0, publish_date=datetime(2026, 1, 4, 23, 0), keywords='颱風'),
+        make_article(1, publish_date=datetime(2026, 1, 5, 18, 30), keywords='颱風,停班'),
+        make_article(2, publish_date=datetime(2026, 1, 6, 0, 0), keywords='颱風'),
+    ])
+
+    assert keyword_frequency(conn, start_date='2026-01-05', end_date='2026-01-05') == [('停班', 1), ('颱風', 1)]
+    assert keyword_frequency(conn, end_date='2026-01-05') == [('颱風', 2), ('停班', 1)]
+    assert top_keywords_by_topic(conn, start_date='2026-01-06', end_date='2026-01-06') == {'經濟': [('颱風', 1)]}
+
+
+def test_keyword_filters_reject_invalid_dates(conn):
+    with pytest.raises(ValueError):
+        keyword_frequency(conn, end_date='2026-13-40')
+    with pytest.raises(ValueError):
+        top_keywords_by_topic(conn, start_date='yesterday')
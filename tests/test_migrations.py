@@ -0,0 +1,78 @@
+import sqlite3
+
+from analyzer.topic_state import topic_state_built
+from storage import migrations
+from storage.migrations import MIGRATIONS, migrate
+from storage.rollups import get_count
+from storage.search import rebuild_search_index, search_articles
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# 第一個版本的應用程式以 db.create_all() 建立的資料表
+BASELINE_SCHEMA = '''
+    CREATE TABLE news_article (
+        id INTEGER NOT NULL PRIMARY KEY,
+        title VARCHAR(500) NOT NULL,
+        content TEXT,
+        source VARCHAR(100) NOT NULL,
+        url VARCHAR(500) NOT NULL,
+        publish_date DATETIME NOT NULL,
+        topic VARCHAR(100),
+        keywords TEXT,
+        created_at DATETIME
+    );
+    CREATE TABLE topic (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name VARCHAR(200) NOT NULL,
+        keyword VARCHAR(100) NOT NULL,
+        priority INTEGER,
+        is_active BOOLEAN,
+        created_at DATETIME
+    );
+'''
+
+
+def _version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def test_migrate_empty_database(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'news.db'))
+    assert migrate(conn) == LATEST_VERSION
+    assert _version(conn) == LATEST_VERSION
+    assert topic_state_built(conn)
+
+    # 已是最新版本時不再執行任何遷移
+    assert migrate(conn) == LATEST_VERSION
+    conn.close()
+
+
+def test_migrate_baseline_schema(tmp_path, monkeypatch):
+    # 回填分批讀取，批次小於文章數時也要處理到每一篇
+    monkeypatch.setattr(migrations, 'MIGRATION_BATCH_SIZE', 2)
+    conn = sqlite3.connect(str(tmp_path / 'news.db'))
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany('''
+        INSERT INTO news_article (title, content, source, url, publish_date, topic, keywords, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (f'颱風新聞 {index}', '颱風來襲，各地停班停課。' * 20, '測試新聞網', f'https://example.com/news/{index}',
+         f'2026-01-0{index + 1} 10:00:00.000000', '環境', '颱風,停班', '2026-01-10 00:00:00.000000')
+        for index in range(3)
+    ])
+    conn.commit()
+
+    assert migrate(conn) == LATEST_VERSION
+    assert conn.execute('SELECT COUNT(*) FROM news_article WHERE content IS NOT NULL').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM article_content').fetchone()[0] == 3
+    assert conn.execute('SELECT COUNT(*) FROM news_article WHERE canonical_url IS NULL').fetchone()[0] == 0
+    # 全文索引不在遷移中建立，由離線指令補上
+    assert search_articles(conn, '颱風') == []
+    assert rebuild_search_index(conn, commit=True) == 3
+    assert len(search_articles(conn, '颱風')) == 3
+    assert get_count(conn, 'total') == 3
+    assert get_count(conn, 'day', '2026-01-02') == 1
+    assert conn.execute('SELECT COUNT(*) FROM news_article WHERE publish_ts IS NULL').fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM news_article WHERE publish_date LIKE '%.%'").fetchone()[0] == 0
+    assert topic_state_built(conn)
+    conn.close()
@@ -0,0 +1,75 @@
+import sqlite3
+from datetime import datetime
+
+from analyzer.tfidf import register_tfidf
+from analyzer.topic_state import register_topic_state
+from storage.ingestion import ingest_articles, upsert_articles
+from storage.migrations import migrate
+from storage.models import connection
+from storage.partitions import archive_articles
+from storage.rollups import get_count
+
+from conftest import make_article
+
+
+def test_recrawled_archived_article_is_not_duplicated(conn):
+    articles = [make_article(index, publish_date=datetime(2026, 1, 5 + index, 8)) for index in range(3)]
+    upsert_articles(conn, articles)
+    assert archive_articles(conn, datetime(2026, 3, 1)) == 3
+
+    stats = upsert_articles(conn, articles)
+    assert stats['new'] == 0 and stats['unchanged'] == 3
+    assert conn.execute('SELECT COUNT(*) FROM news_article').fetchone()[0] == 0
+    assert get_count(conn, 'total') == 3
+
+
+def test_archived_article_ids_are_not_reused(app):
+    register_topic_state()
+    register_tfidf()
+    with connection() as conn:
+        ingest_articles(conn, [make_article(index) for index in range(3)])
+        ingest_articles(conn, [make_article(3, publish_date=datetime(2026, 1, 5, 8), topic='政治')])
+        archived_id = conn.execute('SELECT MAX(id) FROM news_article').fetchone()[0]
+        assert archive_articles(conn, datetime(2026, 3, 1)) == 1
+
+        stats = ingest_articles(conn, [make_article(4)])
+        assert stats['new'] == 1 and stats['updated'] == 0
+        assert conn.execute('SELECT MAX(id) FROM news_article').fetchone()[0] > archived_id
+        assert conn.execute('SELECT SUM(count) FROM topic_state_count').fetchone()[0] == 5
+        assert conn.execute("SELECT value FROM tfidf_meta WHERE key = 'documents'").fetchone()[0] == 5
+        assert conn.execute('SELECT COUNT(*) FROM tfidf_article WHERE article_id = ?', (archived_id,)).fetchone()[0] == 0
+
+
+def test_migration_adds_autoincrement_to_existing_table(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'news.db'))
+    conn.execute('''
+        CREATE TABLE news_article (
+            id INTEGER NOT NULL PRIMARY KEY,
+            title VARCHAR(500) NOT NULL,
+            content TEXT,
+            source VARCHAR(100) NOT NULL,
+            url VARCHAR(500) NOT NULL,
+            publish_date DATETIME NOT NULL,
+            topic VARCHAR(100),
+            keywords TEXT,
+            created_at DATETIME
+        )
+    ''')
+    conn.executemany('''
+        INSERT INTO news_article (title, source, url, publish_date, topic)
+        VALUES (?, '測試新聞網', ?, '2026-01-05 08:00:00', '經濟')
+    ''', [(f'測試新聞 {index}', f'https://example.com/news/{index}') for index in range(3)])
+    conn.commit()
+    migrate(conn)
+
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'news_article'").fetchone()[0]
+    assert 'AUTOINCREMENT' in sql
+    assert conn.execute('SELECT COUNT(*) FROM news_article').fetchone()[0] == 3
+    assert conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND name = 'ux_news_article_canonical_url'"
+    ).fetchone()[0] == 1
+
+    conn.execute("DELETE FROM news_article WHERE id = 3")
+    conn.execute("INSERT INTO news_article (title, source, url, publish_date) VALUES ('新文章', '', '', '')")
+    assert conn.execute('SELECT MAX(id) FROM news_article').fetchone()[0] == 4
+    conn.close()
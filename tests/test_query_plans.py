@@ -0,0 +1,22 @@
+from storage.ingestion import ingest_articles
+from storage.query_plans import ENDPOINT_QUERIES, check_query_plans
+
+from conftest import make_article
+
+
+def _assert_plans(conn):
+    results = check_query_plans(conn)
+    assert {result['endpoint'] for result in results} == {query['endpoint'] for query in ENDPOINT_QUERIES}
+    failed = [(result['endpoint'], result['sql'], result['plan']) for result in results if not result['ok']]
+    assert not failed
+
+
+def test_endpoint_queries_use_indexes_on_empty_database(conn):
+    _assert_plans(conn)
+
+
+def test_endpoint_queries_use_indexes_after_ingestion(conn):
+    ingest_articles(conn, [make_article(index, topic=('經濟', '科技', '政治')[index % 3]) for index in range(300)])
+    conn.execute('ANALYZE')
+    conn.commit()
+    _assert_plans(conn)
@@ -0,0 +1,87 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from storage.dates import from_timestamp, to_timestamp
+from storage.ingestion import upsert_articles
+from storage.rollups import get_timeline, rebuild_timeline
+
+from conftest import make_article
+
+# 2026-01-04 是星期日，2026-01-05 與 2026-01-12 是星期一
+ARTICLES = [
+    make_article(0, publish_date=datetime(2026, 1, 4, 23, 30)),
+    make_article(1, publish_date=datetime(2026, 1, 5, 0, 10)),
+    make_article(2, publish_date=datetime(2026, 1, 5, 0, 50)),
+    make_article(3, publish_date=datetime(2026, 1, 5, 13, 0), topic='科技'),
+    make_article(4, publish_date=datetime(2026, 1, 11, 23, 59)),
+    make_article(5, publish_date=datetime(2026, 1, 12, 9, 0)),
+]
+
+
+def _bucket(publish_date, resolution):
+    if resolution == 'hour':
+        return publish_date.replace(minute=0)
+    day = publish_date.replace(hour=0, minute=0)
+    return day - timedelta(days=day.weekday()) if resolution == 'week' else day
+
+
+def _expected(articles, resolution):
+    """各主題依時段起點排序的 (時段起點, 文章數)"""
+    counts = Counter((article['topic'], _bucket(article['publish_date'], resolution)) for article in articles)
+    timeline = {}
+    for (topic, bucket), count in sorted(counts.items(), key=lambda item: item[0][1]):
+        timeline.setdefault(topic, []).append((bucket, count))
+    return timeline
+
+
+def _timeline(conn, resolution, **options):
+    return {
+        topic: [(from_timestamp(bucket), count) for bucket, count in series]
+        for topic, series in get_timeline(conn, resolution, **options).items()
+    }
+
+
+@pytest.mark.parametrize('resolution', ['hour', 'day', 'week'])
+def test_timeline_rollups(conn, resolution):
+    upsert_articles(conn, ARTICLES)
+    assert _timeline(conn, resolution) == _expected(ARTICLES, resolution)
+
+
+def test_weeks_start_on_monday(conn):
+    upsert_articles(conn, ARTICLES)
+    weeks = dict(_timeline(conn, 'week')['經濟'])
+    assert weeks == {datetime(2025, 12, 29): 1, datetime(2026, 1, 5): 3, datetime(2026, 1, 12): 1}
+
+
+def test_updates_move_counts_between_buckets(conn):
+    upsert_articles(conn, ARTICLES)
+    updated = [
+        make_article(1, publish_date=datetime(2026, 1, 5, 0, 10), topic='科技'),
+        make_article(4, publish_date=datetime(2026, 1, 12, 0, 5)),
+    ]
+    upsert_articles(conn, updated)
+    current = list({article['url']: article for article in ARTICLES + updated}.values())
+
+    for resolution in ('hour', 'day', 'week'):
+        assert _timeline(conn, resolution) == _expected(current, resolution)
+
+    # 增量維護的結果與重新計算相同
+    incremental = {resolution: _timeline(conn, resolution) for resolution in ('hour', 'day', 'week')}
+    rebuild_timeline(conn, reset=True)
+    assert {resolution: _timeline(conn, resolution) for resolution in ('hour', 'day', 'week')} == incremental
+
+
+def test_timeline_range_and_topic_filters(conn):
+    upsert_articles(conn, ARTICLES)
+    start = to_timestamp(datetime(2026, 1, 5, 0, 30))
+    end = to_timestamp(datetime(2026, 1, 5, 12, 0))
+
+    # 起點所在的時段也包含在內
+    assert _timeline(conn, 'hour', start_ts=start, end_ts=end, topics=['經濟', '政治']) == {
+        '經濟': [(datetime(2026, 1, 5, 0), 2)],
+        '政治': [],
+    }
+    with pytest.raises(ValueError):
+        get_timeline(conn, 'month')
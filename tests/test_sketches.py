@@ -0,0 +1,111 @@
+import math
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from analyzer.sketches import CountMinSketch, DistinctCounter, KeywordSketch, SpaceSaving
+
+EPSILON = 0.001
+CAPACITY = 50
+
+
+def _stream(size=20000, vocabulary=3000, seed=7):
+    """固定亂數種子、出現次數近似 Zipf 分布的關鍵詞串流"""
+    rng = random.Random(seed)
+    words = [f'詞{index}' for index in range(vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    return rng.choices(words, weights, k=size)
+
+
+def test_count_min_overestimates_within_epsilon():
+    stream = _stream()
+    exact = Counter(stream)
+    sketch = CountMinSketch.from_error(epsilon=EPSILON, delta=0.01)
+    sketch.update(stream)
+
+    assert sketch.total == len(stream)
+    for word, count in exact.items():
+        assert count <= sketch.estimate(word) <= count + EPSILON * sketch.total
+    assert sketch.estimate('沒有出現的詞') <= EPSILON * sketch.total
+
+
+def test_space_saving_keeps_heavy_hitters_within_bound():
+    stream = _stream()
+    exact = Counter(stream)
+    summary = SpaceSaving(CAPACITY)
+    summary.update(stream)
+
+    assert len(summary) == CAPACITY
+    bound = summary.total / CAPACITY
+    for word, estimate in summary.most_common():
+        assert estimate - summary.errors[word] <= exact[word] <= estimate <= exact[word] + bound
+    # 次數超過 total / capacity 的詞一定被保留
+    assert {word for word, count in exact.items() if count > bound} <= set(summary.counts)
+
+
+@pytest.mark.parametrize('distinct', [100, 3000, 50000])
+def test_distinct_counter_relative_error(distinct):
+    counter = DistinctCounter(precision=12)
+    counter.update(f'詞{index}' for index in range(distinct))
+    counter.update(f'詞{index}' for index in range(distinct // 2))
+
+    # 標準誤差約 1.04 / √4096 ≈ 1.6%，以三倍標準誤差為上限
+    assert abs(counter.estimate() - distinct) <= 3 * 1.04 / math.sqrt(4096) * distinct
+
+
+def test_merge_matches_a_single_sketch():
+    stream = _stream()
+    half = len(stream) // 2
+
+    whole = KeywordSketch(capacity=CAPACITY)
+    whole.update(stream)
+    first = KeywordSketch(capacity=CAPACITY)
+    first.update(stream[:half])
+    second = KeywordSketch(capacity=CAPACITY)
+    second.update(stream[half:])
+    merged = first.merge(second)
+
+    # Count-Min 與 HyperLogLog 的合併與一次處理整個串流完全相同
+    assert np.array_equal(merged.frequencies.table, whole.frequencies.table)
+    assert np.array_equal(merged.distinct.registers, whole.distinct.registers)
+    assert merged.total == len(stream)
+    assert len(merged) == len(whole)
+
+    # Space-Saving 合併後仍是次數上限，且誤差不超過兩邊的上限之和
+    exact = Counter(stream)
+    for word, estimate in merged.most_common():
+        assert exact[word] <= estimate <= exact[word] + merged.total / CAPACITY * 2
+    assert [word for word, _ in merged.most_common(5)] == [word for word, _ in exact.most_common(5)]
+
+
+def test_merge_rejects_different_sizes():
+    with pytest.raises(ValueError):
+        CountMinSketch(width=100).merge(CountMinSketch(width=200))
+    with pytest.raises(ValueError):
+        DistinctCounter(precision=10).merge(DistinctCounter(precision=12))
+
+
+def test_round_trip_through_bytes():
+    stream = _stream(size=5000)
+    sketch = KeywordSketch(capacity=CAPACITY)
+    sketch.update(stream)
+
+    restored = KeywordSketch.from_bytes(sketch.to_bytes())
+    assert np.array_equal(restored.frequencies.table, sketch.frequencies.table)
+    assert np.array_equal(restored.distinct.registers, sketch.distinct.registers)
+    assert restored.heavy_hitters.counts == sketch.heavy_hitters.counts
+    assert restored.heavy_hitters.errors == sketch.heavy_hitters.errors
+    assert restored.total == sketch.total
+    assert restored.most_common(10) == sketch.most_common(10)
+    assert len(restored) == len(sketch)
+
+    # 還原後仍可繼續累加與合併
+    restored.update(['新的詞'] * 3)
+    assert restored.estimate('新的詞') >= 3
+    restored.merge(KeywordSketch.from_bytes(sketch.to_bytes()))
+    assert restored.total == 2 * sketch.total + 3
+
+    with pytest.raises(ValueError):
+        CountMinSketch.from_bytes(DistinctCounter().to_bytes() + bytes(16))
@@ -0,0 +1,59 @@
+from collections import Counter
+
+from analyzer.tfidf import count_terms, document_count, load_idf, rebuild_document_frequency, register_tfidf
+from storage.ingestion import ingest_articles
+
+from conftest import make_article
+
+ARTICLES = [
+    make_article(0, title='台積電股價上漲', content='半導體需求強勁，台積電營收創新高。'),
+    make_article(1, title='颱風接近台灣', content='氣象局發布颱風警報，各地停班停課。'),
+    make_article(2, title='央行升息半碼', content='央行宣布升息，房貸利率跟著調整。'),
+]
+
+
+def _document_frequency(conn):
+    return dict(conn.execute('SELECT term, df FROM tfidf_df'))
+
+
+def _expected(articles):
+    """目前每篇文章版本的詞各計一次"""
+    return dict(Counter(term for counts in count_terms(articles) for term in counts))
+
+
+def test_document_frequency_follows_inserts_and_updates(conn):
+    register_tfidf()
+    ingest_articles(conn, ARTICLES)
+    assert _document_frequency(conn) == _expected(ARTICLES)
+    assert document_count(conn) == 3
+
+    # 更新的文章先扣除舊版本的詞，不再使用的詞從表中移除，文章數不變
+    updated = make_article(1, title='颱風遠離', content='颱風警報解除，明天照常上班上課。')
+    ingest_articles(conn, [updated, ARTICLES[2]])
+    current = [ARTICLES[0], updated, ARTICLES[2]]
+    assert _document_frequency(conn) == _expected(current)
+    assert '停班' not in _document_frequency(conn)
+    assert document_count(conn) == 3
+
+    ingest_articles(conn, [make_article(3, title='台積電法說會', content='台積電上調全年營收預估。')])
+    current.append(make_article(3, title='台積電法說會', content='台積電上調全年營收預估。'))
+    assert _document_frequency(conn) == _expected(current)
+    assert document_count(conn) == 4
+
+    # 增量維護的結果與重新計算相同
+    incremental = _document_frequency(conn)
+    assert rebuild_document_frequency(conn) == 4
+    assert _document_frequency(conn) == incremental
+    assert document_count(conn) == 4
+
+
+def test_idf_ranks_rare_terms_higher(conn):
+    register_tfidf()
+    ingest_articles(conn, ARTICLES + [make_article(3, title='台積電法說會', content='台積電上調全年營收預估。')])
+
+    frequencies = _document_frequency(conn)
+    common = max(frequencies, key=frequencies.get)
+    rare = min(frequencies, key=frequencies.get)
+    assert frequencies[common] > frequencies[rare]
+    idf = load_idf(conn, [common, rare, '沒出現過的詞'])
+    assert idf['沒出現過的詞'] > idf[rare] > idf[common]
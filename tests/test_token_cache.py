@@ -0,0 +1,73 @@
+import sqlite3
+
+import jieba
+
+from storage import token_cache
+from storage.token_cache import TokenCache, dictionary_version, prune_cache
+
+TEXTS = ['台積電股價上漲，半導體需求強勁。', '颱風接近，各地停班停課。', '']
+
+
+def test_hits_from_memory_and_disk(tmp_path):
+    path = str(tmp_path / 'token_cache.db')
+    cache = TokenCache(path)
+    expected = [jieba.lcut(text) for text in TEXTS]
+
+    assert cache.cut_many(TEXTS) == expected
+    assert (cache.hits, cache.disk_hits, cache.misses) == (0, 0, 3)
+    assert cache.cut_many(TEXTS + TEXTS[:1]) == expected + expected[:1]
+    assert (cache.hits, cache.disk_hits, cache.misses) == (4, 0, 3)
+    cache.close()
+
+    # 新的行程從快取檔案讀取，不再分詞
+    reopened = TokenCache(path)
+    assert reopened.cut_many(TEXTS) == expected
+    assert (reopened.hits, reopened.disk_hits, reopened.misses) == (0, 3, 0)
+    assert reopened.stats()['disk_items'] == 3
+    reopened.close()
+
+
+def test_memory_lru_keeps_recent_texts():
+    cache = TokenCache(memory_items=2)
+    cache.cut_many(TEXTS)
+    assert cache.stats()['memory_items'] == 2
+
+    cache.cut(TEXTS[0])
+    assert cache.misses == 4
+
+
+def test_dictionary_or_hmm_change_invalidates_entries(tmp_path, monkeypatch):
+    path = str(tmp_path / 'token_cache.db')
+    cache = TokenCache(path)
+    cache.cut_many(TEXTS)
+    cache.cut_many(TEXTS, HMM=False)
+    assert cache.misses == 6
+
+    # 詞典內容改變時版本字串改變，快取鍵隨之改變
+    tokenizer = jieba.Tokenizer()
+    version = dictionary_version(tokenizer)
+    tokenizer.add_word('颱風停班')
+    assert dictionary_version(tokenizer) != version
+
+    current = dictionary_version()
+    monkeypatch.setattr(token_cache, 'dictionary_version', lambda: current + '|自訂詞典')
+    cache.cut_many(TEXTS)
+    assert cache.misses == 9
+    assert cache.stats()['disk_items'] == 9
+
+    # 只保留目前詞典版本的分詞結果
+    conn = sqlite3.connect(path)
+    try:
+        assert prune_cache(conn, keep_version=current + '|自訂詞典') == 6
+    finally:
+        conn.close()
+    assert cache.stats()['disk_items'] == 3
+    cache.close()
+
+
+def test_unusable_cache_file_falls_back_to_memory(tmp_path):
+    cache = TokenCache(str(tmp_path / 'missing' / 'token_cache.db'))
+    assert cache.cut_many(TEXTS) == [jieba.lcut(text) for text in TEXTS]
+    assert cache.path is None
+    assert cache.cut(TEXTS[0]) == jieba.lcut(TEXTS[0])
+    assert cache.hits == 1
@@ -0,0 +1,28 @@
+from analyzer.reclassify import reclassify
+from analyzer.topic_state import register_topic_state
+from storage.ingestion import ingest_articles
+from storage.models import Topic, connection, db
+
+from conftest import make_article
+
+
+def test_ingest_and_reclassify_use_custom_topics(app, tmp_path):
+    db.session.add(Topic(name='天災', keyword='颱風', priority=5))
+    db.session.commit()
+    register_topic_state()
+    with connection() as conn:
+        ingest_articles(conn, [
+            make_article(0, title='颱風來襲 各地停班停課'),
+            make_article(1),
+        ])
+        assert dict(conn.execute('SELECT topic, count FROM topic_state_count')) == {'天災': 1, '經濟': 1}
+
+    # 寫入時已依相同詞庫分類，重新分類只改寫 news_article.topic，主題統計不變
+    stats = reclassify(str(tmp_path / 'news.db'), workers=1)
+    assert stats['processed'] == 2
+    with connection() as conn:
+        assert dict(conn.execute('SELECT url, topic FROM news_article')) == {
+            'https://example.com/news/0': '天災',
+            'https://example.com/news/1': '經濟',
+        }
+        assert dict(conn.execute('SELECT topic, count FROM topic_state_count')) == {'天災': 1, '經濟': 1}
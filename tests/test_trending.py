@@ -0,0 +1,83 @@
+import pytest
+
+from analyzer.trending import BurstDetector
+
+HOUR = 3600
+# 時段 100 的起點，測試中的時間都以此為基準
+START = 100 * HOUR
+
+
+def _at(hours):
+    return START + hours * HOUR
+
+
+def _detector(**options):
+    """每小時一格、共 6 格、最近 2 格的小型偵測器"""
+    defaults = {'bucket_seconds': HOUR, 'buckets': 6, 'recent': 2, 'max_keywords': 100, 'min_count': 1}
+    return BurstDetector(**dict(defaults, **options))
+
+
+def _stats(detector, now):
+    return {item['keyword']: (item['recent'], item['baseline']) for item in detector.top(100, now=now)}
+
+
+def test_counts_leave_the_window_after_a_full_rotation():
+    detector = _detector()
+    for _ in range(3):
+        detector.add(['颱風'], _at(0), now=_at(0))
+
+    # 時間窗為 6 個時段：5 小時後仍在基準時段，6 小時後移出時間窗
+    detector.add(['停班'], _at(5), now=_at(5))
+    assert _stats(detector, _at(5)) == {'停班': (1, 0)}
+    assert sum(detector._rings['颱風'][0]) == 3
+
+    detector.top(100, now=_at(6))
+    assert '颱風' not in detector._rings
+
+
+def test_reused_slots_start_from_zero():
+    detector = _detector()
+    for _ in range(4):
+        detector.add(['颱風'], _at(0), now=_at(0))
+    detector.add(['颱風'], _at(3), now=_at(3))
+
+    # 時段 6 與時段 0 使用同一格，推進時先清除舊的 4 次
+    detector.add(['颱風'], _at(6), now=_at(6))
+    assert _stats(detector, _at(6))['颱風'] == (1, pytest.approx(1 / 4))
+    assert sum(detector._rings['颱風'][0]) == 2
+
+
+def test_long_gap_clears_the_whole_ring():
+    detector = _detector()
+    for hours in range(6):
+        detector.add(['颱風'], _at(hours), now=_at(hours))
+
+    detector.add(['颱風'], _at(30), now=_at(30))
+    assert sum(detector._rings['颱風'][0]) == 1
+    assert _stats(detector, _at(30))['颱風'] == (1, 0)
+
+
+def test_out_of_order_articles_land_in_their_own_slot():
+    detector = _detector()
+    detector.add(['颱風'], _at(4), now=_at(4))
+    # 較晚寫入的舊文章計入較早的時段（基準），早於時間窗的忽略，晚於目前時間的計入目前時段
+    detector.add(['颱風'], _at(1), now=_at(4))
+    detector.add(['颱風'], _at(-3), now=_at(4))
+    detector.add(['颱風'], _at(9), now=_at(4))
+
+    assert _stats(detector, _at(4))['颱風'] == (2, pytest.approx(1 / 4))
+
+
+def test_burst_outranks_steady_keywords_and_eviction_keeps_the_busiest():
+    detector = _detector(max_keywords=2)
+    for hours in range(6):
+        detector.add(['經濟'], _at(hours), now=_at(hours))
+    for _ in range(5):
+        detector.add(['颱風'], _at(5), now=_at(5))
+
+    ranked = [item['keyword'] for item in detector.top(10, now=_at(5))]
+    assert ranked == ['颱風']
+
+    # 超過 max_keywords × 1.2 時淘汰時間窗內次數最少的詞
+    detector.add(['停班', '豪雨'], _at(5), now=_at(5))
+    assert set(detector._rings) == {'經濟', '颱風'}
@@ -0,0 +1,116 @@
+import queue
+import sqlite3
+import threading
+
+import pytest
+
+from storage.ingestion import register_ingest_hook
+from storage.writer import IngestWriter
+
+from conftest import make_article
+
+
+@pytest.fixture
+def writer(conn, tmp_path, monkeypatch):
+    """寫入 conn 所在資料庫的寫入執行緒，groups 記錄每次合併寫入的工作數"""
+    writer = IngestWriter(lambda: sqlite3.connect(str(tmp_path / 'news.db')), max_pending=2, batch_size=10)
+    writer.groups = []
+    write_group = writer._write_group
+
+    def recording_write_group(conn, jobs):
+        writer.groups.append(len(jobs))
+        return write_group(conn, jobs)
+
+    monkeypatch.setattr(writer, '_write_group', recording_write_group)
+    yield writer
+    writer.close(timeout=5)
+
+
+@pytest.fixture
+def paused():
+    """讓寫入執行緒在第一個工作中等待，回傳 (已進入, 放行) 兩個事件"""
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hook(conn, articles, crawl_run_id):
+        if not entered.is_set():
+            entered.set()
+            release.wait(5)
+
+    register_ingest_hook('pause', hook)
+    return entered, release
+
+
+def _articles(start, count):
+    return [make_article(index) for index in range(start, start + count)]
+
+
+def test_queued_jobs_are_written_in_one_transaction(conn, writer, paused):
+    entered, release = paused
+    first = writer.submit(_articles(0, 1), keyword='第一批')
+    assert entered.wait(5)
+
+    # 寫入執行緒忙碌時排隊的工作合併成一個交易，各自仍有爬取紀錄
+    queued = [writer.submit(_articles(1 + index * 3, 3), keyword=f'排隊 {index}') for index in range(2)]
+    release.set()
+
+    results = [future.result(5) for future in [first] + queued]
+    assert [stats['new'] for stats in results] == [1, 3, 3]
+    assert writer.groups == [2]
+    assert len({stats['crawl_run_id'] for stats in results}) == 3
+    assert conn.execute('SELECT COUNT(*) FROM news_article').fetchone()[0] == 7
+    assert conn.execute("SELECT COUNT(*) FROM crawl_run WHERE status = 'finished'").fetchone()[0] == 3
+
+
+def test_groups_stop_at_batch_size(writer, paused):
+    entered, release = paused
+    first = writer.submit(_articles(0, 1))
+    assert entered.wait(5)
+    queued = [writer.submit(_articles(1, 10)), writer.submit(_articles(11, 1))]
+    release.set()
+
+    assert [future.result(5)['new'] for future in [first] + queued] == [1, 10, 1]
+    # 第一個排隊的工作已達 batch_size，不再合併其他工作
+    assert writer.groups == []
+
+
+def test_full_queue_blocks_until_timeout(writer, paused):
+    entered, release = paused
+    first = writer.submit(_articles(0, 1))
+    assert entered.wait(5)
+    queued = [writer.submit(_articles(1 + index, 1)) for index in range(2)]
+    assert writer.pending() == 2
+
+    with pytest.raises(queue.Full):
+        writer.submit(_articles(10, 1), timeout=0.1)
+
+    release.set()
+    assert [future.result(5)['new'] for future in [first] + queued] == [1, 1, 1]
+    assert writer.submit(_articles(10, 1), timeout=1).result(5)['new'] == 1
+
+
+def test_failed_group_only_fails_the_bad_job(conn, writer, paused):
+    entered, release = paused
+    first = writer.submit(_articles(0, 1))
+    assert entered.wait(5)
+    bad = dict(make_article(1))
+    del bad['title']
+    good = writer.submit(_articles(2, 2))
+    failed = writer.submit([bad])
+    release.set()
+
+    assert first.result(5)['new'] == 1
+    assert good.result(5)['new'] == 2
+    with pytest.raises(Exception):
+        failed.result(5)
+    assert writer.groups == [2]
+    assert conn.execute('SELECT COUNT(*) FROM news_article').fetchone()[0] == 3
+
+
+def test_close_drains_the_queue(writer):
+    futures = [writer.submit(_articles(index * 2, 2)) for index in range(3)]
+    writer.close(timeout=5)
+
+    assert sum(future.result(0)['new'] for future in futures) == 6
+    with pytest.raises(RuntimeError):
+        writer.submit(_articles(10, 1))
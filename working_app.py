@@ -1,98 +1,21 @@
 from flask import Flask, render_template, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
 import os
 import json
 import threading
 import time
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///news.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
+from analyzer.web import init_analysis
+from storage.models import Topic, db, get_writer, init_app, init_database
 
-# 資料庫模型
-class NewsArticle(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(500), nullable=False)
-    content = db.Column(db.Text)
-    source = db.Column(db.String(100), nullable=False)
-    url = db.Column(db.String(500), nullable=False)
-    publish_date = db.Column(db.DateTime, nullable=False)
-    topic = db.Column(db.String(100))
-    keywords = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class Topic(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(200), nullable=False)
-    keyword = db.Column(db.String(100), nullable=False)
-    priority = db.Column(db.Integer, default=1)
-    is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+app = Flask(__name__)
+init_app(app)
+init_analysis(app, 'news', 'topics')
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/api/news')
-def get_news():
-    """獲取新聞列表"""
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    topic = request.args.get('topic')
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 20))
-    
-    query = NewsArticle.query
-    
-    if start_date:
-        query = query.filter(NewsArticle.publish_date >= datetime.strptime(start_date, '%Y-%m-%d'))
-    if end_date:
-        query = query.filter(NewsArticle.publish_date <= datetime.strptime(end_date, '%Y-%m-%d'))
-    if topic:
-        query = query.filter(NewsArticle.topic.contains(topic))
-    
-    articles = query.order_by(NewsArticle.publish_date.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
-    
-    return jsonify({
-        'articles': [{
-            'id': article.id,
-            'title': article.title,
-            'source': article.source,
-            'url': article.url,
-            'publish_date': article.publish_date.isoformat(),
-            'topic': article.topic,
-            'keywords': article.keywords
-        } for article in articles.items],
-        'total': articles.total,
-        'pages': articles.pages,
-        'current_page': page
-    })
-
-@app.route('/api/topics')
-def get_topics():
-    """獲取主題統計"""
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    
-    query = NewsArticle.query
-    if start_date:
-        query = query.filter(NewsArticle.publish_date >= datetime.strptime(start_date, '%Y-%m-%d'))
-    if end_date:
-        query = query.filter(NewsArticle.publish_date <= datetime.strptime(end_date, '%Y-%m-%d'))
-    
-    # 統計主題
-    topics = db.session.query(
-        NewsArticle.topic,
-        db.func.count(NewsArticle.id).label('count')
-    ).filter(NewsArticle.topic.isnot(None)).group_by(NewsArticle.topic).all()
-    
-    return jsonify([{'name': topic[0], 'count': topic[1]} for topic in topics])
-
 @app.route('/api/crawl', methods=['POST'])
 def start_crawl():
     """開始爬取新聞"""
@@ -160,23 +83,10 @@ def run_crawling(start_date, end_date, topics):
             }
         ]
         
-        # 儲存到資料庫
-        for article in sample_articles:
-            existing = NewsArticle.query.filter_by(url=article['url']).first()
-            if not existing:
-                news_article = NewsArticle(
-                    title=article['title'],
-                    content=article['content'],
-                    source=article['source'],
-                    url=article['url'],
-                    publish_date=article['publish_date'],
-                    topic=article.get('topic', ''),
-                    keywords=article.get('keywords', '')
-                )
-                db.session.add(news_article)
-        
-        db.session.commit()
-        print("示例新聞已添加到資料庫")
+        # 交給共用的寫入執行緒批次增量寫入資料庫
+        stats = get_writer(app).ingest(sample_articles, keyword=','.join(topics) or None,
+                                       start_date=start_date, end_date=end_date)
+        print(f"示例新聞已添加到資料庫：新增 {stats['new']} 篇、更新 {stats['updated']} 篇")
         
     except Exception as e:
         print(f"爬取過程中發生錯誤: {e}")
@@ -218,7 +128,7 @@ if __name__ == '__main__':
     try:
         with app.app_context():
             print("創建資料庫表...")
-            db.create_all()
+            init_database(app)
             print("資料庫表創建完成")
         
         print("Flask 應用程式啟動中...")